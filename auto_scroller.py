@@ -0,0 +1,93 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+from typing import Callable
+
+from PyQt6.QtCore import Qt, QObject, QTimer, QElapsedTimer, pyqtSignal
+from PyQt6.QtWidgets import QScrollBar
+
+class AutoScroller(QObject):
+    """自动滚动引擎
+
+    interval是每滚动一个像素所用的毫秒数。只用一个高精度QTimer，计时间隔与滚动速度一致
+    （每次大约滚动一个整像素，最快约每帧一次），阅读速度下每秒只唤醒几十次。
+    每次触发按实际经过的时间累加应滚动的像素，小数部分留到下一次，
+    计时器抖动或偶尔卡顿都不会使速度忽快忽慢。暂停期间不计时。
+    """
+    MIN_TICK_MS = 16  # 最短触发间隔，约一帧
+    MAX_STEP_MS = 250  # 单次最多补偿的时间，长时间卡顿后不会一下跳过一大段
+
+    state_changed = pyqtSignal(bool)  # 开始/停止（到达末尾时也会停止）
+
+    def __init__(self, scroll_bar: Callable[[], QScrollBar], interval: int = 50, parent=None):
+        super().__init__(parent)
+        self.scroll_bar = scroll_bar
+        self.interval = max(1, interval)
+        self.active = False
+        self.paused = False
+        self.remainder = 0.0  # 尚未滚动的小数像素
+        self.last_tick = 0
+        self.clock = QElapsedTimer()
+
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.timeout.connect(self.tick)
+        self.set_interval(interval)
+
+    def set_interval(self, interval: int) -> None:
+        """设置滚动速度（毫秒/像素）"""
+        self.interval = max(1, interval)
+        self.timer.setInterval(max(self.MIN_TICK_MS, self.interval))
+
+    def toggle(self) -> None:
+        if self.active:
+            self.stop()
+        else:
+            self.start()
+
+    def start(self) -> None:
+        if self.active:
+            return
+        self.active = True
+        self.remainder = 0.0
+        self._resume_timer()
+        self.state_changed.emit(True)
+
+    def stop(self) -> None:
+        if not self.active:
+            return
+        self.active = False
+        self.timer.stop()
+        self.state_changed.emit(False)
+
+    def set_paused(self, paused: bool) -> None:
+        """窗口最小化或隐藏时暂停，恢复后继续滚动"""
+        self.paused = paused
+        if paused:
+            self.timer.stop()
+        elif self.active:
+            self._resume_timer()
+
+    def _resume_timer(self) -> None:
+        if self.paused:
+            return
+        self.clock.start()
+        self.last_tick = 0
+        self.timer.start()
+
+    def tick(self) -> None:
+        now = self.clock.elapsed()
+        elapsed = min(now - self.last_tick, self.MAX_STEP_MS)
+        self.last_tick = now
+        self.remainder += elapsed / self.interval
+        step = int(self.remainder)
+        if not step:
+            return
+        self.remainder -= step
+        bar = self.scroll_bar()
+        before = bar.value()
+        bar.setValue(before + step)
+        if bar.value() == before:
+            # 已经滚动到全文末尾
+            self.stop()
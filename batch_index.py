@@ -0,0 +1,158 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+"""批量预处理：为整个小说文件夹预先建立章节缓存和页索引，之后在阅读器中打开时直接命中缓存
+
+用法：python -m batch_index [小说文件夹] [--workers N] [--force]
+不给出文件夹时使用设置中的默认小说文件夹。
+每本书在进程池中用FileHandler打开一次：检测编码、建立页索引（非UTF-8的TXT同时写出UTF-8副本）、
+识别章节，结果写入与阅读器相同的缓存目录。缓存按文件指纹命名且原子写入，
+中途中断后重新运行会跳过已处理且未修改的书，只处理剩下的和修改过的。
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional, Tuple
+
+from chapter_cache import ChapterCache
+from library_index import iter_library_files
+from text_cache import TextCache
+
+# 工作进程中的缓存和章节规则，由_init_worker设置
+_worker = {}
+
+
+def _init_worker(chapters_dir: str, text_dir: Optional[str], chapter_rules: List) -> None:
+    """工作进程初始化：打开与阅读器共用的缓存目录"""
+    from pdf_document import PdfDocument
+    # 各本书已经并行处理，单本PDF不再另开进程池
+    PdfDocument.PARALLEL_PAGES = sys.maxsize
+    _worker['chapter_cache'] = ChapterCache(chapters_dir)
+    # 内存缓存只在识别章节时短暂使用，给一个较小的预算即可。
+    # 工作进程中不回收磁盘副本：否则刚写出的副本会被其他书的副本挤掉，下次运行又要重新处理；
+    # 全部处理完后由主进程按设置的上限统一回收一次
+    _worker['text_cache'] = TextCache(16 * 1024 * 1024, text_dir, sys.maxsize)
+    _worker['chapter_rules'] = chapter_rules
+
+
+def is_prepared(file_path: str, chapter_cache: ChapterCache, text_cache: TextCache,
+                signature: str) -> bool:
+    """是否已有当前章节规则下的章节缓存和页索引，且页索引引用的UTF-8副本仍然存在"""
+    cached = chapter_cache.load_with_layout(file_path, signature)
+    if cached is None or cached[1] is None:
+        return False
+    layout = cached[1]
+    if layout.get('normalized'):
+        normalized_path = text_cache.normalized_path(file_path)
+        try:
+            return bool(normalized_path) and os.path.getsize(normalized_path) == layout['data_size']
+        except (OSError, KeyError):
+            return False
+    return True
+
+
+def prepare_book(file_path: str, force: bool = False) -> Tuple[str, str, str]:
+    """在工作进程中预处理一本书，返回(路径, 状态, 说明)，状态为indexed、skipped或failed"""
+    from file_handler import FileHandler
+    chapter_cache = _worker['chapter_cache']
+    text_cache = _worker['text_cache']
+    handler = FileHandler(chapter_cache=chapter_cache, chapter_rules=_worker['chapter_rules'],
+                          text_cache=text_cache)
+    try:
+        if not force and is_prepared(file_path, chapter_cache, text_cache, handler.chapter_detector.signature):
+            return file_path, 'skipped', ''
+        if force:
+            # 不读取旧缓存，重新建立后覆盖
+            handler.chapter_cache = None
+        document = handler.open_document(file_path)
+        try:
+            chapters = handler.get_chapters()
+            if force:
+                layout = document.layout() if hasattr(document, 'layout') else None
+                chapter_cache.save(file_path, chapters, handler.chapter_detector.signature, layout)
+        finally:
+            document.close()
+    except Exception as e:
+        return file_path, 'failed', str(e)
+    encoding = handler.get_encoding()
+    detail = f'{len(chapters)}章' + (f'，编码{encoding}' if handler.get_file_type() == '.txt' else '')
+    return file_path, 'indexed', detail
+
+
+def collect_books(root: str) -> List[str]:
+    """列出文件夹下所有支持格式的书，大的排在前面，避免最后只剩一本大书在单个进程中处理"""
+    books = []
+    for entry in iter_library_files(root):
+        try:
+            books.append((entry.stat().st_size, entry.path))
+        except OSError:
+            continue
+    books.sort(key=lambda book: (-book[0], book[1]))
+    return [path for _, path in books]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='批量预处理小说文件夹，预先建立章节缓存和页索引')
+    parser.add_argument('root', nargs='?', help='小说文件夹，默认使用设置中的默认小说文件夹')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='并行的工作进程数')
+    parser.add_argument('--force', action='store_true', help='忽略已有缓存，全部重新处理')
+    args = parser.parse_args(argv)
+
+    from settings import SettingsManager
+    settings_manager = SettingsManager()
+    preferences = settings_manager.preferences
+    settings_manager.close()
+    root = args.root or preferences.novels_dir
+    if not root or not os.path.isdir(root):
+        parser.error(f'小说文件夹不存在：{root or "（未设置）"}')
+
+    books = collect_books(root)
+    print(f'共{len(books)}本书，使用{args.workers}个工作进程')
+    if not books:
+        return 0
+
+    disk_budget = preferences.text_disk_cache_mb * 1024 * 1024
+    initargs = (settings_manager.chapters_dir, settings_manager.text_dir if disk_budget else None,
+                preferences.chapter_rules)
+    counts = {'indexed': 0, 'skipped': 0, 'failed': 0}
+    started = time.perf_counter()
+    # 与PdfDocument相同，使用spawn启动工作进程
+    executor = ProcessPoolExecutor(max_workers=max(1, args.workers), mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=_init_worker, initargs=initargs)
+    try:
+        futures = [executor.submit(prepare_book, path, args.force) for path in books]
+        for done, future in enumerate(as_completed(futures), 1):
+            file_path, status, detail = future.result()
+            counts[status] += 1
+            if status == 'indexed':
+                print(f'[{done}/{len(books)}] 已处理 {file_path}（{detail}）')
+            elif status == 'failed':
+                print(f'[{done}/{len(books)}] 处理失败 {file_path}：{detail}', file=sys.stderr)
+    except KeyboardInterrupt:
+        # 已写入的缓存都是完整的，下次运行从剩下的书继续
+        executor.shutdown(wait=True, cancel_futures=True)
+        print('已中断，重新运行即可继续处理剩下的书', file=sys.stderr)
+        return 130
+    executor.shutdown()
+
+    text_cache = settings_manager.text_cache
+    if text_cache.disk_dir:
+        removed = text_cache.collect_garbage()
+        if removed:
+            kept = sum(1 for entry in os.scandir(text_cache.disk_dir) if entry.is_file())
+            print(f'警告：UTF-8副本超出文本磁盘缓存上限{preferences.text_disk_cache_mb}MB，'
+                  f'已删除最久未用的{removed}个，保留{kept}个；被删除副本的书打开时需要重新建立页索引，'
+                  f'可在设置中调大上限后重新运行', file=sys.stderr)
+    print(f'完成：新处理{counts["indexed"]}本，跳过未修改的{counts["skipped"]}本，'
+          f'失败{counts["failed"]}本，用时{time.perf_counter() - started:.1f}秒')
+    return 1 if counts['failed'] else 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,94 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+"""自动滚动基准：在阅读视图中自动滚动一段时间，测量进程CPU占用和帧间隔
+
+对比固定每帧（16毫秒）触发、每次滚动一像素的朴素实现与按速度调整触发间隔并累加小数像素的AutoScroller。
+用法：python benchmarks/bench_autoscroll.py [--seconds 600] [--interval 50] [--offscreen]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PARAGRAPH = '　　夜色渐深，山风穿过竹林，少年握紧了手中的长剑，望向远处灯火通明的城池。\n'
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='自动滚动基准')
+    parser.add_argument('--seconds', type=float, default=600, help='每种实现滚动的秒数')
+    parser.add_argument('--interval', type=int, default=50, help='滚动速度（毫秒/像素）')
+    parser.add_argument('--offscreen', action='store_true', help='使用offscreen平台（无显示器时）')
+    args = parser.parse_args()
+    if args.offscreen:
+        os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+
+    from PyQt6.QtCore import QTimer, QEventLoop
+    from PyQt6.QtWidgets import QApplication
+    from reader_view import ReaderView
+
+    app = QApplication(sys.argv)
+    view = ReaderView()
+    view.resize(800, 600)
+    view.show()
+    view.set_content(PARAGRAPH * 200000)
+    app.processEvents()
+
+    def wait(seconds):
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            app.processEvents(QEventLoop.ProcessEventsFlag.WaitForMoreEvents)
+
+    # 朴素实现：固定每16毫秒触发一次，不管速度多慢
+    ticks = []
+    naive = QTimer()
+    naive.setInterval(16)
+    naive_state = {'remainder': 0.0}
+
+    def naive_tick():
+        ticks.append(time.monotonic() * 1000)
+        naive_state['remainder'] += 16 / args.interval
+        step = int(naive_state['remainder'])
+        naive_state['remainder'] -= step
+        bar = view.text_view.verticalScrollBar()
+        bar.setValue(bar.value() + step)
+    naive.timeout.connect(naive_tick)
+
+    scroller = view.auto_scroller
+    scroller.set_interval(args.interval)
+    # 连接到AutoScroller自己的计时器，记录每次触发的时间
+    scroller.timer.timeout.connect(lambda: ticks.append(time.monotonic() * 1000))
+
+    results = {}
+    for name, start, stop in (('固定16毫秒定时器', naive.start, naive.stop),
+                              ('AutoScroller', scroller.start, scroller.stop)):
+        view.jump_to_position(0)
+        ticks.clear()
+        cpu_start, wall_start = time.process_time(), time.monotonic()
+        start()
+        wait(args.seconds)
+        stop()
+        cpu = time.process_time() - cpu_start
+        wall = time.monotonic() - wall_start
+        gaps = [b - a for a, b in zip(ticks, ticks[1:])]
+        results[name] = (cpu / wall * 100, len(ticks), view.current_position, gaps)
+
+    print(f'滚动{args.seconds:.0f}秒，速度{args.interval}毫秒/像素')
+    print(f'{"实现":<18} {"CPU%":>6} {"触发次数":>8} {"平均间隔":>8} {"P95":>6} {"最大":>6} {"标准差":>6} {"阅读位置":>8}')
+    for name, (cpu, count, position, gaps) in results.items():
+        print(f'{name:<18} {cpu:>6.2f} {count:>8} {statistics.mean(gaps):>8.1f} {percentile(gaps, 0.95):>6.1f} '
+              f'{max(gaps):>6.1f} {statistics.pstdev(gaps):>6.1f} {position:>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+"""章节识别微基准：合成10000章小说，对比逐行逐规则匹配与单遍编译正则扫描
+
+用法：python benchmarks/bench_chapters.py [--chapters 10000] [--repeat 3]
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chapter_detector import ChapterDetector
+from txt_document import TxtDocument
+
+PARAGRAPH = '　　夜色渐深，山风穿过竹林，少年握紧了手中的长剑，望向远处灯火通明的城池。\n'
+
+
+def make_novel(chapters: int) -> str:
+    """生成每章带若干段落、每十章一卷的合成小说"""
+    parts = []
+    for i in range(1, chapters + 1):
+        if i % 10 == 1:
+            parts.append(f'第{i // 10 + 1}卷 风云再起\n')
+        parts.append(f'第{i}章 山雨欲来\n')
+        parts.append(PARAGRAPH * 30)
+    return ''.join(parts)
+
+
+def legacy_scan(content: str) -> int:
+    """基线：原FileHandler.get_chapters的逐行、逐条规则匹配"""
+    chapter_patterns = [
+        r'第[一二三四五六七八九十百千万零\d]+[章节卷集部篇]',
+        r'Chapter\s*\d+',
+        r'CHAPTER\s*\d+',
+        r'\d+\.\s+\w+'
+    ]
+    count = 0
+    for line in content.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        for pattern in chapter_patterns:
+            if re.match(pattern, line):
+                count += 1
+                break
+    return count
+
+
+def best_of(repeat: int, func, *args):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='章节识别微基准')
+    parser.add_argument('--chapters', type=int, default=10000, help='合成小说的章节数')
+    parser.add_argument('--repeat', type=int, default=3, help='每项重复次数，取最好成绩')
+    args = parser.parse_args()
+
+    content = make_novel(args.chapters)
+    detector = ChapterDetector()
+    print(f'合成小说：{args.chapters}章，{len(content) / 1e6:.1f}M字符')
+
+    legacy_time, legacy_count = best_of(args.repeat, legacy_scan, content)
+    detect_time, detected = best_of(args.repeat, detector.detect, content)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'novel.txt')
+        with open(path, 'w', encoding='gbk') as f:
+            f.write(content)
+        document = TxtDocument(path)
+        scan_time, scanned = best_of(args.repeat, detector.scan, document)
+        document.close()
+
+    print(f'{"实现":<24} {"耗时(s)":>8} {"章节数":>8}')
+    print(f'{"逐行逐规则（原实现）":<24} {legacy_time:>8.3f} {legacy_count:>8}')
+    print(f'{"单遍正则（字符串）":<24} {detect_time:>8.3f} {len(detected):>8}')
+    print(f'{"单遍正则（GBK惰性文档）":<24} {scan_time:>8.3f} {len(scanned):>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+"""渲染基准测试：对比整本setText与虚拟化ReaderView的首屏耗时和常驻内存
+
+用法：python benchmarks/bench_render.py [--size 50]
+每种模式在独立子进程中运行，以便分别统计峰值内存。
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+PARAGRAPH = '　　夜色渐深，山风穿过竹林，少年握紧了手中的长剑，望向远处灯火通明的城池。\n'
+
+
+def make_corpus(path: str, size_mb: int) -> None:
+    """生成指定大小的UTF-8合成小说"""
+    target = size_mb * 1024 * 1024
+    chapter = 0
+    written = 0
+    with open(path, 'wb') as f:
+        while written < target:
+            chapter += 1
+            data = (f'第{chapter}章 风起\n' + PARAGRAPH * 200).encode('utf-8')
+            f.write(data)
+            written += len(data)
+
+
+def peak_rss_mb() -> float:
+    """当前进程的峰值常驻内存（MB，Linux下ru_maxrss单位为KB）"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_mode(mode: str, path: str) -> None:
+    """在当前进程中测量一种渲染模式，结果打印为一行"""
+    from PyQt6.QtWidgets import QApplication, QTextEdit
+    from reader_view import ReaderView
+
+    app = QApplication(sys.argv)
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    base_rss = peak_rss_mb()
+
+    if mode == 'legacy':
+        widget = QTextEdit()
+        widget.setReadOnly(True)
+    else:
+        widget = ReaderView()
+    widget.resize(800, 1000)
+    widget.show()
+    app.processEvents()
+
+    start = time.perf_counter()
+    if mode == 'legacy':
+        widget.setText(content)
+    else:
+        widget.set_content(content)
+    app.processEvents()
+    widget.grab()  # 强制完成一次绘制
+    first_paint = time.perf_counter() - start
+
+    print(f'{mode:>10} {first_paint:>14.3f} {peak_rss_mb() - base_rss:>16.1f} {peak_rss_mb():>14.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='渲染首屏耗时与内存基准测试')
+    parser.add_argument('--size', type=int, default=50, help='合成TXT大小（MB）')
+    parser.add_argument('--mode', choices=['legacy', 'windowed'], help=argparse.SUPPRESS)
+    parser.add_argument('--path', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.path)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, f'novel_{args.size}mb.txt')
+        make_corpus(path, args.size)
+        print(f'{"模式":>10} {"首屏耗时(s)":>12} {"渲染新增内存(MB)":>12} {"峰值内存(MB)":>10}')
+        for mode in ('legacy', 'windowed'):
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--mode', mode, '--path', path], check=True)
+
+
+if __name__ == '__main__':
+    main()
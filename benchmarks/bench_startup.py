@@ -0,0 +1,170 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+"""启动基准测试：冷启动与热启动的导入耗时、首次绘制时间和上次阅读的书显示出来的时间
+
+用法：python benchmarks/bench_startup.py [--runs 5] [--books 500]
+每次启动都在独立子进程中运行（offscreen平台），并用python -X importtime统计导入耗时。
+冷启动：全新的设置目录（没有章节缓存和书库缓存）和全新的字节码缓存目录；
+热启动：沿用上一次启动留下的设置目录和字节码缓存。
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PARAGRAPH = '　　夜色渐深，山风穿过竹林，少年握紧了手中的长剑，望向远处灯火通明的城池。\n'
+# 启动时不应加载的重型依赖
+HEAVY_MODULES = ('chardet', 'ebooklib', 'bs4', 'lxml', 'fitz')
+
+
+def make_library(novels_dir: str, books: int) -> str:
+    """生成小说文件夹：一本约5MB的"上次阅读的书"和若干本小书，返回前者的路径"""
+    os.makedirs(novels_dir, exist_ok=True)
+    main_book = os.path.join(novels_dir, '上次阅读.txt')
+    with open(main_book, 'w', encoding='utf-8') as f:
+        for chapter in range(1, 601):
+            f.write(f'第{chapter}章 风起\n' + PARAGRAPH * 80)
+    for i in range(books):
+        with open(os.path.join(novels_dir, f'小说{i:04d}.txt'), 'w', encoding='utf-8') as f:
+            f.write(f'第1章 开始\n' + PARAGRAPH * 10)
+    return main_book
+
+
+def prepare_home(home: str, novels_dir: str, book: str) -> None:
+    """在全新的设置目录中写入小说文件夹和上次阅读的书"""
+    env = dict(os.environ, HOME=home)
+    script = ('from settings import SettingsManager, ReadingProgress\n'
+              'm = SettingsManager()\n'
+              f'm.preferences.novels_dir = {novels_dir!r}\n'
+              'm.save_preferences()\n'
+              f'm.save_reading_progress(ReadingProgress({book!r}, 100000, 0))\n'
+              'm.close()\n')
+    subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env, check=True)
+
+
+def run_child() -> None:
+    """在子进程中启动主窗口，输出各阶段距进程启动的时间（秒）"""
+    started = time.perf_counter()
+    os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+    from PyQt6.QtCore import QObject, QEvent, QTimer
+    from PyQt6.QtWidgets import QApplication
+    import main
+    imported = time.perf_counter()
+
+    app = QApplication(sys.argv)
+    window = main.ReaderWindow()
+    constructed = time.perf_counter()
+    marks = {}
+
+    class PaintWatcher(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Type.Paint and 'first_paint' not in marks:
+                marks['first_paint'] = time.perf_counter()
+            return False
+
+    watcher = PaintWatcher()
+    window.reader_view.text_view.viewport().installEventFilter(watcher)
+    window.show()
+    # 与main.main()相同：显示窗口后再恢复上次阅读的书
+    if hasattr(window, 'restore_session'):
+        QTimer.singleShot(0, window.restore_session)
+
+    def poll():
+        if 'book_shown' not in marks and len(window.reader_view.document) and window.loader is None:
+            marks['book_shown'] = time.perf_counter()
+        if 'book_shown' in marks and 'first_paint' in marks:
+            app.quit()
+    timer = QTimer()
+    timer.timeout.connect(poll)
+    timer.start(2)
+    QTimer.singleShot(30000, app.quit)
+    app.exec()
+    window.close()
+
+    result = {
+        'import': imported - started,
+        'window': constructed - started,
+        'first_paint': marks.get('first_paint', float('nan')) - started,
+        'book_shown': marks.get('book_shown', float('nan')) - started,
+        'heavy_loaded': sorted(name for name in HEAVY_MODULES if name in sys.modules),
+    }
+    print('RESULT ' + json.dumps(result))
+
+
+def import_times(stderr: str) -> dict:
+    """解析-X importtime的输出：模块名 -> 累计导入耗时（毫秒）"""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative) / 1000
+    return times
+
+
+def launch(home: str, pycache: str) -> dict:
+    env = dict(os.environ, HOME=home, PYTHONPYCACHEPREFIX=pycache, QT_QPA_PLATFORM='offscreen')
+    wall_start = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', os.path.abspath(__file__), '--child'],
+                          cwd=ROOT, env=env, capture_output=True, text=True, timeout=120)
+    wall = time.perf_counter() - wall_start
+    lines = [line for line in proc.stdout.splitlines() if line.startswith('RESULT ')]
+    if not lines:
+        raise RuntimeError(proc.stderr[-2000:])
+    result = json.loads(lines[-1][len('RESULT '):])
+    result['process'] = wall
+    result['main_import_ms'] = import_times(proc.stderr).get('main', 0.0)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='冷/热启动基准测试')
+    parser.add_argument('--runs', type=int, default=5, help='冷、热启动各运行的次数')
+    parser.add_argument('--books', type=int, default=500, help='小说文件夹中的小书数量')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child()
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        novels_dir = os.path.join(tmp_dir, 'novels')
+        book = make_library(novels_dir, args.books)
+        results = {'冷启动': [], '热启动': []}
+        for run in range(args.runs):
+            home = os.path.join(tmp_dir, f'cold_home_{run}')
+            pycache = os.path.join(tmp_dir, f'cold_pycache_{run}')
+            prepare_home(home, novels_dir, book)
+            shutil.rmtree(pycache, ignore_errors=True)
+            results['冷启动'].append(launch(home, pycache))
+        warm_home = os.path.join(tmp_dir, 'warm_home')
+        warm_pycache = os.path.join(tmp_dir, 'warm_pycache')
+        prepare_home(warm_home, novels_dir, book)
+        launch(warm_home, warm_pycache)  # 预热：生成字节码、章节缓存和书库缓存
+        for run in range(args.runs):
+            results['热启动'].append(launch(warm_home, warm_pycache))
+
+    print(f'{"":<8} {"进程总耗时":>10} {"导入main":>10} {"窗口构造":>10} {"首次绘制":>10} {"书已显示":>10}  启动时加载的重型依赖')
+    for name, runs in results.items():
+        def median(key):
+            return statistics.median(run[key] for run in runs)
+        print(f'{name:<8} {median("process"):>10.3f} {median("main_import_ms") / 1000:>10.3f} '
+              f'{median("window"):>10.3f} {median("first_paint"):>10.3f} {median("book_shown"):>10.3f}  '
+              f'{",".join(runs[-1]["heavy_loaded"]) or "无"}')
+    print('（单位：秒，取中位数；各阶段时间从子进程开始执行脚本算起）')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+"""综合基准测试：在合成语料上测量打开、章节识别、设置读写和首屏渲染的耗时与峰值内存
+
+用法：python benchmarks/bench_suite.py [--quick] [--output results.json] [--compare baseline.json]
+语料由benchmarks/corpus.py按固定种子生成并缓存在--corpus-dir中（默认系统临时目录），
+GBK/GB18030/UTF-8/Big5的TXT（默认1、50、200MB）、多书脊项的EPUB和数百页的PDF。
+每个测试项都在独立子进程中运行（offscreen平台），峰值内存互不影响；
+结果写入JSON文件，用--compare与之前的结果逐项对比。
+
+测试项：
+  open_document  FileHandler.open_document惰性打开（阅读器使用的路径），cold为没有缓存，warm为命中章节缓存
+  set_document   open_document、get_chapters后，offscreen下ReaderView.set_text_document到完成首次绘制
+  settings       SettingsManager保存/加载阅读进度、书签和偏好设置
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from corpus import make_corpus
+
+ENCODINGS = ['gbk', 'gb18030', 'utf-8', 'big5']
+
+
+def peak_rss_mb() -> float:
+    """当前进程的峰值常驻内存（MB）
+
+    Linux下优先读取/proc中的VmHWM：ru_maxrss在exec后仍保留父进程的峰值，子进程测得的值会偏高。
+    """
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss在Linux下单位为KB，在macOS下为字节
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def case_open_document(path: str, home: str) -> dict:
+    """在home下的章节缓存和文本缓存中打开；同一个home第二次运行即为命中缓存的warm"""
+    from chapter_cache import ChapterCache
+    from file_handler import FileHandler
+    from text_cache import TextCache
+    handler = FileHandler(chapter_cache=ChapterCache(os.path.join(home, 'chapters')),
+                          text_cache=TextCache(128 * 1024 * 1024, os.path.join(home, 'text'), 1 << 40))
+    document, open_seconds = timed(handler.open_document, path)
+    chapters, chapter_seconds = timed(handler.get_chapters)
+    # 读取开头一屏，包含首次解码的开销
+    _, read_seconds = timed(document.get_range, 0, 4096)
+    document.close()
+    return {'open_document_s': open_seconds, 'get_chapters_s': chapter_seconds,
+            'first_range_s': read_seconds, 'chapters': len(chapters)}
+
+
+def case_set_document(path: str, home: str) -> dict:
+    from PyQt6.QtWidgets import QApplication
+    from file_handler import FileHandler
+    from reader_view import ReaderView
+    app = QApplication(sys.argv)
+    handler = FileHandler()
+    document = handler.open_document(path)
+    view = ReaderView()
+    view.chapters = handler.get_chapters()
+    view.resize(800, 1000)
+    view.show()
+    app.processEvents()
+    start = time.perf_counter()
+    view.set_text_document(document)
+    app.processEvents()
+    view.grab()  # 强制完成一次绘制
+    seconds = time.perf_counter() - start
+    view.paginator.shutdown()
+    document.close()
+    return {'set_document_s': seconds}
+
+
+def case_settings(path: str, home: str, books: int = 1000) -> dict:
+    """在全新的设置目录中保存并重新加载books本书的进度和书签"""
+    os.environ['HOME'] = home
+    from settings import BookmarkItem, ReadingProgress, SettingsManager
+    paths = [os.path.join(home, f'book{i:05d}.txt') for i in range(books)]
+    manager = SettingsManager()
+    start = time.perf_counter()
+    for i, book in enumerate(paths):
+        manager.save_reading_progress(ReadingProgress(book, i * 100, i % 50))
+    save_progress = time.perf_counter() - start
+    start = time.perf_counter()
+    for book in paths[:100]:
+        manager.save_bookmarks(book, [BookmarkItem(position, f'书签{position}') for position in range(0, 2000, 100)])
+    save_bookmarks = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(100):
+        manager.save_preferences()
+    save_preferences = time.perf_counter() - start
+    manager.close()
+
+    start = time.perf_counter()
+    manager = SettingsManager()
+    open_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for book in paths:
+        manager.load_reading_progress(book)
+    load_progress = time.perf_counter() - start
+    start = time.perf_counter()
+    for book in paths[:100]:
+        manager.load_bookmarks(book)
+    load_bookmarks = time.perf_counter() - start
+    manager.close()
+    return {'save_progress_ms': save_progress * 1000 / books, 'load_progress_ms': load_progress * 1000 / books,
+            'save_bookmarks_ms': save_bookmarks * 10, 'load_bookmarks_ms': load_bookmarks * 10,
+            'save_preferences_ms': save_preferences * 10, 'open_manager_s': open_seconds}
+
+
+CASES = {
+    'open_document': case_open_document,
+    'set_document': case_set_document,
+    'settings': case_settings,
+}
+
+
+def run_child(case: str, path: str, home: str) -> None:
+    """在子进程中运行一个测试项，结果打印为一行JSON"""
+    metrics = CASES[case](path, home)
+    metrics['peak_rss_mb'] = peak_rss_mb()
+    print('RESULT ' + json.dumps(metrics))
+
+
+def launch(case: str, path: str, home: str) -> dict:
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', case, path, home],
+                          cwd=ROOT, capture_output=True, text=True)
+    lines = [line for line in proc.stdout.splitlines() if line.startswith('RESULT ')]
+    if proc.returncode or not lines:
+        raise RuntimeError(f'{case} {path} 失败：\n{proc.stderr[-2000:]}')
+    return json.loads(lines[-1][len('RESULT '):])
+
+
+def median_metrics(runs: list) -> dict:
+    return {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True).stdout.strip()
+    except OSError:
+        return ''
+
+
+def environment() -> dict:
+    from PyQt6.QtCore import QT_VERSION_STR
+    return {
+        'revision': git_revision(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'qt': QT_VERSION_STR,
+    }
+
+
+def compare(results: list, baseline_file: str) -> None:
+    """逐项打印与之前结果的比值（新/旧），大于1表示变慢或内存变多"""
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = {(item['case'], item['name']): item['metrics'] for item in json.load(f)['results']}
+    print(f'\n与{baseline_file}对比（新/旧）：')
+    for item in results:
+        old = baseline.get((item['case'], item['name']))
+        if old is None:
+            continue
+        ratios = [f'{key} {value / old[key]:.2f}x' for key, value in item['metrics'].items()
+                  if key != 'chapters' and old.get(key)]
+        print(f'  {item["case"]:<14} {item["name"]:<24} ' + '  '.join(ratios))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='合成语料上的综合基准测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 50, 200], help='TXT大小（MB）')
+    parser.add_argument('--encodings', nargs='+', default=ENCODINGS, help='TXT编码')
+    parser.add_argument('--epub-items', type=int, default=300, help='EPUB的书脊项数，0为不测EPUB')
+    parser.add_argument('--pdf-pages', type=int, default=300, help='PDF页数，0为不测PDF')
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES), help='要运行的测试项')
+    parser.add_argument('--repeat', type=int, default=3, help='每项运行次数，取中位数')
+    parser.add_argument('--quick', action='store_true', help='快速模式：1和10MB的TXT、100项EPUB、100页PDF，各运行1次')
+    parser.add_argument('--corpus-dir', default=os.path.join(tempfile.gettempdir(), 'novelq-bench-corpus'),
+                        help='合成语料的缓存目录')
+    parser.add_argument('--output', default='bench_results.json', help='结果JSON文件')
+    parser.add_argument('--compare', help='与之前的结果JSON文件对比')
+    parser.add_argument('--child', nargs=3, metavar=('CASE', 'PATH', 'HOME'), help=argparse.SUPPRESS)
+    if '--quick' in sys.argv:
+        # 快速模式只改变默认值，命令行中明确给出的参数仍然有效
+        parser.set_defaults(sizes=[1, 10], epub_items=100, pdf_pages=100, repeat=1)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    print(f'生成语料：{args.corpus_dir}')
+    corpus = make_corpus(args.corpus_dir, args.sizes, args.encodings, args.epub_items, args.pdf_pages)
+    results = []
+
+    def record(case: str, entry: dict, runs: list) -> None:
+        metrics = median_metrics(runs)
+        results.append({'case': case, 'name': entry['name'], 'format': entry['format'],
+                        'encoding': entry['encoding'], 'size_mb': entry['size_mb'], 'metrics': metrics})
+        summary = '  '.join(f'{key} {value}' if isinstance(value, int) else f'{key} {value:.4g}'
+                            for key, value in metrics.items())
+        print(f'{case:<14} {entry["name"]:<24} {summary}')
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if 'settings' in args.cases:
+            runs = [launch('settings', '-', os.path.join(tmp_dir, f'settings_{run}')) for run in range(args.repeat)]
+            record('settings', {'name': 'settings-1000books', 'format': None, 'encoding': None, 'size_mb': 0}, runs)
+        for entry in corpus:
+            if 'open_document' in args.cases:
+                cold, warm = [], []
+                for run in range(args.repeat):
+                    home = os.path.join(tmp_dir, f'{entry["name"]}_{run}')
+                    cold.append(launch('open_document', entry['path'], home))
+                    warm.append(launch('open_document', entry['path'], home))
+                record('open_document', dict(entry, name=entry['name'] + '-cold'), cold)
+                record('open_document', dict(entry, name=entry['name'] + '-warm'), warm)
+            if 'set_document' in args.cases and entry['format'] == 'txt':
+                record('set_document', entry, [launch('set_document', entry['path'], tmp_dir)
+                                               for _ in range(args.repeat)])
+
+    output = {'environment': environment(), 'arguments': vars(args), 'results': results}
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(output, f, ensure_ascii=False, indent=2)
+    print(f'结果已写入{args.output}')
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
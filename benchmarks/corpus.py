@@ -0,0 +1,146 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+"""基准测试用的合成语料生成器
+
+同样的参数总是生成完全相同的文件（固定随机种子），文件名包含全部参数，
+已存在的文件直接复用，因此多次运行、不同提交之间的结果可以直接比较。
+"""
+
+import os
+import random
+from typing import Dict, List
+
+# 简体段落（GBK/GB18030/UTF-8）与繁体段落（Big5只能编码繁体字）
+SIMPLIFIED = [
+    '夜色渐深，山风穿过竹林，少年握紧了手中的长剑，望向远处灯火通明的城池。',
+    '掌柜的拨了拨算盘，抬头看了一眼门外的雨，叹气说今年的生意怕是不好做了。',
+    '她把信纸折好放回袖中，转身时裙角扫过台阶上的落花，没有再回头。',
+    '城门口的老兵靠着墙打盹，听见马蹄声才睁开眼，懒洋洋地挥了挥手。',
+]
+TRADITIONAL = [
+    '夜色漸深，山風穿過竹林，少年握緊了手中的長劍，望向遠處燈火通明的城池。',
+    '掌櫃的撥了撥算盤，抬頭看了一眼門外的雨，嘆氣說今年的生意怕是不好做了。',
+    '她把信紙摺好放回袖中，轉身時裙角掃過臺階上的落花，沒有再回頭。',
+    '城門口的老兵靠著牆打盹，聽見馬蹄聲才睜開眼，懶洋洋地揮了揮手。',
+]
+# GB18030独有的四字节字符（不在GBK中），检验解码和副本写出是否正确
+GB18030_EXTRA = '𠀀𪚥'
+
+
+def paragraphs(encoding: str) -> List[str]:
+    if encoding.lower().replace('-', '') in ('big5', 'big5hkscs', 'cp950'):
+        return TRADITIONAL
+    if encoding.lower().replace('-', '') == 'gb18030':
+        return [text + GB18030_EXTRA for text in SIMPLIFIED]
+    return SIMPLIFIED
+
+
+def chapter_text(rng: random.Random, number: int, encoding: str, paragraph_count: int) -> str:
+    """一章：标题行加若干随机拼接的段落"""
+    texts = paragraphs(encoding)
+    title = f'第{number}章 ' + ('風起' if texts is TRADITIONAL else '风起')
+    body = ''.join('　　' + ''.join(rng.choice(texts) for _ in range(rng.randint(1, 4))) + '\n'
+                   for _ in range(paragraph_count))
+    return title + '\n' + body
+
+
+def make_txt(directory: str, size_mb: int, encoding: str, seed: int = 0) -> str:
+    """生成约size_mb MB、指定编码的TXT小说，每章约五千字"""
+    path = os.path.join(directory, f'novel_{encoding}_{size_mb}mb_s{seed}.txt')
+    if os.path.exists(path):
+        return path
+    rng = random.Random(seed)
+    target = size_mb * 1024 * 1024
+    written = 0
+    number = 0
+    with open(path + '.tmp', 'wb') as f:
+        while written < target:
+            number += 1
+            data = chapter_text(rng, number, encoding, 60).encode(encoding)
+            f.write(data)
+            written += len(data)
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def make_epub(directory: str, items: int, seed: int = 0) -> str:
+    """生成有items个书脊项（每项一章，附目录）的EPUB"""
+    from ebooklib import epub
+
+    path = os.path.join(directory, f'novel_{items}items_s{seed}.epub')
+    if os.path.exists(path):
+        return path
+    rng = random.Random(seed)
+    book = epub.EpubBook()
+    book.set_identifier(f'novelq-bench-{items}-{seed}')
+    book.set_title(f'基准测试 {items}章')
+    book.set_language('zh')
+    book.add_author('NovelQ')
+    chapters = []
+    for number in range(1, items + 1):
+        lines = chapter_text(rng, number, 'utf-8', 40).split('\n')
+        html = f'<h1>{lines[0]}</h1>' + ''.join(f'<p>{line}</p>' for line in lines[1:] if line)
+        chapter = epub.EpubHtml(title=lines[0], file_name=f'chapter_{number:04d}.xhtml', lang='zh')
+        chapter.content = html
+        book.add_item(chapter)
+        chapters.append(chapter)
+    book.toc = chapters
+    book.spine = chapters
+    book.add_item(epub.EpubNcx())
+    book.add_item(epub.EpubNav())
+    epub.write_epub(path + '.tmp', book)
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def make_pdf(directory: str, pages: int, seed: int = 0) -> str:
+    """生成pages页的中文PDF（使用PyMuPDF内置的简体中文字体），每10页一个书签"""
+    import fitz
+
+    path = os.path.join(directory, f'novel_{pages}pages_s{seed}.pdf')
+    if os.path.exists(path):
+        return path
+    rng = random.Random(seed)
+    doc = fitz.open()
+    toc = []
+    for number in range(pages):
+        page = doc.new_page()
+        if number % 10 == 0:
+            toc.append([1, f'第{number // 10 + 1}章', number + 1])
+        text = chapter_text(rng, number // 10 + 1, 'utf-8', 12)
+        page.insert_textbox(fitz.Rect(50, 50, page.rect.width - 50, page.rect.height - 50),
+                            text, fontname='china-s', fontsize=11)
+    doc.set_toc(toc)
+    doc.save(path + '.tmp')
+    doc.close()
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def make_corpus(directory: str, txt_sizes: List[int], encodings: List[str], epub_items: int,
+                pdf_pages: int) -> List[Dict]:
+    """生成整套语料，返回[{name, path, format, encoding, size_mb}]，某种格式的依赖缺失时跳过该格式"""
+    os.makedirs(directory, exist_ok=True)
+    corpus = []
+    for encoding in encodings:
+        for size_mb in txt_sizes:
+            path = make_txt(directory, size_mb, encoding)
+            corpus.append({'name': f'txt-{encoding}-{size_mb}mb', 'path': path, 'format': 'txt',
+                           'encoding': encoding})
+    if epub_items:
+        try:
+            path = make_epub(directory, epub_items)
+            corpus.append({'name': f'epub-{epub_items}items', 'path': path, 'format': 'epub', 'encoding': None})
+        except ImportError:
+            print('未安装ebooklib，跳过EPUB语料')
+    if pdf_pages:
+        try:
+            path = make_pdf(directory, pdf_pages)
+            corpus.append({'name': f'pdf-{pdf_pages}pages', 'path': path, 'format': 'pdf', 'encoding': None})
+        except ImportError:
+            print('未安装PyMuPDF，跳过PDF语料')
+    for entry in corpus:
+        entry['size_mb'] = round(os.path.getsize(entry['path']) / (1024 * 1024), 2)
+    return corpus
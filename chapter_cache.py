@@ -0,0 +1,98 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from fingerprint import file_fingerprint
+from tracing import traced
+
+class ChapterCache:
+    """按文件指纹保存的章节索引缓存
+
+    每本书一个JSON文件，文件名即指纹，文件被修改后指纹变化，旧缓存自然失效。
+    章节以列的形式保存（标题、起始字符位置、行号、层级），加载时还原为章节字典。
+    EPUB等需要逐项解析才能得到长度的文档还可以附带版面信息（各部分的字符偏移），重新打开时直接使用。
+    """
+    VERSION = 1
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get_cache_file(self, fingerprint: str) -> str:
+        """获取缓存文件路径"""
+        return os.path.join(self.cache_dir, f'{fingerprint}.json')
+
+    @traced('read_chapter_cache')
+    def _read(self, file_path: str, signature: str) -> Optional[Dict]:
+        try:
+            cache_file = self.get_cache_file(file_fingerprint(file_path))
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('version') != self.VERSION or data.get('signature', '') != signature:
+            return None
+        return data
+
+    @staticmethod
+    def _chapters(data: Dict) -> List[Dict]:
+        return [
+            {'title': title, 'start': start, 'line': line, 'level': level}
+            for title, start, line, level in zip(data['titles'], data['starts'], data['lines'], data['levels'])
+        ]
+
+    def load(self, file_path: str, signature: str = '') -> Optional[List[Dict]]:
+        """加载章节索引，没有缓存、缓存已失效或由其他章节规则生成时返回None"""
+        data = self._read(file_path, signature)
+        return self._chapters(data) if data is not None else None
+
+    def load_layout(self, file_path: str, signature: str = '') -> Optional[Dict]:
+        """加载与章节索引一起保存的版面信息，没有时返回None"""
+        data = self._read(file_path, signature)
+        return data.get('layout') if data else None
+
+    def load_with_layout(self, file_path: str, signature: str = '') -> Optional[Tuple[List[Dict], Optional[Dict]]]:
+        """只读取一次缓存文件，返回(章节索引, 版面信息)，没有有效缓存时返回None"""
+        data = self._read(file_path, signature)
+        return (self._chapters(data), data.get('layout')) if data is not None else None
+
+    @traced('persist_chapters')
+    def save(self, file_path: str, chapters: List[Dict], signature: str = '',
+             layout: Optional[Dict] = None) -> None:
+        """保存章节索引，先写临时文件再替换，避免中途退出留下损坏的缓存"""
+        cache_file = self.get_cache_file(file_fingerprint(file_path))
+        data = {
+            'version': self.VERSION,
+            'file_path': file_path,
+            'signature': signature,
+            'titles': [chapter['title'] for chapter in chapters],
+            'starts': [chapter['start'] for chapter in chapters],
+            'lines': [chapter.get('line', 0) for chapter in chapters],
+            'levels': [chapter.get('level', 1) for chapter in chapters],
+        }
+        if layout is not None:
+            data['layout'] = layout
+        temp_file = cache_file + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_file, cache_file)
+
+    def collect_garbage(self) -> int:
+        """删除对应文件已不存在或已被修改（指纹不再匹配）的缓存，返回删除的文件数"""
+        removed = 0
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    file_path = json.load(f).get('file_path')
+                if file_path and name == f'{file_fingerprint(file_path)}.json':
+                    continue
+            except (OSError, ValueError):
+                pass
+            os.remove(path)
+            removed += 1
+        return removed
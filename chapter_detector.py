@@ -0,0 +1,125 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+import hashlib
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from tracing import traced
+
+# 默认章节规则：(正则, 层级)，正则匹配去掉行首空白后的行首
+# 标题只占一行，规则中的空白用[^\S\n]而不是\s，以免跨行匹配
+DEFAULT_RULES = [
+    (r'第[^\S\n]*[一二三四五六七八九十百千万零〇两\d]+[^\S\n]*[卷集部篇]', 1),  # 中文分卷（第一卷）
+    (r'第[^\S\n]*[一二三四五六七八九十百千万零〇两\d]+[^\S\n]*[章节回]', 2),  # 中文章节（第一章）
+    (r'Chapter[^\S\n]*\d+', 2),  # 英文章节（Chapter 1）
+    (r'CHAPTER[^\S\n]*\d+', 2),  # 英文章节大写
+    (r'\d+\.[^\S\n]+\w+', 2),  # 数字编号（1. 标题）
+]
+
+# 分块扫描惰性文档时每块的目标字符数
+SCAN_CHUNK_SIZE = 1024 * 1024
+
+Rule = Union[str, Tuple[str, int], List]
+
+class ChapterDetector:
+    """单遍章节识别引擎
+
+    把所有规则合并为一个预编译的多分支正则，一次扫描整段文本，
+    不再逐行split、逐条规则匹配。每条规则对应一个命名分组，据此得到章节层级。
+    标题不能跨行：用户规则中的空白匹配到换行时丢弃该结果，从下一行继续查找。
+    """
+
+    def __init__(self, rules: Optional[Iterable[Rule]] = None):
+        self.rules: List[Tuple[str, int]] = []
+        for rule in rules or DEFAULT_RULES:
+            pattern, level = (rule, 1) if isinstance(rule, str) else (rule[0], int(rule[1]))
+            try:
+                re.compile(pattern)
+            except re.error:
+                # 忽略用户配置中无效的正则
+                continue
+            self.rules.append((pattern, level))
+        if not self.rules:
+            self.rules = list(DEFAULT_RULES)
+
+        alternatives = '|'.join(f'(?P<r{i}>{pattern})' for i, (pattern, _) in enumerate(self.rules))
+        # 行首允许任意非换行空白，标题取到行尾
+        self.regex = re.compile(rf'^[^\S\n]*(?:{alternatives})[^\n]*', re.MULTILINE)
+        self.levels = {f'r{i}': level for i, (_, level) in enumerate(self.rules)}
+
+    @property
+    def signature(self) -> str:
+        """规则集的摘要，用于判断章节缓存是否由同一套规则生成"""
+        text = '\n'.join(f'{level}:{pattern}' for pattern, level in self.rules)
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+    def detect(self, text: str, base_offset: int = 0, base_line: int = 0) -> List[Dict]:
+        """识别一段文本中的章节，返回章节字典列表（start为标题行首在全文中的字符位置）"""
+        chapters = []
+        line = base_line
+        previous = 0
+        position = 0
+        while True:
+            match = self.regex.search(text, position)
+            if match is None:
+                break
+            newline = text.find('\n', match.start(), match.end())
+            if newline >= 0:
+                position = newline + 1
+                continue
+            # 标题取到行尾，下一次从下一行开始
+            position = match.end() + 1
+            line += text.count('\n', previous, match.start())
+            previous = match.start()
+            chapters.append({
+                'title': match.group(0).strip(),
+                'start': base_offset + match.start(),
+                'line': line,
+                'level': self.levels[match.lastgroup]
+            })
+        return chapters
+
+    @traced('chapterize')
+    def scan(self, document, progress_callback: Optional[Callable[[int, str], None]] = None) -> List[Dict]:
+        """分块扫描文档（需提供len()和get_range()），块边界对齐到换行符
+
+        比一块还长的行只识别其开头所在的块，之后的块跳过该行剩下的部分，不把行中间当作行首。
+        """
+        chapters = []
+        total = len(document)
+        offset = 0
+        line = 0
+        in_line = False  # 上一块是否结束在一个超长行的中间
+        while offset < total:
+            text = document.get_range(offset, offset + SCAN_CHUNK_SIZE)
+            if in_line:
+                newline = text.find('\n')
+                in_line = newline < 0
+                offset += len(text) if in_line else newline + 1
+                line += 0 if in_line else 1
+                if progress_callback:
+                    progress_callback(offset * 100 // total, '正在识别章节')
+                continue
+            if offset + len(text) < total:
+                # 把最后一个不完整的行留给下一块
+                newline = text.rfind('\n')
+                if newline >= 0:
+                    text = text[:newline + 1]
+                else:
+                    in_line = True
+            chapters.extend(self.detect(text, offset, line))
+            line += text.count('\n')
+            offset += len(text)
+            if progress_callback:
+                progress_callback(offset * 100 // total, '正在识别章节')
+        return chapters
+
+    def first_title(self, text: str, max_lines: int = 5) -> Optional[str]:
+        """从文本的前max_lines行中提取章节标题"""
+        for line in text.split('\n', max_lines)[:max_lines]:
+            line = line.strip()
+            if line and self.regex.match(line):
+                return line
+        return None
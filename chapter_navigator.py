@@ -0,0 +1,138 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+import bisect
+from array import array
+from typing import Dict, List, Optional
+
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLineEdit, QListView, QAbstractItemView
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QSortFilterProxyModel, pyqtSignal
+from PyQt6.QtGui import QFont
+
+# 每一级目录缩进一个全角空格
+INDENT = '　'
+
+class ChapterModel(QAbstractListModel):
+    """章节列表模型
+
+    章节起点和层级保存在紧凑的array中，标题保存在列表中；视图只为可见的行取数据，
+    上万章的网文也不会创建上万个控件。嵌套的EPUB目录、PDF书签按层级缩进显示，当前章节加粗。
+    """
+    PositionRole = Qt.ItemDataRole.UserRole
+
+    current_changed = pyqtSignal(int)  # 当前章节的行号
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.starts = array('q')  # 各章起始字符位置
+        self.levels = array('b')  # 各章层级，1为顶层
+        # 按起点排序后的起点和对应的行号；EPUB目录的顺序不一定与正文一致，已有序时sorted_rows为None
+        self.sorted_starts = self.starts
+        self.sorted_rows: Optional[array] = None
+        self.titles: List[str] = []
+        self.current = -1  # 当前章节的行号
+        self.bold_font = QFont()
+        self.bold_font.setBold(True)
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.titles)
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.titles):
+            return None
+        row = index.row()
+        if role == Qt.ItemDataRole.DisplayRole:
+            return INDENT * (self.levels[row] - 1) + self.titles[row]
+        if role == Qt.ItemDataRole.FontRole and row == self.current:
+            return self.bold_font
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return self.titles[row]
+        if role == self.PositionRole:
+            return self.starts[row]
+        return None
+
+    def set_chapters(self, chapters: List[Dict]) -> None:
+        self.beginResetModel()
+        self.starts = array('q', (chapter['start'] for chapter in chapters))
+        self.levels = array('b', (max(1, min(chapter.get('level', 1), 100)) for chapter in chapters))
+        self.titles = [chapter['title'] for chapter in chapters]
+        if all(a <= b for a, b in zip(self.starts, self.starts[1:])):
+            self.sorted_starts, self.sorted_rows = self.starts, None
+        else:
+            # 起点相同的按行号排序，查找时取其中最后一项
+            rows = sorted(range(len(self.starts)), key=lambda row: (self.starts[row], row))
+            self.sorted_starts = array('q', (self.starts[row] for row in rows))
+            self.sorted_rows = array('q', rows)
+        self.current = -1
+        self.endResetModel()
+
+    def chapter_of(self, position: int) -> int:
+        """position所在的章节（行号）；多个目录项起点相同时取最后（最深）的一项"""
+        if not self.starts:
+            return -1
+        index = max(0, bisect.bisect_right(self.sorted_starts, position) - 1)
+        return self.sorted_rows[index] if self.sorted_rows is not None else index
+
+    def set_current(self, row: int) -> None:
+        """改变当前章节，只重绘新旧两行"""
+        if row == self.current:
+            return
+        old, self.current = self.current, row
+        for changed in (old, row):
+            if 0 <= changed < len(self.titles):
+                index = self.index(changed)
+                self.dataChanged.emit(index, index, [Qt.ItemDataRole.FontRole])
+        self.current_changed.emit(row)
+
+class ChapterNavigator(QWidget):
+    """章节目录面板：按标题过滤的列表，激活后跳转，阅读时自动定位到当前章节"""
+    chapter_activated = pyqtSignal(int)  # 章节起始字符位置
+
+    def __init__(self, model: ChapterModel, parent=None):
+        super().__init__(parent)
+        self.model = model
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+
+        self.filter_input = QLineEdit(self)
+        self.filter_input.setPlaceholderText('按标题过滤...')
+        self.filter_input.setClearButtonEnabled(True)
+        layout.addWidget(self.filter_input)
+
+        self.proxy = QSortFilterProxyModel(self)
+        self.proxy.setSourceModel(model)
+        self.proxy.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.filter_input.textChanged.connect(self.proxy.setFilterFixedString)
+
+        self.list_view = QListView(self)
+        self.list_view.setModel(self.proxy)
+        self.list_view.setUniformItemSizes(True)  # 所有行等高，上万章时滚动不必逐行测量
+        self.list_view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.list_view.activated.connect(self.on_activated)
+        layout.addWidget(self.list_view)
+
+        model.current_changed.connect(self.on_current_changed)
+        model.modelReset.connect(self.filter_input.clear)
+
+    def on_activated(self, index: QModelIndex) -> None:
+        position = index.data(ChapterModel.PositionRole)
+        if position is not None:
+            self.chapter_activated.emit(position)
+
+    def on_current_changed(self, row: int) -> None:
+        """当前章节变化时选中并滚动到该行，面板隐藏时不做"""
+        if self.isVisible():
+            self.reveal_current()
+
+    def reveal_current(self) -> None:
+        if not 0 <= self.model.current < self.model.rowCount():
+            return
+        index = self.proxy.mapFromSource(self.model.index(self.model.current))
+        if index.isValid():
+            self.list_view.setCurrentIndex(index)
+            self.list_view.scrollTo(index, QAbstractItemView.ScrollHint.PositionAtCenter)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.reveal_current()
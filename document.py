@@ -0,0 +1,84 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+import bisect
+from abc import ABC, abstractmethod
+from typing import Dict, List
+
+SUPPORTED_EXTENSIONS = ('.txt', '.epub', '.pdf')
+
+# 打开文件对话框使用的过滤器
+FILE_DIALOG_FILTER = "小说文件 (*.txt *.epub *.pdf);;文本文件 (*.txt);;EPUB电子书 (*.epub);;PDF文档 (*.pdf);;所有文件 (*.*)"
+
+
+def split_pages(text: str, page_size: int) -> List[int]:
+    """在换行处把文本切分为约page_size字符的页，返回各页相对起点（不含末尾）"""
+    starts = [0]
+    while starts[-1] + page_size < len(text):
+        boundary = starts[-1] + page_size
+        newline = text.find('\n', boundary, boundary + page_size)
+        # 超长的行直接在目标位置切开
+        starts.append(newline + 1 if newline >= 0 else boundary)
+    return starts
+
+
+class Document(ABC):
+    """阅读视图使用的文档接口
+
+    文档是一段按字符位置寻址的文本，阅读位置、章节起点和书签都用字符位置表示。
+    各格式的实现只需按需提供get_range和分页位置，不必在内存中保存全文。
+    """
+    encoding = None  # 文本文件检测到的编码，其他格式为None
+
+    def __init__(self):
+        self.chapters: List[Dict] = []  # 格式自带的章节（目录），没有时由章节识别引擎生成
+        self.metadata: Dict = {}
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """全文字符数"""
+
+    @abstractmethod
+    def get_range(self, start: int, end: int) -> str:
+        """获取字符区间[start, end)的文本"""
+
+    @abstractmethod
+    def page_offsets(self) -> list:
+        """各页起始字符位置，末尾附加全文长度"""
+
+    def page_of_position(self, position: int) -> int:
+        """字符位置所在的页"""
+        offsets = self.page_offsets()
+        return min(max(0, bisect.bisect_right(offsets, position) - 1), max(0, len(offsets) - 2))
+
+    def clamp(self, position: int) -> int:
+        """把位置限制在文档范围内，用于恢复可能已过期的阅读进度和书签"""
+        return min(max(0, position), len(self))
+
+    def close(self) -> None:
+        """释放文件映射等资源"""
+        pass
+
+
+class TextDocument(Document):
+    """已整体解析为字符串的文档"""
+    PAGE_SIZE = 32 * 1024  # 每页的目标字符数
+
+    def __init__(self, content: str):
+        super().__init__()
+        self.content = content
+        self._page_offsets = None
+
+    def __len__(self) -> int:
+        return len(self.content)
+
+    def get_range(self, start: int, end: int) -> str:
+        """获取字符区间[start, end)的文本"""
+        return self.content[max(0, start):end]
+
+    def page_offsets(self) -> list:
+        """在换行处把全文切分为约PAGE_SIZE字符的页，返回页起点列表（末尾附加全文长度）"""
+        if self._page_offsets is None:
+            self._page_offsets = split_pages(self.content, self.PAGE_SIZE) + [len(self.content)]
+        return self._page_offsets
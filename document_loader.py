@@ -0,0 +1,84 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from PyQt6.QtCore import QObject, QRunnable, pyqtSignal
+
+from document import Document
+from file_handler import FileHandler, LoadCancelled
+from tracing import traced
+
+@dataclass
+class LoadedDocument:
+    """后台加载完成的文档，一次性交给ReaderView"""
+    file_path: str
+    document: Document
+    encoding: str
+    file_type: str
+    chapters: List[Dict] = field(default_factory=list)
+    metadata: Dict = field(default_factory=dict)
+
+class LoaderSignals(QObject):
+    """DocumentLoader的信号，QRunnable本身不是QObject，信号需要单独的载体"""
+    progress = pyqtSignal(int, str)  # 百分比, 阶段描述
+    finished = pyqtSignal(object)  # LoadedDocument
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+class DocumentLoader(QRunnable):
+    """在线程池中完成解码、解析和章节识别，不阻塞GUI线程"""
+
+    def __init__(self, file_path: str, chapter_cache=None, chapter_rules=None, text_cache=None):
+        super().__init__()
+        self.file_path = file_path
+        self.signals = LoaderSignals()
+        self.handler = FileHandler(progress_callback=self.signals.progress.emit, chapter_cache=chapter_cache,
+                                   chapter_rules=chapter_rules, text_cache=text_cache)
+
+    def cancel(self) -> None:
+        """取消加载，已完成的结果也不会再发出"""
+        self.handler.cancel()
+
+    def close_document(self) -> None:
+        """释放未交付的文档（如TXT的文件映射）"""
+        if self.handler.document:
+            self.handler.document.close()
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self.handler.cancelled
+
+    @traced('load')
+    def run(self) -> None:
+        try:
+            text_document = self.handler.open_document(self.file_path)
+            chapters = self.handler.get_chapters()
+            document = LoadedDocument(
+                file_path=self.file_path,
+                document=text_document,
+                encoding=self.handler.get_encoding(),
+                file_type=self.handler.get_file_type(),
+                chapters=chapters,
+                metadata=self.handler.get_metadata()
+            )
+        except LoadCancelled:
+            self.close_document()
+            self.signals.cancelled.emit()
+            return
+        except Exception as e:
+            self.close_document()
+            if self.is_cancelled:
+                self.signals.cancelled.emit()
+            else:
+                self.signals.failed.emit(str(e))
+            return
+        
+        if self.is_cancelled:
+            self.close_document()
+            self.signals.cancelled.emit()
+            return
+        self.signals.progress.emit(100, '加载完成')
+        self.signals.finished.emit(document)
@@ -0,0 +1,166 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+import codecs
+import os
+from typing import List, Optional, Tuple
+
+from tracing import traced
+
+# BOM与编码的对应关系，UTF-32必须排在UTF-16之前（UTF-32 LE的BOM以UTF-16 LE的BOM开头）
+BOM_ENCODINGS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+# 检测失败时依次尝试的常用编码
+FALLBACK_ENCODINGS = ['utf-8', 'gb18030', 'big5', 'utf-16']
+
+# 单字节编码几乎能"解码"任何字节序列，低于该置信度时不予采用
+MIN_CONFIDENCE = 0.7
+
+# 多字节编码的严格解码本身就是一次校验，检测结果即使置信度较低也优先尝试
+MULTIBYTE_ENCODINGS = {
+    'utf-8', 'utf-8-sig', 'utf-16', 'utf-32', 'gb18030', 'big5', 'big5hkscs',
+    'cp950', 'shift_jis', 'cp932', 'euc_jp', 'euc_kr', 'cp949',
+}
+
+# 每个采样窗口的大小，以及喂给chardet的分块大小
+SAMPLE_SIZE = 64 * 1024
+FEED_SIZE = 4 * 1024
+
+# chardet经常把中文文本识别为GB2312/GBK，统一放宽为其超集GB18030，避免生僻字解码失败
+ENCODING_ALIASES = {
+    'gb2312': 'gb18030',
+    'gbk': 'gb18030',
+    'ascii': 'utf-8',
+}
+
+
+def normalize_encoding(encoding: Optional[str]) -> Optional[str]:
+    """规范化编码名称，无法识别的编码返回None"""
+    if not encoding:
+        return None
+    try:
+        name = codecs.lookup(encoding).name
+    except LookupError:
+        return None
+    return ENCODING_ALIASES.get(name, name)
+
+
+def detect_bom(head: bytes) -> Optional[str]:
+    """根据文件开头的BOM判断编码"""
+    for bom, encoding in BOM_ENCODINGS:
+        if head.startswith(bom):
+            return encoding
+    return None
+
+
+def read_samples(file_path: str, sample_size: int = SAMPLE_SIZE) -> List[bytes]:
+    """读取文件头部、中部、尾部三个采样窗口，小文件直接整体读取
+
+    中部和尾部窗口从第一个换行符之后开始，换行符不会出现在GBK/Big5/UTF-8的多字节字符内部，
+    从而保证窗口不会从半个字符开始，否则chardet会直接排除正确的多字节编码。
+    """
+    file_size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        if file_size <= sample_size * 3:
+            return [f.read()]
+        samples = [f.read(sample_size)]
+        for offset in ((file_size - sample_size) // 2, file_size - sample_size):
+            f.seek(offset)
+            sample = f.read(sample_size)
+            newline = sample.find(b'\n')
+            if newline >= 0:
+                sample = sample[newline + 1:]
+            samples.append(sample)
+        return samples
+
+
+def _strip_partial_utf8(sample: bytes) -> bytes:
+    """去掉采样窗口开头被截断的UTF-8续字节"""
+    start = 0
+    while start < min(3, len(sample)) and 0x80 <= sample[start] <= 0xBF:
+        start += 1
+    return sample[start:]
+
+
+def is_valid_utf8(samples: List[bytes]) -> bool:
+    """严格校验采样内容是否为合法的UTF-8，允许窗口边界处的字符被截断"""
+    for index, sample in enumerate(samples):
+        if index > 0:
+            sample = _strip_partial_utf8(sample)
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        try:
+            # 只有最后一个窗口才是真正的文件结尾
+            decoder.decode(sample, final=(index == len(samples) - 1))
+        except UnicodeDecodeError:
+            return False
+    return True
+
+
+@traced('detect_encoding')
+def detect_encoding(file_path: str) -> Tuple[Optional[str], float]:
+    """检测文件编码，返回(编码, 置信度)
+
+    只读取有限的采样窗口：先检查BOM，再严格校验UTF-8，
+    最后用chardet的增量检测器逐块分析，检测结果确定后立即停止。
+    """
+    samples = read_samples(file_path)
+    head = samples[0] if samples else b''
+
+    # 快速路径：BOM
+    encoding = detect_bom(head)
+    if encoding:
+        return encoding, 1.0
+
+    # 快速路径：合法的UTF-8（纯ASCII同样按UTF-8处理）
+    if is_valid_utf8(samples):
+        return 'utf-8', 0.99
+
+    # 使用chardet增量检测，检测完成即提前退出；chardet只在快速路径都不成立时才导入
+    from chardet import UniversalDetector
+    detector = UniversalDetector()
+    for sample in samples:
+        for start in range(0, len(sample), FEED_SIZE):
+            detector.feed(sample[start:start + FEED_SIZE])
+            if detector.done:
+                break
+        if detector.done:
+            break
+    result = detector.close() or {}
+    return normalize_encoding(result.get('encoding')), result.get('confidence') or 0.0
+
+
+def candidate_encodings(encoding: Optional[str]) -> List[str]:
+    """返回按优先级排列的候选编码列表，检测结果排在最前"""
+    candidates = []
+    for name in [encoding] + FALLBACK_ENCODINGS:
+        name = normalize_encoding(name)
+        if name and name not in candidates:
+            candidates.append(name)
+    return candidates
+
+
+def decode_bytes(raw_data: bytes, encoding: Optional[str]) -> Tuple[str, str]:
+    """依次尝试候选编码解码字节数据，返回(文本, 实际使用的编码)"""
+    for candidate in candidate_encodings(encoding):
+        try:
+            return raw_data.decode(candidate), candidate
+        except UnicodeDecodeError:
+            continue
+    raise ValueError('无法识别文件编码')
+
+
+def read_text(file_path: str) -> Tuple[str, str]:
+    """检测编码并读取整个文本文件，返回(文本, 编码)"""
+    encoding, confidence = detect_encoding(file_path)
+    if confidence < MIN_CONFIDENCE and encoding not in MULTIBYTE_ENCODINGS:
+        encoding = None
+    with open(file_path, 'rb') as f:
+        raw_data = f.read()
+    return decode_bytes(raw_data, encoding)
@@ -0,0 +1,224 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+import bisect
+import posixpath
+import threading
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+from document import Document, split_pages
+from tracing import traced
+
+
+def import_ebooklib():
+    """首次打开EPUB时才导入ebooklib（连带lxml），不拖慢程序启动"""
+    import ebooklib
+    from ebooklib import epub
+    return ebooklib, epub
+
+
+@lru_cache(maxsize=None)
+def _import_lxml():
+    """lxml可选：可用时用C实现的HTML解析器提取正文，否则返回None，退回BeautifulSoup的html.parser"""
+    try:
+        import lxml.html
+        from lxml import etree
+    except ImportError:
+        return None
+    return lxml.html, etree
+
+
+def extract_text(html: bytes) -> str:
+    """提取HTML中的纯文本，去掉脚本和样式"""
+    parsers = _import_lxml()
+    if parsers is not None:
+        html_parser, etree = parsers
+        try:
+            root = html_parser.fromstring(html)
+            for element in root.xpath('//script|//style'):
+                element.drop_tree()
+            return root.text_content()
+        except (ValueError, etree.ParserError):
+            pass
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    for script in soup(["script", "style"]):
+        script.extract()
+    return soup.get_text()
+
+
+class EpubDocument(Document):
+    """按书脊（spine）逐项惰性加载的EPUB文档
+
+    打开时只读取书脊和目录。每个书脊项的文本在全文中占据一段区间，各项之间以换行分隔，
+    区间起点用累加计数器得到；有缓存的版面信息时连长度都不必计算。
+    阅读时只提取正在显示的书脊项，并在后台预取下一项，提取结果保存在LRU缓存中。
+    """
+    PAGE_SIZE = 32 * 1024  # 阅读视图分页的目标字符数
+    CACHE_ITEMS = 8  # 缓存的已提取书脊项数
+
+    def __init__(self, file_path: str, layout: Optional[Dict] = None,
+                 progress_callback: Optional[Callable[[int, str], None]] = None,
+                 title_func: Optional[Callable[[str], Optional[str]]] = None):
+        super().__init__()
+        self.file_path = file_path
+        # 没有目录时从各书脊项开头识别章节标题的函数
+        self.title_func = title_func
+        ebooklib, epub = import_ebooklib()
+        self.book = epub.read_epub(file_path)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._prefetcher = ThreadPoolExecutor(max_workers=1)
+
+        # 书脊中的文档项（按阅读顺序）
+        self.items = []
+        for idref, _ in self.book.spine:
+            item = self.book.get_item_with_id(idref)
+            if item is not None and item.get_type() == ebooklib.ITEM_DOCUMENT:
+                self.items.append(item)
+        self.item_index = {item.file_name: index for index, item in enumerate(self.items)}
+        self.metadata = self._read_metadata()
+
+        # 第i项占据[item_offsets[i], item_offsets[i+1])，其中最后一个字符是分隔用的换行
+        if layout and len(layout.get('item_offsets', [])) == len(self.items) + 1:
+            self.item_offsets = array('q', layout['item_offsets'])
+            self._page_offsets = list(layout['page_offsets'])
+            self.fallback_titles = []
+        else:
+            self._index_items(progress_callback)
+
+        self.chapters = self._toc_chapters()
+
+    def _read_metadata(self) -> Dict:
+        ebooklib, _ = import_ebooklib()
+        metadata = {
+            'title': self.book.get_metadata('DC', 'title'),
+            'creator': self.book.get_metadata('DC', 'creator'),
+            'language': self.book.get_metadata('DC', 'language'),
+            'publisher': self.book.get_metadata('DC', 'publisher'),
+            'identifier': self.book.get_metadata('DC', 'identifier')
+        }
+        for item in self.book.get_items_of_type(ebooklib.ITEM_COVER):
+            metadata['cover'] = item
+        return metadata
+
+    @traced('decode')
+    def _index_items(self, progress_callback) -> None:
+        """没有缓存时逐项提取一次文本，只记录长度和分页位置，不保留文本"""
+        self.item_offsets = array('q', [0])
+        self._page_offsets = []
+        self.fallback_titles = []  # (书脊项序号, 标题)，目录为空时使用
+        offset = 0
+        for index, item in enumerate(self.items):
+            if progress_callback:
+                progress_callback(index * 90 // max(len(self.items), 1), '正在解析EPUB')
+            text = self._extract(index)
+            self._page_offsets.extend(offset + start for start in split_pages(text, self.PAGE_SIZE))
+            title = self.title_func(text) if self.title_func else text.strip().split('\n', 1)[0].strip()
+            if title:
+                self.fallback_titles.append((index, title))
+            offset += len(text)
+            self.item_offsets.append(offset)
+        self._page_offsets.append(offset)
+
+    def layout(self) -> Dict:
+        """可缓存的版面信息，下次打开时据此跳过逐项提取"""
+        return {'item_offsets': list(self.item_offsets), 'page_offsets': list(self._page_offsets)}
+
+    def _toc_chapters(self) -> List[Dict]:
+        """把目录（可嵌套）映射为章节，起点为对应书脊项的起始位置"""
+        chapters = []
+
+        def resolve(entry):
+            """目录项对应的书脊项序号，没有链接的分卷标题取其第一个子项"""
+            if isinstance(entry, tuple):
+                section, children = entry
+                index = resolve(section)
+                for child in children:
+                    if index is not None:
+                        break
+                    index = resolve(child)
+                return index
+            href = (getattr(entry, 'href', '') or '').split('#', 1)[0]
+            return self.item_index.get(posixpath.normpath(href)) if href else None
+
+        def walk(entries, level):
+            for entry in entries:
+                index = resolve(entry)
+                node = entry[0] if isinstance(entry, tuple) else entry
+                title = (getattr(node, 'title', '') or '').strip()
+                if title and index is not None:
+                    chapters.append({'title': title, 'start': self.item_offsets[index], 'line': 0, 'level': level})
+                if isinstance(entry, tuple):
+                    walk(entry[1], level + 1)
+
+        walk(self.book.toc, 1)
+        if not chapters:
+            # 没有目录时用各书脊项开头识别出的标题作为章节
+            chapters = [{'title': title, 'start': self.item_offsets[index], 'line': 0, 'level': 1}
+                        for index, title in self.fallback_titles]
+        return chapters
+
+    def _index_of_offset(self, position: int) -> int:
+        return min(max(0, bisect.bisect_right(self.item_offsets, position) - 1), max(0, len(self.items) - 1))
+
+    def _extract(self, index: int) -> str:
+        """提取第index个书脊项的文本，末尾附加分隔换行"""
+        text = extract_text(self.items[index].get_content())
+        return (text if text.strip() else '') + '\n'
+
+    def item_text(self, index: int) -> str:
+        """获取第index个书脊项的文本，带LRU缓存"""
+        with self._lock:
+            text = self._cache.get(index)
+            if text is not None:
+                self._cache.move_to_end(index)
+                return text
+        text = self._extract(index)
+        with self._lock:
+            self._cache[index] = text
+            while len(self._cache) > self.CACHE_ITEMS:
+                self._cache.popitem(last=False)
+        return text
+
+    def _prefetch(self, index: int) -> None:
+        """在后台提取相邻书脊项"""
+        if 0 <= index < len(self.items):
+            with self._lock:
+                if index in self._cache:
+                    return
+            try:
+                self._prefetcher.submit(self.item_text, index)
+            except RuntimeError:
+                # 文档已关闭
+                pass
+
+    def __len__(self) -> int:
+        return self.item_offsets[-1] if self.item_offsets else 0
+
+    def page_offsets(self) -> list:
+        """各页起始字符位置，末尾附加全文长度"""
+        return self._page_offsets
+
+    def get_range(self, start: int, end: int) -> str:
+        """获取字符区间[start, end)的文本，只提取覆盖该区间的书脊项"""
+        start = max(0, start)
+        end = min(end, len(self))
+        if start >= end:
+            return ''
+        first = self._index_of_offset(start)
+        last = bisect.bisect_left(self.item_offsets, end)
+        text = ''.join(self.item_text(i) for i in range(first, last))
+        self._prefetch(last)
+        base = self.item_offsets[first]
+        return text[start - base:end - base]
+
+    def close(self) -> None:
+        self._prefetcher.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            self._cache.clear()
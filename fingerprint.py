@@ -0,0 +1,28 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+import hashlib
+import os
+
+# 计算局部内容哈希时读取的头部/尾部字节数
+PARTIAL_HASH_SIZE = 64 * 1024
+
+
+def content_digest(file_path: str) -> str:
+    """基于文件大小与头尾内容的摘要，与路径和修改时间无关，文件移动或复制后保持不变"""
+    file_size = os.path.getsize(file_path)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(file_size).encode('ascii'))
+    with open(file_path, 'rb') as f:
+        digest.update(f.read(PARTIAL_HASH_SIZE))
+        if file_size > PARTIAL_HASH_SIZE * 2:
+            f.seek(file_size - PARTIAL_HASH_SIZE)
+        digest.update(f.read(PARTIAL_HASH_SIZE))
+    return digest.hexdigest()
+
+
+def file_fingerprint(file_path: str) -> str:
+    """文件指纹：大小 + 修改时间 + 局部内容哈希，文件内容变化后指纹随之改变"""
+    stat = os.stat(file_path)
+    return f'{content_digest(file_path)}-{stat.st_mtime_ns:x}'
@@ -0,0 +1,206 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+import os
+import re
+import sqlite3
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional
+
+from document import SUPPORTED_EXTENSIONS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    id INTEGER PRIMARY KEY,
+    file_path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    title TEXT,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    book_id INTEGER NOT NULL,
+    start INTEGER NOT NULL,
+    text BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_book ON chunks(book_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(tokens, content='', tokenize='unicode61');
+"""
+
+CHUNK_SIZE = 2000  # 每个索引片段的目标字符数
+CONTEXT_CHARS = 20  # 搜索结果中命中位置前后显示的字符数
+WORD_RUN = re.compile(r'\w+')
+
+
+def bigram_tokens(text: str) -> str:
+    """把文本转换为空格分隔的二元组词元
+
+    中文没有空格分词，FTS5的unicode61分词器会把整句当作一个词；
+    这里把每段连续的文字拆成相邻两个字符的二元组，末字再单独作为一个词元，
+    查询时任意长度的子串都能由二元组短语或前缀匹配找到。
+    """
+    tokens = []
+    for run in WORD_RUN.findall(text):
+        tokens.extend(map(str.__add__, run, run[1:]))
+        tokens.append(run[-1])
+    return ' '.join(tokens)
+
+
+def match_expression(query: str) -> str:
+    """把查询词转换为FTS5查询表达式，每段连续文字是一个二元组短语，各段之间为AND"""
+    terms = []
+    for run in WORD_RUN.findall(query):
+        if len(run) == 1:
+            terms.append(f'"{run}"*')
+        else:
+            terms.append('"' + ' '.join(map(str.__add__, run, run[1:])) + '"')
+    return ' AND '.join(terms)
+
+
+def split_chunks(text: str, size: int = CHUNK_SIZE) -> Iterator[tuple]:
+    """在换行处把文本切分为约size字符的片段，产出(相对起点, 片段文本)"""
+    start = 0
+    while start < len(text):
+        end = start + size
+        if end < len(text):
+            newline = text.find('\n', end, end + size)
+            end = newline + 1 if newline >= 0 else end
+        yield start, text[start:end]
+        start = end
+
+
+def iter_library_files(root: str, directories: Optional[List[str]] = None) -> Iterator[os.DirEntry]:
+    """递归列出目录下所有支持格式的文件，directories不为None时同时收集经过的目录"""
+    try:
+        entries = list(os.scandir(root))
+    except OSError:
+        return
+    if directories is not None:
+        directories.append(root)
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_library_files(entry.path, directories)
+            elif entry.name.lower().endswith(SUPPORTED_EXTENSIONS):
+                yield entry
+        except OSError:
+            continue
+
+
+@dataclass
+class LibraryHit:
+    """跨书搜索的一条结果"""
+    file_path: str
+    title: str
+    position: int  # 命中位置在该书全文中的字符位置
+    context: str
+
+
+class LibraryIndex:
+    """整个小说文件夹的全文检索索引（SQLite FTS5）
+
+    每本书的全文按约CHUNK_SIZE字符切成片段，片段原文压缩后保存在chunks表中用于显示上下文，
+    二元组词元只写入无内容（content=''）的FTS5表，索引不重复保存原文。
+    文件的大小和修改时间未变时跳过，只重建有变化的书。
+    每个线程使用各自的LibraryIndex实例（各自的连接），WAL模式下建立索引时仍可查询。
+    """
+
+    def __init__(self, db_file: str):
+        self.db_file = db_file
+        self._conn = sqlite3.connect(db_file)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def indexed_books(self) -> Dict[str, tuple]:
+        """已建立索引的书：路径 -> (id, 大小, 修改时间)"""
+        rows = self._conn.execute('SELECT id, file_path, size, mtime_ns FROM books').fetchall()
+        return {file_path: (book_id, size, mtime_ns) for book_id, file_path, size, mtime_ns in rows}
+
+    def remove_book(self, book_id: int) -> None:
+        """删除一本书的索引，无内容的FTS5表需要提供原词元才能删除"""
+        rows = self._conn.execute('SELECT id, text FROM chunks WHERE book_id = ?', (book_id,)).fetchall()
+        self._conn.executemany(
+            "INSERT INTO chunks_fts (chunks_fts, rowid, tokens) VALUES ('delete', ?, ?)",
+            [(chunk_id, bigram_tokens(zlib.decompress(text).decode('utf-8'))) for chunk_id, text in rows])
+        self._conn.execute('DELETE FROM chunks WHERE book_id = ?', (book_id,))
+        self._conn.execute('DELETE FROM books WHERE id = ?', (book_id,))
+
+    def index_book(self, file_path: str, size: int, mtime_ns: int, title: str,
+                   pages: Iterator[tuple], is_cancelled: Optional[Callable[[], bool]] = None) -> bool:
+        """在一个事务中（重新）建立一本书的索引，pages产出(页起点, 页文本)；取消时回滚并返回False"""
+        with self._conn:
+            row = self._conn.execute('SELECT id FROM books WHERE file_path = ?', (file_path,)).fetchone()
+            if row:
+                self.remove_book(row[0])
+            cursor = self._conn.execute(
+                'INSERT INTO books (file_path, size, mtime_ns, title, indexed_at) VALUES (?, ?, ?, ?, ?)',
+                (file_path, size, mtime_ns, title, time.time()))
+            book_id = cursor.lastrowid
+            for page_start, text in pages:
+                if is_cancelled and is_cancelled():
+                    self._conn.rollback()
+                    return False
+                for offset, chunk in split_chunks(text):
+                    if not chunk.strip():
+                        continue
+                    chunk_id = self._conn.execute(
+                        'INSERT INTO chunks (book_id, start, text) VALUES (?, ?, ?)',
+                        (book_id, page_start + offset, zlib.compress(chunk.encode('utf-8')))).lastrowid
+                    self._conn.execute('INSERT INTO chunks_fts (rowid, tokens) VALUES (?, ?)',
+                                       (chunk_id, bigram_tokens(chunk)))
+        return True
+
+    def prune(self, existing_paths: set) -> int:
+        """删除文件已不存在的书，返回删除的书数"""
+        removed = 0
+        with self._conn:
+            for file_path, (book_id, _, _) in self.indexed_books().items():
+                if file_path not in existing_paths:
+                    self.remove_book(book_id)
+                    removed += 1
+        return removed
+
+    def remove_paths(self, file_paths: List[str]) -> int:
+        """删除指定文件的索引，返回删除的书数"""
+        removed = 0
+        with self._conn:
+            for file_path in file_paths:
+                row = self._conn.execute('SELECT id FROM books WHERE file_path = ?', (file_path,)).fetchone()
+                if row:
+                    self.remove_book(row[0])
+                    removed += 1
+        return removed
+
+    def search(self, query: str, limit: int = 200) -> List[LibraryHit]:
+        """查找包含query的片段，返回每处命中的书、位置和上下文"""
+        expression = match_expression(query)
+        if not expression:
+            return []
+        # 片段按写入顺序（同一本书内按位置）返回，逐行读取，凑够limit条即停止
+        rows = self._conn.execute(
+            'SELECT books.file_path, books.title, chunks.start, chunks.text FROM chunks_fts '
+            'JOIN chunks ON chunks.id = chunks_fts.rowid JOIN books ON books.id = chunks.book_id '
+            'WHERE chunks_fts MATCH ?', (expression,))
+        # 直接在原文上不区分大小写地匹配：先转小写再查找时，个别字符转小写后长度改变，位置会错开
+        needle = re.compile(re.escape(query), re.IGNORECASE)
+        hits = []
+        for file_path, title, start, blob in rows:
+            text = zlib.decompress(blob).decode('utf-8')
+            # FTS按各段文字分别匹配且不区分大小写，用原文确认完整的查询词
+            match = needle.search(text)
+            if match is None:
+                continue
+            context = text[max(0, match.start() - CONTEXT_CHARS):match.end() + CONTEXT_CHARS]
+            hits.append(LibraryHit(file_path, title, start + match.start(), ' '.join(context.split())))
+            if len(hits) >= limit:
+                break
+        return hits
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,134 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+import bisect
+import os
+import time
+from typing import Dict, List, Optional
+
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLineEdit, QListView
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QSortFilterProxyModel, pyqtSignal
+
+from settings import BookInfo
+
+class LibraryModel(QAbstractListModel):
+    """书库列表模型，按书名排序
+
+    扫描结果逐条插入、更新或删除，视图只重绘变化的行，不需要清空后整体重建。
+    """
+    FilePathRole = Qt.ItemDataRole.UserRole
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.books: List[BookInfo] = []
+        self.keys: List[tuple] = []  # 与books一一对应的排序键
+        self.rows: Dict[str, BookInfo] = {}  # 路径 -> 元数据
+
+    @staticmethod
+    def sort_key(book: BookInfo) -> tuple:
+        return book.title.lower(), book.file_path
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.books)
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.books):
+            return None
+        book = self.books[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return book.title
+        if role == Qt.ItemDataRole.ToolTipRole:
+            lines = [book.file_path, f'大小：{book.size / 1024 / 1024:.1f} MB']
+            if book.encoding:
+                lines.append(f'编码：{book.encoding}')
+            if book.chapter_count:
+                lines.append(f'章节：{book.chapter_count}')
+            if book.last_opened:
+                lines.append(f'上次打开：{time.strftime("%Y-%m-%d %H:%M", time.localtime(book.last_opened))}')
+            return '\n'.join(lines)
+        if role == self.FilePathRole:
+            return book.file_path
+        return None
+
+    def set_books(self, books: List[BookInfo]) -> None:
+        """整体替换列表，只在启动加载缓存和切换书库文件夹时使用"""
+        self.beginResetModel()
+        self.books = sorted(books, key=self.sort_key)
+        self.keys = [self.sort_key(book) for book in self.books]
+        self.rows = {book.file_path: book for book in self.books}
+        self.endResetModel()
+
+    def book(self, file_path: str) -> Optional[BookInfo]:
+        return self.rows.get(file_path)
+
+    def file_path(self, row: int) -> Optional[str]:
+        return self.books[row].file_path if 0 <= row < len(self.books) else None
+
+    def _row_of(self, book: BookInfo) -> int:
+        return bisect.bisect_left(self.keys, self.sort_key(book))
+
+    def upsert(self, book: BookInfo) -> None:
+        """插入新书或更新已有的书"""
+        old = self.rows.get(book.file_path)
+        if old is not None and self.sort_key(old) == self.sort_key(book):
+            row = self._row_of(old)
+            self.books[row] = book
+            self.rows[book.file_path] = book
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+            return
+        if old is not None:
+            self.remove(book.file_path)
+        row = self._row_of(book)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.books.insert(row, book)
+        self.keys.insert(row, self.sort_key(book))
+        self.rows[book.file_path] = book
+        self.endInsertRows()
+
+    def remove(self, file_path: str) -> None:
+        book = self.rows.pop(file_path, None)
+        if book is None:
+            return
+        row = self._row_of(book)
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.books[row]
+        del self.keys[row]
+        self.endRemoveRows()
+
+    def paths_under(self, directory: str) -> List[str]:
+        """位于directory（含子目录）中的书"""
+        prefix = os.path.join(directory, '')
+        return [path for path in self.rows if path.startswith(prefix)]
+
+class LibraryView(QWidget):
+    """书库面板：按书名过滤的列表，双击打开"""
+    book_activated = pyqtSignal(str)  # 文件路径
+
+    def __init__(self, model: LibraryModel, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+
+        self.filter_input = QLineEdit(self)
+        self.filter_input.setPlaceholderText('按书名过滤...')
+        self.filter_input.setClearButtonEnabled(True)
+        layout.addWidget(self.filter_input)
+
+        # 过滤在代理模型中完成，不改动书库模型本身
+        self.proxy = QSortFilterProxyModel(self)
+        self.proxy.setSourceModel(model)
+        self.proxy.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.filter_input.textChanged.connect(self.proxy.setFilterFixedString)
+
+        self.list_view = QListView(self)
+        self.list_view.setModel(self.proxy)
+        self.list_view.setUniformItemSizes(True)  # 所有行等高，数千本书时滚动不必逐行测量
+        self.list_view.activated.connect(self.on_activated)
+        layout.addWidget(self.list_view)
+
+    def on_activated(self, index: QModelIndex) -> None:
+        file_path = index.data(LibraryModel.FilePathRole)
+        if file_path:
+            self.book_activated.emit(file_path)
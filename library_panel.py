@@ -0,0 +1,225 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+import os
+from typing import List, Optional
+
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, QLabel,
+                             QListWidget, QListWidgetItem)
+from PyQt6.QtCore import Qt, QObject, QRunnable, QThreadPool, pyqtSignal
+
+from file_handler import FileHandler
+from library_index import LibraryIndex, iter_library_files
+
+class IndexerSignals(QObject):
+    """LibraryIndexer的信号"""
+    progress = pyqtSignal(int, int, str)  # 已处理, 待处理总数, 当前文件名
+    finished = pyqtSignal(int, int)  # 更新的书数, 删除的书数
+
+class LibraryIndexer(QRunnable):
+    """在后台增量更新小说文件夹的全文索引，只处理新增、修改和删除的文件
+
+    changed和removed为None时扫描整个文件夹找出变化，否则只处理给出的文件（来自书库的文件夹监视）。
+    """
+
+    def __init__(self, db_file: str, novels_dir: str, changed: Optional[List[str]] = None,
+                 removed: Optional[List[str]] = None):
+        super().__init__()
+        self.db_file = db_file
+        self.novels_dir = novels_dir
+        self.changed = changed
+        self.removed = removed
+        self.signals = IndexerSignals()
+        self.cancelled = False
+        self.handler: Optional[FileHandler] = None
+
+    def cancel(self) -> None:
+        self.cancelled = True
+        if self.handler:
+            self.handler.cancel()
+
+    def run(self) -> None:
+        # 连接只在本线程中使用
+        index = LibraryIndex(self.db_file)
+        updated = removed = 0
+        try:
+            if self.changed is None:
+                files = {entry.path: entry.stat() for entry in iter_library_files(self.novels_dir)}
+                removed = index.prune(set(files))
+            else:
+                files = {}
+                for path in self.changed:
+                    try:
+                        files[path] = os.stat(path)
+                    except OSError:
+                        # 已被删除，书库随后会报告
+                        continue
+                removed = index.remove_paths(self.removed or [])
+            indexed = index.indexed_books()
+            pending = [(path, stat) for path, stat in sorted(files.items())
+                       if indexed.get(path, (None, None, None))[1:] != (stat.st_size, stat.st_mtime_ns)]
+            for done, (path, stat) in enumerate(pending):
+                if self.cancelled:
+                    break
+                self.signals.progress.emit(done, len(pending), os.path.basename(path))
+                if self._index_file(index, path, stat):
+                    updated += 1
+        finally:
+            index.close()
+        if not self.cancelled:
+            self.signals.finished.emit(updated, removed)
+
+    def _index_file(self, index: LibraryIndex, path: str, stat: os.stat_result) -> bool:
+        """用与阅读视图相同的文档对象逐页读取文本，保证索引中的位置可以直接用于跳转"""
+        self.handler = FileHandler()
+        if self.cancelled:
+            return False
+        try:
+            document = self.handler.open_document(path)
+        except Exception:
+            # 无法解析的文件跳过，下次文件变化后再试
+            return False
+        try:
+            starts = document.page_offsets()
+            pages = ((starts[i], document.get_range(starts[i], starts[i + 1])) for i in range(len(starts) - 1))
+            title = os.path.splitext(os.path.basename(path))[0]
+            return index.index_book(path, stat.st_size, stat.st_mtime_ns, title, pages, lambda: self.cancelled)
+        except Exception:
+            return False
+        finally:
+            document.close()
+            self.handler = None
+
+class LibrarySearchPanel(QWidget):
+    """全库搜索面板：在小说文件夹的所有书中查找，点击结果打开对应的书并跳转到命中位置"""
+    hit_activated = pyqtSignal(str, int)  # 文件路径, 字符位置
+
+    def __init__(self, db_file: str, parent=None):
+        super().__init__(parent)
+        self.db_file = db_file
+        self.index: Optional[LibraryIndex] = None  # GUI线程的查询连接，第一次查询时打开
+        self.indexer: Optional[LibraryIndexer] = None
+        self.novels_dir = ''
+        # 索引更新进行中时书库报告的变化，完成后再处理
+        self.pending_changed = set()
+        self.pending_removed = set()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+
+        input_layout = QHBoxLayout()
+        self.search_input = QLineEdit(self)
+        self.search_input.setPlaceholderText('在所有小说中搜索...')
+        self.search_input.setClearButtonEnabled(True)
+        self.search_input.returnPressed.connect(self.search)
+        input_layout.addWidget(self.search_input)
+
+        self.search_button = QPushButton('搜索', self)
+        self.search_button.clicked.connect(self.search)
+        input_layout.addWidget(self.search_button)
+
+        self.update_button = QPushButton('更新索引', self)
+        self.update_button.clicked.connect(lambda: self.update_index(self.novels_dir))
+        input_layout.addWidget(self.update_button)
+        layout.addLayout(input_layout)
+
+        self.status_label = QLabel(self)
+        layout.addWidget(self.status_label)
+
+        self.result_list = QListWidget(self)
+        self.result_list.itemActivated.connect(self.on_item_activated)
+        self.result_list.itemClicked.connect(self.on_item_activated)
+        layout.addWidget(self.result_list)
+
+    def update_index(self, novels_dir: str) -> None:
+        """在后台增量更新索引，正在进行的更新会被取消后重新开始"""
+        self.cancel()
+        self.novels_dir = novels_dir
+        # 完整更新会重新扫描整个文件夹，已积累的变化不必再单独处理
+        self.pending_changed.clear()
+        self.pending_removed.clear()
+        if not novels_dir or not os.path.isdir(novels_dir):
+            self.status_label.setText('请先设置默认小说文件夹')
+            return
+        self.start_indexer(LibraryIndexer(self.db_file, novels_dir))
+
+    def update_files(self, changed: List[str], removed: List[str]) -> None:
+        """只更新书库报告的新增、修改和删除的文件
+
+        还没有做过完整更新时忽略：启动后稍后进行的完整更新会处理全部变化。
+        """
+        if not self.novels_dir:
+            return
+        prefix = os.path.join(self.novels_dir, '')
+        for path in changed:
+            if path.startswith(prefix):
+                self.pending_changed.add(path)
+                self.pending_removed.discard(path)
+        for path in removed:
+            if path.startswith(prefix):
+                self.pending_removed.add(path)
+                self.pending_changed.discard(path)
+        if not self.indexer:
+            self.start_pending()
+
+    def start_pending(self) -> None:
+        if not self.pending_changed and not self.pending_removed:
+            return
+        indexer = LibraryIndexer(self.db_file, self.novels_dir, sorted(self.pending_changed),
+                                 sorted(self.pending_removed))
+        self.pending_changed.clear()
+        self.pending_removed.clear()
+        self.start_indexer(indexer)
+
+    def start_indexer(self, indexer: LibraryIndexer) -> None:
+        self.indexer = indexer
+        self.indexer.signals.progress.connect(self.on_index_progress)
+        self.indexer.signals.finished.connect(self.on_index_finished)
+        self.pool.start(self.indexer)
+
+    def cancel(self) -> None:
+        if self.indexer:
+            self.indexer.cancel()
+            self.indexer = None
+
+    def on_index_progress(self, done: int, total: int, name: str) -> None:
+        if self.indexer and self.sender() is self.indexer.signals:
+            self.status_label.setText(f'正在更新索引 {done}/{total}：{name}')
+
+    def on_index_finished(self, updated: int, removed: int) -> None:
+        if not self.indexer or self.sender() is not self.indexer.signals:
+            return
+        self.indexer = None
+        self.status_label.setText(f'索引已更新：{updated}本书有变化，移除{removed}本' if updated or removed
+                                  else '索引已是最新')
+        self.start_pending()
+
+    def search(self) -> None:
+        """查询索引并列出结果"""
+        query = self.search_input.text().strip()
+        self.result_list.clear()
+        if not query:
+            return
+        if self.index is None:
+            self.index = LibraryIndex(self.db_file)
+        hits = self.index.search(query)
+        for hit in hits:
+            item = QListWidgetItem(f'{hit.title}：{hit.context}')
+            item.setData(Qt.ItemDataRole.UserRole, (hit.file_path, hit.position))
+            self.result_list.addItem(item)
+        self.status_label.setText(f'找到{len(hits)}处' if hits else '没有找到')
+
+    def on_item_activated(self, item: QListWidgetItem) -> None:
+        file_path, position = item.data(Qt.ItemDataRole.UserRole)
+        self.hit_activated.emit(file_path, position)
+
+    def shutdown(self) -> None:
+        """停止后台索引并关闭查询连接，关闭窗口时调用"""
+        self.cancel()
+        self.pool.waitForDone()
+        if self.index is not None:
+            self.index.close()
+            self.index = None
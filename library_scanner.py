@@ -0,0 +1,183 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+import os
+import time
+from typing import Dict, List, Optional
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QTimer, QFileSystemWatcher, pyqtSignal
+
+from library_index import iter_library_files
+from library_model import LibraryModel
+from settings import BookInfo
+
+class ScannerSignals(QObject):
+    """LibraryScanner的信号"""
+    batch_found = pyqtSignal(object)  # {路径: (大小, 修改时间)}，每BATCH_SIZE个文件发出一次
+    finished = pyqtSignal(object, object, object)  # 扫描的目录, 找到的全部文件路径, 经过的所有目录
+
+class LibraryScanner(QRunnable):
+    """在后台用os.scandir递归扫描若干目录，DirEntry自带的stat结果避免逐个文件再次stat"""
+    BATCH_SIZE = 500
+
+    def __init__(self, directories: List[str]):
+        super().__init__()
+        self.directories = directories
+        self.signals = ScannerSignals()
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    def run(self) -> None:
+        found = set()
+        visited = []
+        batch: Dict[str, tuple] = {}
+        for directory in self.directories:
+            for entry in iter_library_files(directory, visited):
+                if self.cancelled:
+                    return
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                found.add(entry.path)
+                batch[entry.path] = (stat.st_size, stat.st_mtime_ns)
+                if len(batch) >= self.BATCH_SIZE:
+                    self.signals.batch_found.emit(batch)
+                    batch = {}
+        if batch:
+            self.signals.batch_found.emit(batch)
+        self.signals.finished.emit(self.directories, found, visited)
+
+class Library(QObject):
+    """书库：缓存的元数据、后台扫描和文件夹监视
+
+    启动时先显示数据库中缓存的列表，再在后台扫描整个文件夹校正；
+    之后由QFileSystemWatcher报告发生变化的目录，合并片刻后只重新扫描这些目录。
+    """
+    RESCAN_DELAY_MS = 500  # 目录变化后等待合并的时间
+
+    books_changed = pyqtSignal(object, object)  # 新增或修改的文件路径列表, 删除的文件路径列表
+
+    def __init__(self, settings_manager, parent=None):
+        super().__init__(parent)
+        self.settings_manager = settings_manager
+        self.model = LibraryModel(self)
+        self.root = ''
+        self.scanner: Optional[LibraryScanner] = None
+        self.pending_dirs = set()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.on_directory_changed)
+        self.rescan_timer = QTimer(self)
+        self.rescan_timer.setSingleShot(True)
+        self.rescan_timer.setInterval(self.RESCAN_DELAY_MS)
+        self.rescan_timer.timeout.connect(self.rescan_pending)
+
+    def set_root(self, root: str) -> None:
+        """切换书库文件夹：先显示缓存中位于该文件夹的书，再在后台完整扫描"""
+        self.root = root
+        self.cancel()
+        if self.watcher.directories():
+            self.watcher.removePaths(self.watcher.directories())
+        if not root or not os.path.isdir(root):
+            self.model.set_books([])
+            return
+        prefix = os.path.join(root, '')
+        books = self.settings_manager.load_library()
+        self.model.set_books([book for book in books if book.file_path.startswith(prefix)])
+        # 不属于当前文件夹的缓存已无用
+        stale = [book.file_path for book in books if not book.file_path.startswith(prefix)]
+        if stale:
+            self.settings_manager.remove_library(stale)
+        self.scan([root])
+
+    def cancel(self) -> None:
+        if self.scanner:
+            self.scanner.cancel()
+            self.scanner = None
+        self.rescan_timer.stop()
+        self.pending_dirs.clear()
+
+    def scan(self, directories: List[str]) -> None:
+        if self.scanner:
+            # 正在扫描时推迟到扫描结束后再处理
+            self.pending_dirs.update(directories)
+            return
+        self.scanner = LibraryScanner(directories)
+        self.scanner.signals.batch_found.connect(self.on_batch_found)
+        self.scanner.signals.finished.connect(self.on_scan_finished)
+        self.pool.start(self.scanner)
+
+    def on_batch_found(self, batch: Dict[str, tuple]) -> None:
+        if not self.scanner or self.sender() is not self.scanner.signals:
+            return
+        changed = []
+        for path, (size, mtime_ns) in batch.items():
+            old = self.model.book(path)
+            if old is not None and (old.size, old.mtime_ns) == (size, mtime_ns):
+                continue
+            title = os.path.splitext(os.path.basename(path))[0]
+            book = BookInfo(path, title, size, mtime_ns,
+                            last_opened=old.last_opened if old else 0.0)
+            self.model.upsert(book)
+            changed.append(book)
+        if changed:
+            self.settings_manager.save_library(changed)
+            self.books_changed.emit([book.file_path for book in changed], [])
+
+    def on_scan_finished(self, directories: List[str], found: set, visited: List[str]) -> None:
+        if not self.scanner or self.sender() is not self.scanner.signals:
+            return
+        self.scanner = None
+        # 扫描范围内不再存在的文件从列表中删除
+        removed = [path for directory in directories for path in self.model.paths_under(directory)
+                   if path not in found]
+        for path in removed:
+            self.model.remove(path)
+        if removed:
+            self.settings_manager.remove_library(removed)
+            self.books_changed.emit([], removed)
+        # 监视扫描过的所有目录，已删除的目录由QFileSystemWatcher自动移除
+        watched = set(self.watcher.directories())
+        new_dirs = [directory for directory in visited if directory not in watched]
+        if new_dirs:
+            self.watcher.addPaths(new_dirs)
+        if self.pending_dirs:
+            self.rescan_timer.start()
+
+    def on_directory_changed(self, directory: str) -> None:
+        self.pending_dirs.add(directory)
+        self.rescan_timer.start()
+
+    def rescan_pending(self) -> None:
+        """只重新扫描发生变化的目录，子目录已包含在父目录的扫描中时跳过"""
+        if self.scanner:
+            return
+        directories = sorted(self.pending_dirs)
+        self.pending_dirs.clear()
+        roots = []
+        for directory in directories:
+            if not any(directory.startswith(os.path.join(root, '')) for root in roots):
+                roots.append(directory)
+        # 已删除的目录扫描结果为空，其中的书会被移除
+        self.scan(roots)
+
+    def record_opened(self, file_path: str, encoding: Optional[str], chapter_count: int) -> None:
+        """打开书籍后记录编码、章节数和打开时间"""
+        book = self.model.book(file_path)
+        if book is None:
+            return
+        book = BookInfo(book.file_path, book.title, book.size, book.mtime_ns,
+                        encoding, chapter_count, time.time())
+        self.model.upsert(book)
+        self.settings_manager.save_library([book])
+
+    def shutdown(self) -> None:
+        """停止后台扫描，关闭窗口时调用"""
+        self.cancel()
+        self.pool.waitForDone()
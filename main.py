@@ -4,19 +4,42 @@
 
 import sys
 import os
-import chardet
+import multiprocessing
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QMenuBar, QStatusBar, QToolBar, QFileDialog, QSizePolicy,
-                             QComboBox, QSlider, QSpinBox, QLabel, QHBoxLayout, QDialog, QDialogButtonBox)
+                             QComboBox, QSlider, QSpinBox, QLabel, QHBoxLayout, QDialog, QDialogButtonBox,
+                             QDockWidget)
 from PyQt6.QtGui import QAction, QKeySequence, QShortcut, QIcon, QCursor
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QThreadPool, QTimer
 from reader_view import ReaderView
 from settings import SettingsManager
+from document_loader import DocumentLoader
+from progress_tracker import ProgressTracker
+from document import FILE_DIALOG_FILTER
+from search_panel import SearchPanel
+from library_panel import LibrarySearchPanel
+from library_model import LibraryView
+from library_scanner import Library
+from chapter_navigator import ChapterNavigator
+import tracing
+
+# 状态栏性能显示中依次列出的跟踪跨度
+PERF_OVERLAY_SPANS = ['detect_encoding', 'decode', 'restore_layout', 'chapterize', 'load', 'render',
+                      'show_document', 'paginate']
 
 class AdjustmentDialog(QDialog):
-    def __init__(self, parent=None, title="调整", value=0, min_value=0, max_value=100, step=1):
+    PREVIEW_INTERVAL_MS = 50  # 拖动滑块时预览的最短间隔
+    
+    def __init__(self, parent=None, title="调整", value=0, min_value=0, max_value=100, step=1, preview=None):
         super().__init__(parent)
         self.setWindowTitle(title)
+        # 可选的预览回调：拖动时实时应用，连续的变化合并为每PREVIEW_INTERVAL_MS最多一次，取消时恢复原值
+        self.preview = preview
+        self.original_value = value
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(self.PREVIEW_INTERVAL_MS)
+        self.preview_timer.timeout.connect(self.apply_preview)
         
         layout = QVBoxLayout(self)
         
@@ -43,6 +66,8 @@ class AdjustmentDialog(QDialog):
         # 连接滑块和数值输入框
         self.slider.valueChanged.connect(self.spin_box.setValue)
         self.spin_box.valueChanged.connect(self.slider.setValue)
+        if preview:
+            self.spin_box.valueChanged.connect(self.schedule_preview)
         
         # 添加到主布局
         layout.addLayout(input_layout)
@@ -58,6 +83,20 @@ class AdjustmentDialog(QDialog):
     
     def get_value(self):
         return self.spin_box.value()
+    
+    def schedule_preview(self):
+        # 计时器运行期间的变化只更新数值，到时只应用最新的值
+        if not self.preview_timer.isActive():
+            self.preview_timer.start()
+    
+    def apply_preview(self):
+        self.preview(self.get_value())
+    
+    def reject(self):
+        if self.preview:
+            self.preview_timer.stop()
+            self.preview(self.original_value)
+        super().reject()
 
 class ReaderWindow(QMainWindow):
     def __init__(self):
@@ -66,6 +105,8 @@ class ReaderWindow(QMainWindow):
         # 设置更小的最小尺寸，允许窗口更自由地缩放
         self.setMinimumSize(200, 150)
         self.current_file = None
+        self.loader = None  # 正在进行的后台加载任务
+        self.pending_position = None  # 加载完成后要跳转的位置（来自全库搜索结果）
         # 设置应用图标 - 使用绝对路径确保任务栏图标正确显示
         import os
         icon_path = os.path.abspath('ikun.ico')
@@ -124,6 +165,14 @@ class ReaderWindow(QMainWindow):
         # 初始化设置管理器
         self.settings_manager = SettingsManager()
         
+        # 阅读进度自动保存
+        self.progress_tracker = ProgressTracker(self.settings_manager, self)
+        
+        # 书库：先显示缓存的列表，再在后台扫描并监视小说文件夹；
+        # 启动时先打开上次阅读的书，书显示出来之后才开始扫描（见start_library）
+        self.library = Library(self.settings_manager, self)
+        self.library_started = False
+        
         # 创建中央部件
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -133,8 +182,47 @@ class ReaderWindow(QMainWindow):
         
         # 创建阅读视图
         self.reader_view = ReaderView(self)
+        self.reader_view.position_changed.connect(self.on_position_changed)
+        self.reader_view.set_auto_scroll_interval(self.settings_manager.preferences.auto_scroll_interval)
         self.main_layout.addWidget(self.reader_view)
         
+        # 书内搜索面板，默认隐藏
+        self.search_panel = SearchPanel(self)
+        self.search_panel.hit_activated.connect(self.reader_view.jump_to_position)
+        self.search_panel.hits_changed.connect(self.reader_view.set_search_highlights)
+        self.search_dock = QDockWidget('搜索', self)
+        self.search_dock.setWidget(self.search_panel)
+        self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.search_dock)
+        self.search_dock.hide()
+        
+        # 全库搜索面板，与书内搜索共用右侧停靠区域
+        self.library_panel = LibrarySearchPanel(self.settings_manager.library_db_file, self)
+        self.library_panel.hit_activated.connect(self.open_at_position)
+        # 书库监视到的文件变化同步更新全文索引
+        self.library.books_changed.connect(self.library_panel.update_files)
+        self.library_dock = QDockWidget('全库搜索', self)
+        self.library_dock.setWidget(self.library_panel)
+        self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.library_dock)
+        self.tabifyDockWidget(self.search_dock, self.library_dock)
+        self.library_dock.hide()
+        
+        # 书库面板，停靠在左侧
+        self.library_view = LibraryView(self.library.model, self)
+        self.library_view.book_activated.connect(self.load_file)
+        self.books_dock = QDockWidget('书库', self)
+        self.books_dock.setWidget(self.library_view)
+        self.addDockWidget(Qt.DockWidgetArea.LeftDockWidgetArea, self.books_dock)
+        self.books_dock.hide()
+        
+        # 章节目录面板，与书库面板共用左侧停靠区域
+        self.chapter_navigator = ChapterNavigator(self.reader_view.chapter_model, self)
+        self.chapter_navigator.chapter_activated.connect(self.reader_view.jump_to_position)
+        self.chapters_dock = QDockWidget('章节', self)
+        self.chapters_dock.setWidget(self.chapter_navigator)
+        self.addDockWidget(Qt.DockWidgetArea.LeftDockWidgetArea, self.chapters_dock)
+        self.tabifyDockWidget(self.books_dock, self.chapters_dock)
+        self.chapters_dock.hide()
+        
         # 初始化UI组件
         self.init_ui()
         
@@ -367,7 +455,7 @@ class ReaderWindow(QMainWindow):
             # 重新添加小说选择下拉框
             self.novel_selector = QComboBox()
             self.novel_selector.setMinimumWidth(200)
-            self.novel_selector.currentIndexChanged.connect(self.on_novel_selected)
+            self.novel_selector.activated.connect(self.on_novel_selected)
             self.toolbar.addWidget(self.novel_selector)
             self.update_novel_list()
             
@@ -384,6 +472,8 @@ class ReaderWindow(QMainWindow):
             auto_scroll_action = QAction('自动滚动', self)
             auto_scroll_action.setCheckable(True)
             auto_scroll_action.triggered.connect(lambda checked: self.reader_view.toggle_auto_scroll())
+            auto_scroll_action.setChecked(self.reader_view.auto_scroller.active)
+            self.reader_view.auto_scroller.state_changed.connect(auto_scroll_action.setChecked)
             self.toolbar.addAction(auto_scroll_action)
             
             self.toolbar.show()
@@ -428,7 +518,7 @@ class ReaderWindow(QMainWindow):
         nav_menu = menubar.addMenu('导航')
         
         chapter_action = QAction('章节列表', self)
-        chapter_action.triggered.connect(self.reader_view.show_chapters)
+        chapter_action.triggered.connect(self.show_chapter_panel)
         nav_menu.addAction(chapter_action)
         
         bookmark_action = QAction('书签管理', self)
@@ -494,7 +584,7 @@ class ReaderWindow(QMainWindow):
         # 小说选择下拉框
         self.novel_selector = QComboBox()
         self.novel_selector.setMinimumWidth(200)
-        self.novel_selector.currentIndexChanged.connect(self.on_novel_selected)
+        self.novel_selector.activated.connect(self.on_novel_selected)
         self.toolbar.addWidget(self.novel_selector)
         self.update_novel_list()
         
@@ -511,6 +601,8 @@ class ReaderWindow(QMainWindow):
         auto_scroll_action = QAction('自动滚动', self)
         auto_scroll_action.setCheckable(True)
         auto_scroll_action.triggered.connect(lambda checked: self.reader_view.toggle_auto_scroll())
+        auto_scroll_action.setChecked(self.reader_view.auto_scroller.active)
+        self.reader_view.auto_scroller.state_changed.connect(auto_scroll_action.setChecked)
         self.toolbar.addAction(auto_scroll_action)
         
     def adjust_brightness(self, value):
@@ -521,6 +613,47 @@ class ReaderWindow(QMainWindow):
     def create_status_bar(self):
         """创建状态栏"""
         self.statusBar().showMessage('就绪')
+        # 全书分页完成后显示当前页序号和总页数
+        self.page_label = QLabel()
+        self.statusBar().addPermanentWidget(self.page_label)
+        self.reader_view.paginator.pages_updated.connect(self.update_page_label)
+        self.reader_view.paginator.finished.connect(self.update_page_label)
+        # 性能跟踪开启时在状态栏右侧显示各阶段最近一次的耗时
+        self.perf_label = QLabel()
+        self.statusBar().addPermanentWidget(self.perf_label)
+        self.perf_timer = QTimer(self)
+        self.perf_timer.setInterval(500)
+        self.perf_timer.timeout.connect(self.update_perf_overlay)
+        self.set_tracing(tracing.is_enabled())
+        
+    def set_tracing(self, enabled):
+        """开启或关闭性能跟踪及状态栏中的耗时显示"""
+        tracing.set_enabled(enabled)
+        self.perf_label.setVisible(enabled)
+        if enabled:
+            self.perf_timer.start()
+            self.update_perf_overlay()
+        else:
+            self.perf_timer.stop()
+            
+    def update_page_label(self):
+        number = self.reader_view.paginator.page_number(self.reader_view.current_position)
+        self.page_label.setText(f'第{number[0]}/{number[1]}页' if number else '')
+        
+    def update_perf_overlay(self):
+        self.perf_label.setText(tracing.summary(PERF_OVERLAY_SPANS) or '性能跟踪：等待打开文件')
+        
+    def export_trace(self):
+        """把记录的跟踪事件导出为Chrome跟踪格式的JSON文件"""
+        file_name, _ = QFileDialog.getSaveFileName(self, '导出性能跟踪', 'novelq-trace.json', 'JSON文件 (*.json)')
+        if not file_name:
+            return
+        try:
+            count = tracing.export_chrome_trace(file_name)
+        except OSError as e:
+            self.statusBar().showMessage(f'导出失败: {e}')
+            return
+        self.statusBar().showMessage(f'已导出{count}个跟踪事件: {file_name}')
         
     def set_novels_dir(self):
         """设置默认小说文件夹"""
@@ -534,35 +667,21 @@ class ReaderWindow(QMainWindow):
             self.settings_manager.preferences.novels_dir = dir_path
             self.settings_manager.save_preferences()
             self.statusBar().showMessage(f'已设置默认小说文件夹: {dir_path}')
-            self.update_novel_list()
+            self.library_started = True
+            self.library.set_root(dir_path)
+            self.library_panel.update_index(dir_path)
             
     def update_novel_list(self):
-        """更新小说列表"""
-        self.novel_selector.clear()
-        novels_dir = self.settings_manager.preferences.novels_dir
-        
-        if novels_dir and os.path.exists(novels_dir):
-            # 获取所有txt文件
-            novel_files = [f for f in os.listdir(novels_dir) if f.endswith('.txt')]
-            novel_files.sort()
-            
-            # 添加到下拉框
-            self.novel_selector.addItem('选择小说...')
-            for novel in novel_files:
-                self.novel_selector.addItem(novel)
+        """把小说下拉框绑定到书库模型，列表由书库在后台扫描后增量更新，不再整体重建"""
+        self.novel_selector.setModel(self.library.model)
+        self.novel_selector.setPlaceholderText('选择小说...')
+        self.novel_selector.setCurrentIndex(-1)
                 
     def on_novel_selected(self, index):
         """处理小说选择事件"""
-        if index <= 0:  # 忽略第一个占位项
-            return
-            
-        novel_name = self.novel_selector.currentText()
-        novels_dir = self.settings_manager.preferences.novels_dir
-        
-        if novels_dir and os.path.exists(novels_dir):
-            file_path = os.path.join(novels_dir, novel_name)
-            if os.path.exists(file_path):
-                self.load_file(file_path)
+        file_path = self.library.model.file_path(index)
+        if file_path and os.path.exists(file_path):
+            self.load_file(file_path)
     
     def open_from_novels_dir(self):
         """从默认小说文件夹打开文件"""
@@ -576,19 +695,48 @@ class ReaderWindow(QMainWindow):
             self,
             "从默认文件夹打开小说",
             novels_dir,
-            "文本文件 (*.txt);;所有文件 (*.*)"
+            FILE_DIALOG_FILTER
         )
         
         if file_name:
             self.load_file(file_name)
     
+    def show_library_panel(self):
+        """显示全库搜索面板并聚焦输入框"""
+        self.library_dock.show()
+        self.library_dock.raise_()
+        self.library_panel.search_input.setFocus()
+        self.library_panel.search_input.selectAll()
+        
+    def open_at_position(self, file_path, position):
+        """打开书并跳转到指定位置，书已打开时直接跳转"""
+        if file_path == self.current_file and not self.loader:
+            self.reader_view.jump_to_position(position)
+            return
+        self.load_file(file_path)
+        self.pending_position = position
+        
+    def show_chapter_panel(self):
+        """显示章节目录并定位到当前章节"""
+        self.reader_view.update_current_chapter()
+        self.chapters_dock.show()
+        self.chapters_dock.raise_()
+        self.chapter_navigator.list_view.setFocus()
+        
+    def show_search_panel(self):
+        """显示搜索面板并聚焦输入框"""
+        self.search_dock.show()
+        self.search_dock.raise_()
+        self.search_panel.search_input.setFocus()
+        self.search_panel.search_input.selectAll()
+        
     def open_file(self):
         """打开文件对话框"""
         file_name, _ = QFileDialog.getOpenFileName(
             self,
             "打开文件",
             "",
-            "文本文件 (*.txt);;所有文件 (*.*)"
+            FILE_DIALOG_FILTER
         )
         
         if file_name:
@@ -597,21 +745,30 @@ class ReaderWindow(QMainWindow):
     def show_font_size_dialog(self):
         """显示字体大小调节对话框"""
         current_size = self.reader_view.font_size
-        dialog = AdjustmentDialog(self, "字体大小", current_size, 8, 36, 1)
+        dialog = AdjustmentDialog(self, "字体大小", current_size, 8, 36, 1, self.reader_view.change_font_size)
         if dialog.exec() == QDialog.DialogCode.Accepted:
             self.reader_view.change_font_size(dialog.get_value())
     
     def show_line_spacing_dialog(self):
         """显示行间距调节对话框"""
         current_spacing = self.reader_view.line_spacing
-        dialog = AdjustmentDialog(self, "行间距", current_spacing, 100, 300, 10)
+        dialog = AdjustmentDialog(self, "行间距", current_spacing, 100, 300, 10, self.reader_view.change_line_spacing)
         if dialog.exec() == QDialog.DialogCode.Accepted:
             self.reader_view.change_line_spacing(dialog.get_value())
     
+    def show_auto_scroll_dialog(self):
+        """显示自动滚动速度调节对话框，数值为每滚动一个像素的毫秒数，越小越快"""
+        current_interval = self.settings_manager.preferences.auto_scroll_interval
+        dialog = AdjustmentDialog(self, "滚动间隔(毫秒/像素)", current_interval, 5, 200, 5)
+        if dialog.exec() == QDialog.DialogCode.Accepted:
+            self.settings_manager.preferences.auto_scroll_interval = dialog.get_value()
+            self.settings_manager.save_preferences()
+            self.reader_view.set_auto_scroll_interval(dialog.get_value())
+    
     def show_contrast_dialog(self):
         """显示对比度调节对话框"""
         current_contrast = self.reader_view.contrast_level
-        dialog = AdjustmentDialog(self, "对比度", current_contrast, 50, 150, 5)
+        dialog = AdjustmentDialog(self, "对比度", current_contrast, 50, 150, 5, self.reader_view.adjust_contrast)
         if dialog.exec() == QDialog.DialogCode.Accepted:
             self.reader_view.adjust_contrast(dialog.get_value())
     
@@ -637,11 +794,17 @@ class ReaderWindow(QMainWindow):
         set_novels_dir_action.triggered.connect(self.set_novels_dir)
         file_menu.addAction(set_novels_dir_action)
         
+        # 书库面板
+        library_action = QAction('书库', self)
+        library_action.setShortcut('Ctrl+L')
+        library_action.triggered.connect(lambda: (self.books_dock.show(), self.books_dock.raise_()))
+        file_menu.addAction(library_action)
+        
         # 导航菜单
         nav_menu = menubar.addMenu('导航')
         
         chapter_action = QAction('章节列表', self)
-        chapter_action.triggered.connect(self.reader_view.show_chapters)
+        chapter_action.triggered.connect(self.show_chapter_panel)
         nav_menu.addAction(chapter_action)
         
         bookmark_action = QAction('书签管理', self)
@@ -652,6 +815,28 @@ class ReaderWindow(QMainWindow):
         add_bookmark_action.triggered.connect(self.reader_view.add_bookmark)
         nav_menu.addAction(add_bookmark_action)
         
+        # 书内搜索
+        nav_menu.addSeparator()
+        search_action = QAction('搜索', self)
+        search_action.setShortcut('Ctrl+F')
+        search_action.triggered.connect(self.show_search_panel)
+        nav_menu.addAction(search_action)
+        
+        find_next_action = QAction('查找下一个', self)
+        find_next_action.setShortcut('F3')
+        find_next_action.triggered.connect(lambda: self.search_panel.activate_adjacent(1))
+        nav_menu.addAction(find_next_action)
+        
+        find_prev_action = QAction('查找上一个', self)
+        find_prev_action.setShortcut('Shift+F3')
+        find_prev_action.triggered.connect(lambda: self.search_panel.activate_adjacent(-1))
+        nav_menu.addAction(find_prev_action)
+        
+        library_search_action = QAction('全库搜索', self)
+        library_search_action.setShortcut('Ctrl+Shift+F')
+        library_search_action.triggered.connect(self.show_library_panel)
+        nav_menu.addAction(library_search_action)
+        
         # 视图菜单
         view_menu = menubar.addMenu('视图')
         
@@ -674,6 +859,11 @@ class ReaderWindow(QMainWindow):
         contrast_action.triggered.connect(self.show_contrast_dialog)
         view_menu.addAction(contrast_action)
         
+        # 添加自动滚动速度调节选项
+        auto_scroll_speed_action = QAction('自动滚动速度', self)
+        auto_scroll_speed_action.triggered.connect(self.show_auto_scroll_dialog)
+        view_menu.addAction(auto_scroll_speed_action)
+        
         # 添加亮度调节选项
         brightness_action = QAction('亮度调节', self)
         brightness_action.triggered.connect(self.show_brightness_dialog)
@@ -691,64 +881,128 @@ class ReaderWindow(QMainWindow):
             theme_action = QAction(theme_name, self)
             theme_action.triggered.connect(lambda checked, tn=theme_name: self.reader_view.set_theme(tn))
             theme_menu.addAction(theme_action)
+        
+        # 性能跟踪：状态栏显示各阶段耗时，可导出到chrome://tracing分析
+        view_menu.addSeparator()
+        tracing_action = QAction('性能跟踪', self)
+        tracing_action.setCheckable(True)
+        tracing_action.setChecked(tracing.is_enabled())
+        tracing_action.triggered.connect(self.set_tracing)
+        view_menu.addAction(tracing_action)
+        
+        export_trace_action = QAction('导出性能跟踪...', self)
+        export_trace_action.triggered.connect(self.export_trace)
+        view_menu.addAction(export_trace_action)
             
+    def restore_session(self):
+        """窗口显示后调用：重新打开上次阅读的书，没有可打开的书时直接启动书库"""
+        recent = self.settings_manager.get_recent_books(1)
+        if recent and os.path.isfile(recent[0].file_path):
+            self.load_file(recent[0].file_path)
+        else:
+            self.start_library()
+
+    def start_library(self):
+        """扫描小说文件夹，并在稍后增量更新全库索引；只在启动后执行一次"""
+        if self.library_started:
+            return
+        self.library_started = True
+        novels_dir = self.settings_manager.preferences.novels_dir
+        self.library.set_root(novels_dir)
+        QTimer.singleShot(3000, lambda: self.library_panel.update_index(novels_dir))
+
     def load_file(self, file_name):
-        """加载文件内容"""
+        """在后台线程中加载文件内容，完成后再交给阅读视图"""
+        # 切换小说时取消尚未完成的加载
+        if self.loader:
+            self.loader.cancel()
+        
+        self.pending_position = None
+        self.loader = DocumentLoader(file_name, self.settings_manager.chapter_cache,
+                                     self.settings_manager.preferences.chapter_rules,
+                                     self.settings_manager.text_cache)
+        self.loader.signals.progress.connect(self.on_load_progress)
+        self.loader.signals.finished.connect(self.on_document_loaded)
+        self.loader.signals.failed.connect(self.on_load_failed)
+        self.statusBar().showMessage(f'正在打开: {file_name}')
+        QThreadPool.globalInstance().start(self.loader)
+        
+    def on_load_progress(self, percent, message):
+        """在状态栏显示加载进度"""
+        # 已被取代的加载不再显示进度
+        if self.loader and self.sender() is self.loader.signals:
+            self.statusBar().showMessage(f'{message}... {percent}%')
+            
+    def on_load_failed(self, error):
+        """加载失败"""
+        if not self.loader or self.sender() is not self.loader.signals:
+            return
+        self.loader = None
+        self.statusBar().showMessage(f'打开文件失败: {error}')
+        self.start_library()
+        
+    @tracing.traced('show_document')
+    def on_document_loaded(self, document):
+        """后台加载完成，一次性把文档交给阅读视图"""
+        # 忽略已被取代的加载结果
+        if not self.loader or self.sender() is not self.loader.signals:
+            document.document.close()
+            return
+        self.loader = None
+        
         try:
-            # 首先检测文件编码
-            with open(file_name, 'rb') as f:
-                raw_data = f.read()
-                result = chardet.detect(raw_data)
-                encoding = result['encoding'] if result['confidence'] > 0.7 else None
-    
-            # 定义常用编码列表
-            encodings = ['utf-8', 'gbk', 'gb2312', 'gb18030', 'big5']
-            if encoding:
-                encodings.insert(0, encoding)
-    
-            # 尝试不同的编码
-            content = None
-            used_encoding = None
-            for enc in encodings:
-                try:
-                    content = raw_data.decode(enc)
-                    used_encoding = enc
-                    break
-                except UnicodeDecodeError:
-                    continue
-    
-            if content is None:
-                raise Exception('无法识别文件编码')
-    
-            self.current_file = file_name  # 更新当前文件路径
-            self.reader_view.set_content(content)
-            self.statusBar().showMessage(f'已打开: {file_name} (编码: {used_encoding})')
+            # 先写入上一本书尚未保存的进度
+            self.progress_tracker.save_async()
+            self.current_file = document.file_path  # 更新当前文件路径
+            # 先停止旧文档上的搜索任务并等待其退出，再关闭旧文档
+            self.search_panel.cancel()
+            self.search_panel.pool.waitForDone()
+            self.reader_view.set_document(document)
+            self.search_panel.set_document(document.document, document.chapters)
+            if document.file_type == '.txt':
+                self.statusBar().showMessage(f'已打开: {document.file_path} (编码: {document.encoding})')
+            else:
+                self.statusBar().showMessage(f'已打开: {document.file_path}')
             
             # 加载上次阅读进度
-            progress = self.settings_manager.load_reading_progress(file_name)
+            progress = self.settings_manager.load_reading_progress(document.file_path)
             if progress:
                 self.reader_view.jump_to_position(progress.position)
-                self.reader_view.current_chapter_index = progress.chapter_index
                 self.statusBar().showMessage(f'已恢复上次阅读位置')
+            self.progress_tracker.reset(progress)
+            
+            # 书已显示，再启动书库（需先载入书库列表才能记录本次打开）
+            self.start_library()
+            self.library.record_opened(document.file_path, document.encoding, len(document.chapters))
+            
+            # 从全库搜索结果打开时跳转到命中位置
+            if self.pending_position is not None:
+                self.reader_view.jump_to_position(self.pending_position)
+                self.pending_position = None
                 
             # 加载书签
-            bookmarks = self.settings_manager.load_bookmarks(file_name)
+            bookmarks = self.settings_manager.load_bookmarks(document.file_path)
             self.reader_view.bookmarks = bookmarks
         except Exception as e:
             self.statusBar().showMessage(f'打开文件失败: {str(e)}')
+            self.start_library()
             
+    def on_position_changed(self, position):
+        """阅读位置变化时交给进度跟踪器，由其合并后保存"""
+        self.search_panel.current_position = position
+        self.update_page_label()
+        self.progress_tracker.track(self.current_file, position, self.reader_view.current_chapter_index)
+        
     def closeEvent(self, event):
         """窗口关闭事件，保存阅读进度"""
         if self.current_file:
-            # 创建阅读进度对象
-            from settings import ReadingProgress
-            progress = ReadingProgress(
-                file_path=self.current_file,
-                position=self.reader_view.current_position,
-                chapter_index=self.reader_view.current_chapter_index
+            # 写入最后的阅读进度并等待后台写入完成
+            self.reader_view.update_current_chapter()
+            self.progress_tracker.track(
+                self.current_file,
+                self.reader_view.current_position,
+                self.reader_view.current_chapter_index
             )
-            # 保存阅读进度
-            self.settings_manager.save_reading_progress(progress)
             
             # 保存书签
             if self.reader_view.bookmarks:
@@ -756,13 +1010,24 @@ class ReaderWindow(QMainWindow):
                     self.current_file,
                     self.reader_view.bookmarks
                 )
+        self.progress_tracker.flush()
+        self.search_panel.cancel()
+        self.search_panel.pool.waitForDone()
+        self.library_panel.shutdown()
+        self.library.shutdown()
+        self.reader_view.paginator.shutdown()
+        self.settings_manager.close()
         super().closeEvent(event)
 
 def main():
     app = QApplication(sys.argv)
     window = ReaderWindow()
     window.show()
+    # 等窗口第一次绘制之后再打开上次阅读的书
+    QTimer.singleShot(0, window.restore_session)
     sys.exit(app.exec())
 
 if __name__ == "__main__":
+    # 打包为exe后，PDF页长度统计的spawn工作进程会重新执行本文件，必须先交给multiprocessing处理
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -0,0 +1,311 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+import bisect
+import time
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt6.QtGui import QFont, QTextLayout, QTextOption
+
+from tracing import traced
+
+SEGMENT_CHARS = 64 * 1024  # 没有章节或章节过长时，每个分页单位的最大字符数
+EMIT_INTERVAL = 0.1  # 后台分页时合并发出结果的间隔（秒）
+
+
+@dataclass(frozen=True)
+class PageGeometry:
+    """决定分页结果的排版参数，任一项变化都需要重新分页"""
+    font: str  # QFont.toString()
+    width: float  # 文本可用宽度（视口宽度减去文档边距）
+    height: float  # 视口高度
+    line_spacing: int = 100  # 行高百分比
+
+    def is_valid(self) -> bool:
+        return self.width > 0 and self.height > 0
+
+
+def make_font(geometry: PageGeometry) -> QFont:
+    font = QFont()
+    font.fromString(geometry.font)
+    return font
+
+
+def paginate_text(text: str, font: QFont, geometry: PageGeometry, offset: int = 0) -> array:
+    """把从offset开始的一段文本切分为屏幕页，返回各页起点（首项为offset）
+
+    与QTextEdit纯文本的排版一致：每个段落一个QTextLayout，在单词边界或任意位置换行，
+    行高按百分比放大；页只在行首断开，放不下的行移到下一页。
+    """
+    starts = array('q', [offset])
+    option = QTextOption()
+    option.setWrapMode(QTextOption.WrapMode.WrapAtWordBoundaryOrAnywhere)
+    factor = geometry.line_spacing / 100
+    paragraphs = text.split('\n')
+    if len(paragraphs) > 1 and not paragraphs[-1]:
+        # 末尾的换行之后是下一个分页单位的开头
+        paragraphs.pop()
+    y = 0.0
+    position = offset
+    for paragraph in paragraphs:
+        layout = QTextLayout(paragraph, font)
+        layout.setTextOption(option)
+        layout.beginLayout()
+        while True:
+            line = layout.createLine()
+            if not line.isValid():
+                break
+            line.setLineWidth(geometry.width)
+            height = line.height() * factor
+            if y > 0 and y + height > geometry.height:
+                starts.append(position + line.textStart())
+                y = 0.0
+            y += height
+        layout.endLayout()
+        position += len(paragraph) + 1
+    return starts
+
+
+def segment_boundaries(length: int, chapter_starts: List[int], block_starts: List[int],
+                       max_chars: int = SEGMENT_CHARS) -> List[int]:
+    """分页单位的起点，末尾附加全文长度
+
+    每章另起一页，各章分别分页；过长的章（或没有章节的全文）再在文档分页处切开，
+    使后台分页可以尽早得到当前位置附近的结果，改变章节表时也只需重新计算变化的部分。
+    """
+    bounds = [0]
+    for end in sorted({start for start in chapter_starts if 0 < start < length}) + [length]:
+        while end - bounds[-1] > max_chars:
+            index = bisect.bisect_right(block_starts, bounds[-1] + max_chars) - 1
+            cut = block_starts[index] if index >= 0 else 0
+            if cut <= bounds[-1]:
+                # 限度内没有文档分页处，退到下一个分页处
+                index = bisect.bisect_right(block_starts, bounds[-1])
+                if index >= len(block_starts) or block_starts[index] >= end:
+                    break
+                cut = block_starts[index]
+            bounds.append(cut)
+        if end > bounds[-1]:
+            bounds.append(end)
+    return bounds
+
+
+class PaginatorSignals(QObject):
+    """PaginateWorker的信号"""
+    segments_done = pyqtSignal(int, object)  # 分页代次, {(起点, 终点): 页起点array}
+    finished = pyqtSignal(int)
+
+class PaginateWorker(QRunnable):
+    """在后台按给定顺序逐个分页单位计算页起点"""
+
+    def __init__(self, generation: int, document, segments: List[tuple], geometry: PageGeometry):
+        super().__init__()
+        self.generation = generation
+        self.document = document
+        self.segments = segments
+        self.geometry = geometry
+        self.signals = PaginatorSignals()
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    @traced('paginate')
+    def run(self) -> None:
+        font = make_font(self.geometry)
+        batch: Dict[tuple, array] = {}
+        last_emit = time.monotonic()
+        for start, end in self.segments:
+            if self.cancelled:
+                return
+            try:
+                text = self.document.get_range(start, end)
+            except Exception:
+                # 文档已被关闭，分页作废
+                return
+            batch[(start, end)] = paginate_text(text, font, self.geometry, start)
+            if time.monotonic() - last_emit >= EMIT_INTERVAL:
+                self.signals.segments_done.emit(self.generation, batch)
+                batch = {}
+                last_emit = time.monotonic()
+        if batch:
+            self.signals.segments_done.emit(self.generation, batch)
+        self.signals.finished.emit(self.generation)
+
+class Paginator(QObject):
+    """分页引擎：按当前字体、行距和视口大小预先计算全书的分页位置
+
+    全书按章切分为若干分页单位，每个单位的页起点保存为array('q')，以(起点, 终点)为键缓存，
+    并按排版参数保留最近几组结果：改变窗口大小后再改回时，
+    已算好的单位直接复用，只在后台重新计算受影响的部分，且从当前位置所在的单位开始。
+    翻页只是在已算好的页起点中查找，不需要重新排版；
+    尚未算到的单位在翻页时当场计算（单位很小，只需几十毫秒）。
+    """
+    CACHED_GEOMETRIES = 3
+
+    pages_updated = pyqtSignal()  # 开始重新分页或又有分页单位计算完成
+    finished = pyqtSignal(int)  # 全书分页完成，总页数
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.document = None
+        self.geometry: Optional[PageGeometry] = None
+        self.chapter_starts: List[int] = []
+        self.boundaries: List[int] = [0]
+        self.segment_pages: Optional[Dict[tuple, array]] = None  # 当前排版参数下已算好的单位
+        self.cache: OrderedDict = OrderedDict()  # 排版参数 -> {(起点, 终点): 页起点array}
+        self.page_counts: Optional[array] = None  # 全书分页完成后各单位之前的累计页数
+        self.cursor = (-1, -1)  # 上次翻到的(单位, 页)，连续翻页时不必查找
+        self.generation = 0
+        self.worker: Optional[PaginateWorker] = None
+        # 专用线程池，分页时不占用加载文档和搜索的线程
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+
+    def set_document(self, document, chapters: List) -> None:
+        """切换文档，缓存的分页全部作废"""
+        self.cancel()
+        self.document = document
+        self.cache.clear()
+        self.chapter_starts = [chapter['start'] for chapter in chapters]
+        self.update_boundaries()
+        self.restart(0)
+
+    def set_geometry(self, geometry: PageGeometry, position: int = 0) -> None:
+        """排版参数变化后从position所在的单位开始重新分页"""
+        if geometry == self.geometry or not geometry.is_valid():
+            return
+        self.geometry = geometry
+        self.restart(position)
+
+    def update_boundaries(self) -> None:
+        if self.document is None:
+            self.boundaries = [0]
+            return
+        self.boundaries = segment_boundaries(len(self.document), self.chapter_starts,
+                                             self.document.page_offsets())
+
+    def segment(self, index: int) -> tuple:
+        return self.boundaries[index], self.boundaries[index + 1]
+
+    def segment_of(self, position: int) -> int:
+        return min(max(0, bisect.bisect_right(self.boundaries, position) - 1), len(self.boundaries) - 2)
+
+    def restart(self, position: int) -> None:
+        """取消正在进行的分页，在后台计算当前排版参数下尚缺的单位"""
+        self.cancel()
+        self.page_counts = None
+        self.cursor = (-1, -1)
+        if self.document is None or self.geometry is None:
+            self.segment_pages = None
+            return
+        self.segment_pages = self.cache.pop(self.geometry, None) or {}
+        self.cache[self.geometry] = self.segment_pages
+        while len(self.cache) > self.CACHED_GEOMETRIES:
+            self.cache.popitem(last=False)
+        # 从当前位置所在的单位开始向后，最后补上前面的单位
+        count = len(self.boundaries) - 1
+        current = self.segment_of(position) if count else 0
+        order = [self.segment(index) for index in list(range(current, count)) + list(range(current))]
+        missing = [segment for segment in order if segment not in self.segment_pages]
+        self.pages_updated.emit()
+        if not missing:
+            self.on_finished(self.generation)
+            return
+        self.worker = PaginateWorker(self.generation, self.document, missing, self.geometry)
+        self.worker.signals.segments_done.connect(self.on_segments_done)
+        self.worker.signals.finished.connect(self.on_finished)
+        self.pool.start(self.worker)
+
+    def cancel(self) -> None:
+        self.generation += 1
+        if self.worker:
+            self.worker.cancel()
+            self.worker = None
+
+    def on_segments_done(self, generation: int, batch: Dict[tuple, array]) -> None:
+        if generation != self.generation or self.segment_pages is None:
+            return
+        self.segment_pages.update(batch)
+        self.pages_updated.emit()
+
+    def on_finished(self, generation: int) -> None:
+        if generation != self.generation or self.segment_pages is None:
+            return
+        self.worker = None
+        counts = array('q', [0])
+        for index in range(len(self.boundaries) - 1):
+            pages = self.segment_pages.get(self.segment(index))
+            if pages is None:
+                return
+            counts.append(counts[-1] + len(pages))
+        self.page_counts = counts
+        self.finished.emit(counts[-1])
+
+    def pages(self, index: int) -> array:
+        """一个单位的页起点（绝对位置），尚未算到时当场计算"""
+        start, end = self.segment(index)
+        pages = self.segment_pages.get((start, end))
+        if pages is None:
+            text = self.document.get_range(start, end)
+            pages = paginate_text(text, make_font(self.geometry), self.geometry, start)
+            self.segment_pages[(start, end)] = pages
+        return pages
+
+    def is_ready(self) -> bool:
+        return self.segment_pages is not None and len(self.boundaries) > 1
+
+    def locate(self, position: int) -> tuple:
+        """position所在的(单位, 页, 该单位的页起点)"""
+        index = self.segment_of(position)
+        pages = self.pages(index)
+        page = self.cursor[1] if self.cursor[0] == index and 0 <= self.cursor[1] < len(pages) \
+            and pages[self.cursor[1]] == position else max(0, bisect.bisect_right(pages, position) - 1)
+        return index, page, pages
+
+    def next_page(self, position: int) -> Optional[int]:
+        """下一页的起点，已在最后一页或尚无排版参数时返回None"""
+        if not self.is_ready():
+            return None
+        index, page, pages = self.locate(position)
+        if page + 1 < len(pages):
+            self.cursor = (index, page + 1)
+            return pages[page + 1]
+        if index + 2 < len(self.boundaries):
+            self.cursor = (index + 1, 0)
+            return self.boundaries[index + 1]
+        return None
+
+    def prev_page(self, position: int) -> Optional[int]:
+        """上一页的起点；视口顶端位于页中间时先对齐到本页开头"""
+        if not self.is_ready():
+            return None
+        index, page, pages = self.locate(position)
+        if position > pages[page]:
+            self.cursor = (index, page)
+            return pages[page]
+        if page > 0:
+            self.cursor = (index, page - 1)
+            return pages[page - 1]
+        if index > 0:
+            pages = self.pages(index - 1)
+            self.cursor = (index - 1, len(pages) - 1)
+            return pages[-1]
+        return None
+
+    def page_number(self, position: int) -> Optional[tuple]:
+        """(当前页序号, 总页数)，从1开始；全书分页完成前返回None"""
+        if self.page_counts is None:
+            return None
+        index, page, _ = self.locate(position)
+        return self.page_counts[index] + page + 1, self.page_counts[-1]
+
+    def shutdown(self) -> None:
+        """停止后台分页并等待其退出，关闭文档或窗口前调用"""
+        self.cancel()
+        self.pool.waitForDone()
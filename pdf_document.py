@@ -0,0 +1,227 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+import bisect
+import multiprocessing
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+
+from document import Document
+from tracing import traced
+
+
+def _import_fitz():
+    """动态导入PyMuPDF，避免不必要的依赖"""
+    try:
+        import fitz
+    except ImportError:
+        raise ImportError("需要安装PyMuPDF库来支持PDF文件。请运行：pip install pymupdf")
+    return fitz
+
+
+def _page_text(page) -> str:
+    """页面文本，空白页为空字符串，其余保证以换行结尾"""
+    text = page.get_text()
+    if not text.strip():
+        return ''
+    return text if text.endswith('\n') else text + '\n'
+
+
+def extract_pages(file_path: str, first: int, last: int) -> List[str]:
+    """提取[first, last)页的文本，在工作进程中执行，每次重新打开文档"""
+    fitz = _import_fitz()
+    with fitz.open(file_path) as doc:
+        return [_page_text(doc[i]) for i in range(first, min(last, len(doc)))]
+
+
+def measure_pages(file_path: str, first: int, last: int) -> List[int]:
+    """统计[first, last)页的文本长度，只把长度传回主进程"""
+    return [len(text) for text in extract_pages(file_path, first, last)]
+
+
+class PdfDocument(Document):
+    """按页惰性提取文本的PDF文档
+
+    第i页的文本占据字符区间[page_offsets[i], page_offsets[i+1])。
+    没有缓存的版面信息时，打开时统计一遍各页文本长度，页数较多时分块交给进程池并行处理；
+    阅读时只提取可见区间覆盖的页，并在进程池中预取后面的页，提取结果保存在LRU缓存中。
+    """
+    CHUNK_PAGES = 64  # 进程池中每个任务处理的页数
+    PARALLEL_PAGES = 128  # 页数超过该值时并行统计页长度
+    PREFETCH_PAGES = 8  # 每次预取的页数
+    CACHE_PAGES = 64  # 缓存的已提取页数
+
+    def __init__(self, file_path: str, layout: Optional[Dict] = None,
+                 progress_callback: Optional[Callable[[int, str], None]] = None):
+        super().__init__()
+        fitz = _import_fitz()
+        self.file_path = file_path
+        self._doc = fitz.open(file_path)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None
+        self._closed = False
+        self._prefetching = set()
+        self.page_count = len(self._doc)
+        self.metadata = self._read_metadata()
+
+        try:
+            if layout and len(layout.get('page_offsets', [])) == self.page_count + 1:
+                self._page_offsets = array('q', layout['page_offsets'])
+            else:
+                self._index_pages(progress_callback)
+        except BaseException:
+            self.close()
+            raise
+
+        self.chapters = self._toc_chapters()
+
+    def _read_metadata(self) -> Dict:
+        metadata = self._doc.metadata or {}
+        return {
+            'title': metadata.get('title', ''),
+            'author': metadata.get('author', ''),
+            'subject': metadata.get('subject', ''),
+            'keywords': metadata.get('keywords', ''),
+            'creator': metadata.get('creator', ''),
+            'producer': metadata.get('producer', ''),
+            'page_count': self.page_count
+        }
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # 使用spawn启动工作进程，避免在已有Qt线程的进程中fork
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 1) - 1),
+                                             mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    @traced('decode')
+    def _index_pages(self, progress_callback) -> None:
+        """统计各页文本长度，建立页偏移表"""
+        lengths = [0] * self.page_count
+        chunks = [(first, min(first + self.CHUNK_PAGES, self.page_count))
+                  for first in range(0, self.page_count, self.CHUNK_PAGES)]
+
+        if self.page_count > self.PARALLEL_PAGES and (os.cpu_count() or 1) > 1:
+            pool = self._get_pool()
+            futures = {pool.submit(measure_pages, self.file_path, first, last): first for first, last in chunks}
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    first = futures[future]
+                    measured = future.result()
+                    lengths[first:first + len(measured)] = measured
+                    if progress_callback:
+                        progress_callback(done * 90 // len(chunks), '正在解析PDF')
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+        else:
+            for index in range(self.page_count):
+                if progress_callback:
+                    progress_callback(index * 90 // max(self.page_count, 1), '正在解析PDF')
+                lengths[index] = len(self._extract(index))
+
+        offsets = array('q', [0])
+        for length in lengths:
+            offsets.append(offsets[-1] + length)
+        self._page_offsets = offsets
+
+    def layout(self) -> Dict:
+        """可缓存的版面信息，下次打开时据此跳过页长度统计"""
+        return {'page_offsets': list(self._page_offsets)}
+
+    def _toc_chapters(self) -> List[Dict]:
+        """把get_toc()中的页码（从1开始）映射为页首的字符位置"""
+        chapters = []
+        for level, title, page in self._doc.get_toc():
+            if title.strip() and 1 <= page <= self.page_count:
+                chapters.append({'title': title.strip(), 'start': self._page_offsets[page - 1],
+                                 'line': 0, 'level': level, 'page': page - 1})
+        return chapters
+
+    def _extract(self, index: int) -> str:
+        # PyMuPDF的文档对象不能在多个线程中同时使用
+        with self._lock:
+            return _page_text(self._doc[index])
+
+    def page_text(self, index: int) -> str:
+        """获取第index页的文本，带LRU缓存"""
+        with self._lock:
+            text = self._cache.get(index)
+            if text is not None:
+                self._cache.move_to_end(index)
+                return text
+        text = self._extract(index)
+        self._store(index, text)
+        return text
+
+    def _store(self, index: int, text: str) -> None:
+        with self._lock:
+            self._cache[index] = text
+            self._cache.move_to_end(index)
+            while len(self._cache) > self.CACHE_PAGES:
+                self._cache.popitem(last=False)
+
+    def _prefetch(self, first: int) -> None:
+        """在进程池中提取first开始的若干页"""
+        last = min(first + self.PREFETCH_PAGES, self.page_count)
+        with self._lock:
+            if self._closed or first >= last or first in self._cache or first in self._prefetching:
+                return
+            self._prefetching.add(first)
+        try:
+            future = self._get_pool().submit(extract_pages, self.file_path, first, last)
+        except RuntimeError:
+            # 文档已关闭
+            return
+
+        def done(future):
+            with self._lock:
+                self._prefetching.discard(first)
+            if self._closed or future.cancelled() or future.exception() is not None:
+                return
+            for offset, text in enumerate(future.result()):
+                self._store(first + offset, text)
+
+        future.add_done_callback(done)
+
+    def page_of_position(self, position: int) -> int:
+        """字符位置所在的页"""
+        return min(max(0, bisect.bisect_right(self._page_offsets, position) - 1), max(0, self.page_count - 1))
+
+    def __len__(self) -> int:
+        return self._page_offsets[-1] if self._page_offsets else 0
+
+    def page_offsets(self) -> list:
+        """各页起始字符位置，末尾附加全文长度"""
+        return list(self._page_offsets)
+
+    def get_range(self, start: int, end: int) -> str:
+        """获取字符区间[start, end)的文本，只提取覆盖该区间的页"""
+        start = max(0, start)
+        end = min(end, len(self))
+        if start >= end:
+            return ''
+        first = self.page_of_position(start)
+        last = bisect.bisect_left(self._page_offsets, end)
+        text = ''.join(self.page_text(i) for i in range(first, last))
+        self._prefetch(last)
+        base = self._page_offsets[first]
+        return text[start - base:end - base]
+
+    def close(self) -> None:
+        self._closed = True
+        if self._pool is not None:
+            # 不等待正在运行的工作进程，关闭大PDF时不阻塞GUI线程
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        with self._lock:
+            self._cache.clear()
+            if not self._doc.is_closed:
+                self._doc.close()
@@ -0,0 +1,105 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+from typing import Optional
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+
+from settings import ReadingProgress
+from tracing import traced
+
+class ProgressWriterSignals(QObject):
+    """ProgressWriter的信号"""
+    saved = pyqtSignal(object)  # 已写入的ReadingProgress
+    failed = pyqtSignal(object)  # 写入失败的ReadingProgress
+
+class ProgressWriter(QRunnable):
+    """在后台线程中把一次阅读进度写入数据库（单个事务，崩溃时不会留下半写入的数据）"""
+
+    def __init__(self, settings_manager, progress: ReadingProgress):
+        super().__init__()
+        self.settings_manager = settings_manager
+        self.progress = progress
+        self.signals = ProgressWriterSignals()
+
+    @traced('persist_progress')
+    def run(self) -> None:
+        try:
+            self.settings_manager.save_reading_progress(self.progress)
+        except Exception:
+            self.signals.failed.emit(self.progress)
+            return
+        self.signals.saved.emit(self.progress)
+
+class ProgressTracker(QObject):
+    """跟随滚动位置自动保存阅读进度
+
+    滚动时只记录最新位置，停止滚动DEBOUNCE_MS后再保存；持续滚动时每隔PERIODIC_MS至少保存一次。
+    写入在单线程的线程池中按顺序执行，不阻塞GUI线程，关闭窗口时同步写入剩余的进度。
+    """
+    DEBOUNCE_MS = 1500
+    PERIODIC_MS = 30000
+
+    def __init__(self, settings_manager, parent=None):
+        super().__init__(parent)
+        self.settings_manager = settings_manager
+        self.pending: Optional[ReadingProgress] = None
+        self.last_saved: Optional[ReadingProgress] = None  # 确认已写入的进度
+        self.last_queued: Optional[ReadingProgress] = None  # 最近交给后台写入的进度
+
+        # 单线程保证写入顺序与位置变化顺序一致
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.setInterval(self.DEBOUNCE_MS)
+        self.debounce_timer.timeout.connect(self.save_async)
+
+        self.periodic_timer = QTimer(self)
+        self.periodic_timer.setInterval(self.PERIODIC_MS)
+        self.periodic_timer.timeout.connect(self.save_async)
+        self.periodic_timer.start()
+
+    def reset(self, progress: Optional[ReadingProgress]) -> None:
+        """切换书籍后记录已保存的进度，避免刚恢复的位置被重复写入"""
+        self.pending = None
+        self.last_saved = self.last_queued = progress
+        self.debounce_timer.stop()
+
+    def track(self, file_path: str, position: int, chapter_index: int) -> None:
+        """记录新的阅读位置，并重新开始防抖计时"""
+        if not file_path:
+            return
+        self.pending = ReadingProgress(file_path=file_path, position=position, chapter_index=chapter_index)
+        self.debounce_timer.start()
+
+    def save_async(self) -> None:
+        """把待保存的进度交给后台线程写入"""
+        progress = self.pending
+        self.pending = None
+        self.debounce_timer.stop()
+        if progress is None or progress == self.last_queued:
+            return
+        self.last_queued = progress
+        writer = ProgressWriter(self.settings_manager, progress)
+        writer.signals.saved.connect(self.on_saved)
+        writer.signals.failed.connect(self.on_failed)
+        self.pool.start(writer)
+
+    def on_saved(self, progress: ReadingProgress) -> None:
+        self.last_saved = progress
+
+    def on_failed(self, progress: ReadingProgress) -> None:
+        """写入失败：之后没有更新的位置时放回待保存，由定时保存重试"""
+        if progress == self.last_queued:
+            self.last_queued = self.last_saved
+            if self.pending is None:
+                self.pending = progress
+
+    def flush(self) -> None:
+        """同步写入剩余的进度并等待所有后台写入完成，关闭窗口时调用"""
+        self.save_async()
+        self.periodic_timer.stop()
+        self.pool.waitForDone()
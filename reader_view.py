@@ -2,10 +2,34 @@
 # Author: BBBQL2021
 # License: GNU General Public License v3.0
 
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QTextEdit
-from PyQt6.QtCore import Qt
+import bisect
+
+from PyQt6.QtWidgets import QWidget, QHBoxLayout, QTextEdit, QScrollBar
+from PyQt6.QtGui import QTextCursor, QTextCharFormat, QTextBlockFormat, QColor, QPalette, QWindow
+from PyQt6.QtCore import Qt, QPoint, QTimer, pyqtSignal
+from document import Document, TextDocument
+from auto_scroller import AutoScroller
+from pagination import Paginator, PageGeometry
+from chapter_navigator import ChapterModel
+from tracing import traced
 
 class ReaderView(QWidget):
+    # 虚拟化渲染：QTextEdit中只放当前位置附近的几页文本，滚动到窗口边缘时再换入相邻页
+    WINDOW_BLOCKS = 3  # 同时渲染的页数（前一页、当前页、后一页）
+    GEOMETRY_DELAY_MS = 150  # 改变窗口大小后等待片刻再重新分页
+    EXTEND_DELAY_MS = 50  # 样式变化后先绘制当前页，稍后再补全渲染窗口；连续调整时只补全最后一次
+    CHAPTER_INTERVAL_MS = 200  # 滚动时最多每隔这么久更新一次当前章节
+    # 各主题的背景色和文字颜色
+    THEME_COLORS = {
+        'light': ('#ffffff', '#000000'),
+        'dark': ('#1e1e1e', '#ffffff'),
+        'sepia': ('#f4ecd8', '#5b4636'),
+        'green': ('#e2efda', '#2b3a2b'),
+        'blue': ('#e0ecf9', '#1f2d3d'),
+    }
+    
+    position_changed = pyqtSignal(int)  # 阅读位置（视口顶端字符在全文中的位置）变化
+    
     def __init__(self, parent=None):
         super().__init__(parent)
         self.theme = "light"
@@ -13,20 +37,65 @@ class ReaderView(QWidget):
         self.current_position = 0  # 添加current_position属性
         self.current_chapter_index = 0  # 添加current_chapter_index属性
         self.bookmarks = []  # 添加bookmarks属性
+        self.chapters = []  # 当前文档的章节列表
         self.font_size = 12  # 添加font_size属性，设置默认字体大小
+        self.line_spacing = 100  # 行高百分比
+        self.contrast_level = 100  # 文字对比度百分比，100为主题原色
+        
+        # 当前文档及渲染窗口在全文中的范围，文档只需提供len()、get_range()和page_offsets()
+        self.document: Document = TextDocument('')
+        self.block_starts = [0]  # 各页的起始字符位置，末尾为全文长度
+        self.window_start = 0
+        self.window_end = 0
+        self.updating_window = False  # 正在替换渲染窗口时忽略滚动事件
+        
+        # 搜索命中位置（全文中的字符位置，升序），只高亮落在渲染窗口中的部分
+        self.search_query = ''
+        self.search_positions = []
         
         # 创建主布局
-        layout = QVBoxLayout(self)
+        layout = QHBoxLayout(self)
         layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
         
-        # 创建文本视图
+        # 创建文本视图，其自带的垂直滚动条只反映渲染窗口，因此隐藏
         self.text_view = QTextEdit(self)
         self.text_view.setReadOnly(True)
-        self.text_view.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
+        self.text_view.setUndoRedoEnabled(False)  # 只读视图，补全渲染窗口时不必记录撤销
+        self.text_view.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
         self.text_view.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
+        self.text_view.verticalScrollBar().valueChanged.connect(self.on_view_scrolled)
+        
+        # 外部滚动条以字符为单位对应全文位置
+        self.scrollbar = QScrollBar(Qt.Orientation.Vertical, self)
+        self.scrollbar.setRange(0, 0)
+        self.scrollbar.valueChanged.connect(self.jump_to_position)
         
         # 添加到布局
         layout.addWidget(self.text_view)
+        layout.addWidget(self.scrollbar)
+        
+        # 自动滚动，速度为每像素毫秒数
+        self.auto_scroller = AutoScroller(self.text_view.verticalScrollBar, parent=self)
+        self.watched_window = None  # 已连接可见性信号的顶层窗口
+        
+        # 分页引擎在后台按当前字体、行距和视口大小计算全书的页起点，翻页只需查表
+        self.paginator = Paginator(self)
+        self.geometry_timer = QTimer(self)
+        self.geometry_timer.setSingleShot(True)
+        self.geometry_timer.setInterval(self.GEOMETRY_DELAY_MS)
+        self.geometry_timer.timeout.connect(self.update_page_geometry)
+        # 样式变化后先只渲染视口所在的一页，前后相邻页在事件循环空闲时补上
+        self.extend_timer = QTimer(self)
+        self.extend_timer.setSingleShot(True)
+        self.extend_timer.setInterval(self.EXTEND_DELAY_MS)
+        self.extend_timer.timeout.connect(self.extend_window)
+        # 章节目录模型；当前章节由阅读位置二分查找得到，滚动时节流更新
+        self.chapter_model = ChapterModel(self)
+        self.chapter_timer = QTimer(self)
+        self.chapter_timer.setSingleShot(True)
+        self.chapter_timer.setInterval(self.CHAPTER_INTERVAL_MS)
+        self.chapter_timer.timeout.connect(self.update_current_chapter)
         
         # 设置滚动条样式
         self.update_scrollbar_style()
@@ -35,11 +104,9 @@ class ReaderView(QWidget):
         handle_color = "#888888" if self.theme == "light" else "#666666"
         handle_hover_color = "#666666" if self.theme == "light" else "#888888"
         bg_hover_color = "#f0f0f0" if self.theme == "light" else "#333333"
-        bg_color = "#ffffff" if self.theme == "light" else "#1e1e1e"
-        text_color = "#000000" if self.theme == "light" else "#ffffff"
         
-        # 设置基本样式和滚动条样式
-        self.text_view.setStyleSheet(f"background-color: {bg_color}; color: {text_color};")
+        # 文字和背景颜色通过调色板设置，不会触发重新排版
+        self.apply_colors()
         
         # 设置滚动条样式
         scrollbar_style = f"""
@@ -58,14 +125,12 @@ class ReaderView(QWidget):
         """
         
         # 应用滚动条样式
+        self.scrollbar.setStyleSheet(scrollbar_style)
         self.text_view.verticalScrollBar().setStyleSheet(scrollbar_style)
         self.text_view.horizontalScrollBar().setStyleSheet(scrollbar_style)
         
         self.scrollbars_visible = True
     
-    def show_chapters(self):
-        # 暂时实现一个空的show_chapters方法
-        pass
     def show_bookmarks(self):
         # 暂时实现一个空的show_bookmarks方法
         pass
@@ -76,27 +141,304 @@ class ReaderView(QWidget):
         # 暂时实现一个空的change_font方法
         pass
     def prev_page(self):
-        # 暂时实现一个空的prev_page方法
-        pass
+        """翻到上一页"""
+        if not self.paginator.is_ready():
+            self.scroll_by_page(-1)
+            return
+        position = self.paginator.prev_page(self.current_position)
+        if position is not None:
+            self.jump_to_position(position)
+            
+    def scroll_by_page(self, direction):
+        """尚未确定分页参数时按视口高度滚动"""
+        vbar = self.text_view.verticalScrollBar()
+        vbar.setValue(vbar.value() + direction * vbar.pageStep())
+        
+    def page_geometry(self):
+        """当前字体、行距和视口大小对应的分页参数"""
+        text_document = self.text_view.document()
+        viewport = self.text_view.viewport()
+        return PageGeometry(text_document.defaultFont().toString(),
+                            viewport.width() - 2 * text_document.documentMargin(),
+                            viewport.height(), self.line_spacing)
+        
+    def update_page_geometry(self):
+        """排版参数变化后从当前位置所在的章开始重新分页"""
+        self.geometry_timer.stop()
+        self.paginator.set_geometry(self.page_geometry(), self.current_position)
+        
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        # 拖动窗口边框时会连续触发，停下后再重新分页
+        self.geometry_timer.start()
 
+    def toggle_auto_scroll(self):
+        """开始或停止自动滚动"""
+        self.auto_scroller.toggle()
+        
+    def set_auto_scroll_interval(self, interval):
+        """设置自动滚动速度（每滚动一个像素的毫秒数）"""
+        self.auto_scroller.set_interval(interval)
+        
+    def showEvent(self, event):
+        super().showEvent(event)
+        # 顶层窗口最小化时暂停自动滚动，恢复后继续
+        handle = self.window().windowHandle()
+        if handle is not None and handle is not self.watched_window:
+            self.watched_window = handle
+            handle.visibilityChanged.connect(self.on_window_visibility_changed)
+        self.auto_scroller.set_paused(False)
+        
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.auto_scroller.set_paused(True)
+        
+    def on_window_visibility_changed(self, visibility):
+        self.auto_scroller.set_paused(visibility in (QWindow.Visibility.Minimized, QWindow.Visibility.Hidden))
+        
     def change_font_size(self, size):
-        """更改文本视图的字体大小"""
+        """更改文本视图的字体大小，保持视口顶端的字符不变"""
+        if size == self.font_size:
+            return
         self.font_size = size
         font = self.text_view.font()
         font.setPointSize(size)
-        self.text_view.setFont(font)
+        self.relayout(lambda: self.text_view.setFont(font))
+        
+    def change_line_spacing(self, spacing):
+        """更改行高百分比，保持视口顶端的字符不变"""
+        if spacing == self.line_spacing:
+            return
+        self.line_spacing = spacing
+        self.relayout()
+        
+    @traced('relayout')
+    def relayout(self, apply_style=None):
+        """字体或行距变化后重新排版
+        
+        直接改变字体会让QTextEdit把整个渲染窗口重新排版，并且视口停在原来的像素位置而不是原来的文字。
+        这里先清空文本视图再应用样式，只渲染视口顶端字符所在的一页并把该字符放回顶端，
+        相邻页由extend_window在空闲时补上，全书分页在后台重新计算。
+        """
+        anchor = self.current_position
+        self.updating_window = True
+        try:
+            self.text_view.clear()
+            if apply_style:
+                apply_style()
+            self.window_start = self.window_end = -1
+            self.render_window(anchor, 1)
+            self.scroll_to(anchor)
+        finally:
+            self.updating_window = False
+        self.sync_position(anchor)
+        self.extend_timer.start()
+        self.update_page_geometry()
+        
+    @traced('extend_window')
+    def extend_window(self):
+        """把只含一页的渲染窗口补全为前后相邻的几页，已有的文本不重新排版"""
+        start, end = self.window_range(self.current_position)
+        if self.window_start < 0 or start > self.window_end or end < self.window_start:
+            return
+        anchor = self.current_position
+        text_document = self.text_view.document()
+        self.updating_window = True
+        try:
+            if end > self.window_end:
+                cursor = QTextCursor(text_document)
+                cursor.movePosition(QTextCursor.MoveOperation.End)
+                cursor.insertText(self.document.get_range(self.window_end, end))
+                self.format_blocks(self.window_end - self.window_start, end - self.window_start)
+                self.window_end = end
+            if start < self.window_start:
+                QTextCursor(text_document).insertText(self.document.get_range(start, self.window_start))
+                self.format_blocks(0, self.window_start - start)
+                self.window_start = start
+            self.scroll_to(anchor)
+        finally:
+            self.updating_window = False
+        self.update_search_highlights()
 
     def set_content(self, content):
         """设置阅读器的文本内容"""
-        self.text_view.setText(content)
+        self.set_text_document(TextDocument(content))
+        
+    def set_text_document(self, document: Document):
+        """设置要显示的文档，只渲染开头附近的几页"""
+        self.document = document
+        self.block_starts = document.page_offsets()
+        self.window_start = self.window_end = -1  # 强制重新渲染
+        self.scrollbar.blockSignals(True)
+        self.scrollbar.setRange(0, max(0, len(document) - 1))
+        self.scrollbar.blockSignals(False)
+        self.paginator.set_document(document, self.chapters)
+        self.jump_to_position(0)
+        
+    @traced('render')
+    def set_document(self, document):
+        """一次性设置后台加载完成的文档（内容和章节）"""
+        self.chapters = document.chapters
+        self.chapter_model.set_chapters(self.chapters)
+        self.current_position = 0
+        self.current_chapter_index = 0
+        old_document = self.document
+        # 等后台分页退出后才能关闭旧文档
+        self.paginator.shutdown()
+        self.set_text_document(document.document)
+        old_document.close()
+        self.update_current_chapter()
+        
+    def window_range(self, position, blocks=WINDOW_BLOCKS):
+        """包含position的页及其前后相邻页的字符区间"""
+        index = max(0, bisect.bisect_right(self.block_starts, position) - 1)
+        last = min(len(self.block_starts) - 1, index + blocks // 2 + 1)
+        first = max(0, last - blocks)
+        last = min(len(self.block_starts) - 1, first + blocks)
+        return self.block_starts[first], self.block_starts[last]
+        
+    def render_window(self, position, blocks=WINDOW_BLOCKS):
+        """把包含position的页及其前后相邻页放入文本视图"""
+        start, end = self.window_range(position, blocks)
+        if (start, end) == (self.window_start, self.window_end):
+            return
+        self.text_view.setPlainText(self.document.get_range(start, end))
+        self.format_blocks(0, end - start)
+        self.window_start, self.window_end = start, end
+        self.update_search_highlights()
+        
+    def format_blocks(self, first, last):
+        """为渲染窗口中[first, last)的段落设置行高"""
+        if self.line_spacing == 100:
+            return
+        cursor = QTextCursor(self.text_view.document())
+        cursor.setPosition(first)
+        cursor.setPosition(min(last, self.text_view.document().characterCount() - 1), QTextCursor.MoveMode.KeepAnchor)
+        block_format = QTextBlockFormat()
+        block_format.setLineHeight(self.line_spacing, QTextBlockFormat.LineHeightTypes.ProportionalHeight.value)
+        # 放在一个编辑块中，排版只在结束时更新一次，而不是每个段落一次
+        cursor.beginEditBlock()
+        cursor.mergeBlockFormat(block_format)
+        cursor.endEditBlock()
+        
+    def set_search_highlights(self, query, positions):
+        """设置搜索命中，positions可以随搜索进行继续增长"""
+        self.search_query = query
+        self.search_positions = positions
+        self.update_search_highlights()
+        
+    def update_search_highlights(self):
+        """只为渲染窗口内的命中建立高亮"""
+        selections = []
+        if self.search_query:
+            char_format = QTextCharFormat()
+            char_format.setBackground(QColor('#ffd54f'))
+            char_format.setForeground(QColor('#000000'))
+            first = bisect.bisect_left(self.search_positions, self.window_start - len(self.search_query) + 1)
+            last = bisect.bisect_left(self.search_positions, self.window_end)
+            for position in self.search_positions[first:last]:
+                selection = QTextEdit.ExtraSelection()
+                selection.cursor = QTextCursor(self.text_view.document())
+                selection.cursor.setPosition(max(0, position - self.window_start))
+                selection.cursor.setPosition(min(self.window_end, position + len(self.search_query)) - self.window_start,
+                                             QTextCursor.MoveMode.KeepAnchor)
+                selection.format = char_format
+                selections.append(selection)
+        self.text_view.setExtraSelections(selections)
+        
+    def top_position(self):
+        """视口顶端第一个字符在全文中的位置"""
+        return self.window_start + self.text_view.cursorForPosition(QPoint(0, 0)).position()
+        
+    def jump_to_position(self, position):
+        """跳转到指定的字符位置，必要时换入新的渲染窗口"""
+        position = self.document.clamp(position)
+        self.updating_window = True
+        try:
+            self.render_window(position)
+            self.scroll_to(position)
+        finally:
+            self.updating_window = False
+        self.sync_position(position)
+        
+    def scroll_to(self, position):
+        """把渲染窗口中position处的字符滚动到视口顶端"""
+        cursor = QTextCursor(self.text_view.document())
+        cursor.setPosition(max(0, min(position - self.window_start, self.text_view.document().characterCount() - 1)))
+        vbar = self.text_view.verticalScrollBar()
+        vbar.setValue(vbar.value() + self.text_view.cursorRect(cursor).top())
+        
+    def on_view_scrolled(self, value):
+        """文本视图滚动时更新阅读位置，接近渲染窗口边缘时换入相邻文本块"""
+        if self.updating_window:
+            return
+        vbar = self.text_view.verticalScrollBar()
+        position = self.top_position()
+        near_top = value < vbar.pageStep() and self.window_start > 0
+        near_bottom = value > vbar.maximum() - vbar.pageStep() and self.window_end < len(self.document)
+        if near_top or near_bottom:
+            self.jump_to_position(position)
+        else:
+            self.sync_position(position)
+            
+    def sync_position(self, position):
+        """记录当前阅读位置并同步外部滚动条"""
+        changed = position != self.current_position
+        self.current_position = position
+        viewport = self.text_view.viewport()
+        bottom = self.text_view.cursorForPosition(QPoint(viewport.width(), viewport.height())).position()
+        self.scrollbar.blockSignals(True)
+        self.scrollbar.setPageStep(max(1, self.window_start + bottom - position))
+        self.scrollbar.setValue(position)
+        self.scrollbar.blockSignals(False)
+        if changed:
+            # 计时器运行期间的位置变化合并到到期时一起处理
+            if not self.chapter_timer.isActive():
+                self.chapter_timer.start()
+            self.position_changed.emit(position)
+        
+    def update_current_chapter(self):
+        """按当前阅读位置二分查找所在章节"""
+        self.chapter_timer.stop()
+        index = self.chapter_model.chapter_of(self.current_position)
+        if index >= 0:
+            self.current_chapter_index = index
+            self.chapter_model.set_current(index)
+        
     def next_page(self):
-        # 暂时实现一个空的next_page方法
-        pass
+        """翻到下一页，页起点由分页引擎预先算好，翻页时不需要重新排版"""
+        if not self.paginator.is_ready():
+            self.scroll_by_page(1)
+            return
+        position = self.paginator.next_page(self.current_position)
+        if position is not None:
+            self.jump_to_position(position)
+            
     def set_theme(self, theme_name):
         # 设置主题并更新滚动条样式
         self.theme = theme_name
         # 直接调用update_scrollbar_style，不再单独设置文本视图样式
         self.update_scrollbar_style()
+        
+    def adjust_contrast(self, level):
+        """调整文字对比度：低于100时文字颜色向背景色靠近，高于100时向纯黑或纯白靠近"""
+        self.contrast_level = level
+        self.apply_colors()
+        
+    def apply_colors(self):
+        """按主题和对比度设置文本视图的调色板，只需重绘"""
+        background, text = (QColor(color) for color in self.THEME_COLORS.get(self.theme, self.THEME_COLORS['light']))
+        if self.contrast_level < 100:
+            target, amount = background, (100 - self.contrast_level) / 100
+        else:
+            target = QColor('#000000') if background.lightness() >= 128 else QColor('#ffffff')
+            amount = min(1.0, (self.contrast_level - 100) / 50)
+        text = QColor(*(round(a + (b - a) * amount) for a, b in
+                        zip(text.getRgb()[:3], target.getRgb()[:3])))
+        palette = self.text_view.palette()
+        palette.setColor(QPalette.ColorRole.Base, background)
+        palette.setColor(QPalette.ColorRole.Text, text)
+        self.text_view.setPalette(palette)
     @property
     def current_theme(self):
         """提供current_theme属性的getter方法，与main.py兼容"""
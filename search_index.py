@@ -0,0 +1,118 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+import bisect
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional, Set
+
+SIGNATURE_BITS = 1 << 16  # 每页二元组签名的位数
+CONTEXT_CHARS = 20  # 搜索结果中命中位置前后显示的字符数
+
+
+def bigram_buckets(text: str) -> Set[int]:
+    """文本中所有相邻两个字符组成的二元组，散列到签名的位上
+
+    中文没有空格分词，按字符二元组建立索引即可覆盖任意长度不小于2的查询。
+    """
+    return {hash(bigram) & (SIGNATURE_BITS - 1) for bigram in map(str.__add__, text, text[1:])}
+
+
+@dataclass
+class SearchHit:
+    """一条搜索结果"""
+    position: int  # 命中位置在全文中的字符位置
+    chapter_index: int
+    chapter_title: str
+    context: str  # 命中位置附近的文本
+
+
+class BookSearchIndex:
+    """当前打开书籍的全文检索索引
+
+    每页保存一个二元组签名（散列后的位图），查询时只有包含查询中全部二元组的页才需要真正比对文本，
+    其余页直接跳过。与记录每个二元组所有出现位置的倒排表相比，签名只占每页8KB，
+    五十兆的小说也只需几兆内存；散列冲突带来的误判由逐页比对排除。
+    索引在后台逐页建立，尚未建立签名的页在查询时直接比对。
+    """
+
+    def __init__(self, document, chapters: Optional[List] = None):
+        self.document = document
+        self.page_starts = list(document.page_offsets())  # 末尾为全文长度
+        self.signatures: List[Optional[bytes]] = [None] * max(0, len(self.page_starts) - 1)
+        self.chapters = chapters or []
+        # 按起点排序的(起点, 章节序号)：EPUB目录的顺序不一定与正文一致，起点相同时取序号最大的一项
+        order = sorted((chapter['start'], index) for index, chapter in enumerate(self.chapters))
+        self.chapter_starts = [start for start, _ in order]
+        self.chapter_rows = [index for _, index in order]
+
+    @property
+    def page_count(self) -> int:
+        return len(self.signatures)
+
+    @property
+    def indexed_pages(self) -> int:
+        return sum(1 for signature in self.signatures if signature is not None)
+
+    def _page_text(self, index: int, overlap: int) -> str:
+        """第index页的文本，附带下一页开头的overlap个字符，使跨页的命中也能找到"""
+        return self.document.get_range(self.page_starts[index], self.page_starts[index + 1] + overlap)
+
+    def build(self, progress_callback: Optional[Callable[[int, str], None]] = None,
+              is_cancelled: Optional[Callable[[], bool]] = None) -> None:
+        """逐页建立签名，可随时取消，已建立的签名仍然有效"""
+        for index in range(self.page_count):
+            if is_cancelled and is_cancelled():
+                return
+            if self.signatures[index] is not None:
+                continue
+            signature = bytearray(SIGNATURE_BITS // 8)
+            # 多取一个字符，把跨页的二元组也计入本页
+            for bucket in bigram_buckets(self._page_text(index, 1)):
+                signature[bucket >> 3] |= 1 << (bucket & 7)
+            self.signatures[index] = bytes(signature)
+            if progress_callback:
+                progress_callback((index + 1) * 100 // self.page_count, '正在建立搜索索引')
+
+    def may_contain(self, index: int, buckets: Set[int]) -> bool:
+        """第index页是否可能包含查询，没有签名的页总是需要比对"""
+        signature = self.signatures[index]
+        if signature is None:
+            return True
+        return all(signature[bucket >> 3] >> (bucket & 7) & 1 for bucket in buckets)
+
+    def chapter_of_position(self, position: int) -> int:
+        if not self.chapter_rows:
+            return 0
+        return self.chapter_rows[max(0, bisect.bisect_right(self.chapter_starts, position) - 1)]
+
+    def _make_hit(self, position: int, text: str, offset: int, length: int) -> SearchHit:
+        chapter_index = self.chapter_of_position(position)
+        title = self.chapters[chapter_index]['title'] if self.chapters else ''
+        context = text[max(0, offset - CONTEXT_CHARS):offset + length + CONTEXT_CHARS]
+        return SearchHit(position, chapter_index, title, ' '.join(context.split()))
+
+    def search(self, query: str, is_cancelled: Optional[Callable[[], bool]] = None) -> Iterator[List[SearchHit]]:
+        """按页顺序查找query，每处理完一个有命中的页就产出该页的结果"""
+        if not query:
+            return
+        buckets = bigram_buckets(query)
+        overlap = len(query) - 1
+        for index in range(self.page_count):
+            if is_cancelled and is_cancelled():
+                return
+            if not self.may_contain(index, buckets):
+                continue
+            page_start = self.page_starts[index]
+            page_end = self.page_starts[index + 1]
+            # 前后多取一些文本用于显示上下文
+            base = max(0, page_start - CONTEXT_CHARS)
+            text = self.document.get_range(base, page_end + overlap + CONTEXT_CHARS)
+            hits = []
+            offset = text.find(query, page_start - base)
+            # 只收录起点在本页内的命中，跨页的命中由起点所在的页负责
+            while offset >= 0 and base + offset < page_end:
+                hits.append(self._make_hit(base + offset, text, offset, len(query)))
+                offset = text.find(query, offset + len(query))
+            if hits:
+                yield hits
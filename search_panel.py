@@ -0,0 +1,214 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+import bisect
+from typing import List, Optional
+
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, QLabel,
+                             QListWidget, QListWidgetItem)
+from PyQt6.QtCore import Qt, QObject, QRunnable, QThreadPool, pyqtSignal
+
+from search_index import BookSearchIndex, SearchHit
+
+class SearchSignals(QObject):
+    """IndexBuilder和SearchWorker的信号"""
+    progress = pyqtSignal(int, str)
+    hits_found = pyqtSignal(object)  # List[SearchHit]，一页中的命中
+    finished = pyqtSignal()
+
+class IndexBuilder(QRunnable):
+    """在后台逐页建立搜索索引"""
+
+    def __init__(self, index: BookSearchIndex):
+        super().__init__()
+        self.index = index
+        self.signals = SearchSignals()
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    def run(self) -> None:
+        try:
+            self.index.build(self.signals.progress.emit, lambda: self.cancelled)
+        except Exception:
+            # 文档已被关闭，索引作废
+            return
+        if not self.cancelled:
+            self.signals.finished.emit()
+
+class SearchWorker(QRunnable):
+    """在后台执行一次查询，每找到一页的命中就发出一次"""
+
+    def __init__(self, index: BookSearchIndex, query: str):
+        super().__init__()
+        self.index = index
+        self.query = query
+        self.signals = SearchSignals()
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    def run(self) -> None:
+        try:
+            for hits in self.index.search(self.query, lambda: self.cancelled):
+                self.signals.hits_found.emit(hits)
+        except Exception:
+            return
+        if not self.cancelled:
+            self.signals.finished.emit()
+
+class SearchPanel(QWidget):
+    """书内搜索面板：输入框、上一个/下一个按钮和命中列表"""
+    hit_activated = pyqtSignal(int)  # 跳转到命中的字符位置
+    hits_changed = pyqtSignal(str, object)  # 查询词, 已找到的命中位置列表
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.index: Optional[BookSearchIndex] = None
+        self.builder: Optional[IndexBuilder] = None
+        self.worker: Optional[SearchWorker] = None
+        self.query = ''
+        self.hits: List[SearchHit] = []
+        self.positions: List[int] = []
+        self.index_status = ''
+        # 专用线程池，建立索引期间不占用加载文档的全局线程池
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(2)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+
+        input_layout = QHBoxLayout()
+        self.search_input = QLineEdit(self)
+        self.search_input.setPlaceholderText('搜索本书...')
+        self.search_input.setClearButtonEnabled(True)
+        self.search_input.returnPressed.connect(self.start_search)
+        input_layout.addWidget(self.search_input)
+
+        self.prev_button = QPushButton('上一个', self)
+        self.prev_button.clicked.connect(lambda: self.activate_adjacent(-1))
+        input_layout.addWidget(self.prev_button)
+
+        self.next_button = QPushButton('下一个', self)
+        self.next_button.clicked.connect(lambda: self.activate_adjacent(1))
+        input_layout.addWidget(self.next_button)
+        layout.addLayout(input_layout)
+
+        self.status_label = QLabel(self)
+        layout.addWidget(self.status_label)
+
+        self.result_list = QListWidget(self)
+        self.result_list.itemActivated.connect(self.on_item_activated)
+        self.result_list.itemClicked.connect(self.on_item_activated)
+        layout.addWidget(self.result_list)
+
+        # 当前阅读位置由阅读视图提供，用于决定"下一个"从哪里开始
+        self.current_position = 0
+        # 上次跳转到的命中行及跳转后的阅读位置，位置未变时"下一个"从该行继续
+        self.current_row = -1
+        self.landed_position = -1
+
+    def set_document(self, document, chapters: List) -> None:
+        """切换书籍：取消正在进行的索引和查询，为新文档在后台建立索引"""
+        self.cancel()
+        self.clear_results()
+        self.index = BookSearchIndex(document, chapters)
+        self.builder = IndexBuilder(self.index)
+        self.builder.signals.progress.connect(self.on_index_progress)
+        self.builder.signals.finished.connect(self.on_index_finished)
+        self.pool.start(self.builder)
+
+    def cancel(self) -> None:
+        """取消后台任务，关闭文档前调用"""
+        if self.builder:
+            self.builder.cancel()
+            self.builder = None
+        if self.worker:
+            self.worker.cancel()
+            self.worker = None
+
+    def clear_results(self) -> None:
+        self.hits = []
+        self.positions = []
+        self.current_row = -1
+        self.result_list.clear()
+        self.status_label.clear()
+        self.hits_changed.emit(self.query, self.positions)
+
+    def on_index_progress(self, percent: int, message: str) -> None:
+        if self.sender() is not (self.builder.signals if self.builder else None):
+            return
+        self.index_status = f'{message} {percent}%'
+        if not self.worker:
+            self.status_label.setText(self.index_status)
+
+    def on_index_finished(self) -> None:
+        if self.sender() is not (self.builder.signals if self.builder else None):
+            return
+        self.index_status = ''
+        self.builder = None
+        if not self.worker and not self.hits:
+            self.status_label.clear()
+
+    def start_search(self) -> None:
+        """开始新的查询，结果按页陆续显示"""
+        if self.worker:
+            self.worker.cancel()
+            self.worker = None
+        self.query = self.search_input.text()
+        self.clear_results()
+        if not self.query or self.index is None:
+            return
+        self.status_label.setText('正在搜索...')
+        self.worker = SearchWorker(self.index, self.query)
+        self.worker.signals.hits_found.connect(self.on_hits_found)
+        self.worker.signals.finished.connect(self.on_search_finished)
+        self.pool.start(self.worker)
+
+    def on_hits_found(self, hits: List[SearchHit]) -> None:
+        # 丢弃已被取消的查询发出的结果
+        if not self.worker or self.sender() is not self.worker.signals:
+            return
+        for hit in hits:
+            self.hits.append(hit)
+            self.positions.append(hit.position)
+            item = QListWidgetItem(f'{hit.chapter_title}：{hit.context}')
+            item.setData(Qt.ItemDataRole.UserRole, hit.position)
+            self.result_list.addItem(item)
+        self.status_label.setText(f'正在搜索... 已找到{len(self.hits)}处')
+        self.hits_changed.emit(self.query, self.positions)
+        if self.current_row < 0 and hits[-1].position > self.current_position:
+            # 找到当前位置之后的第一处命中时立即跳转，不必等待搜索结束
+            self.activate_adjacent(1)
+
+    def on_search_finished(self) -> None:
+        if not self.worker or self.sender() is not self.worker.signals:
+            return
+        self.worker = None
+        self.status_label.setText(f'共找到{len(self.hits)}处' if self.hits else '没有找到')
+        if self.hits and self.current_row < 0:
+            # 当前位置之后没有命中，回绕到第一处
+            self.activate_adjacent(1)
+
+    def on_item_activated(self, item: QListWidgetItem) -> None:
+        self.result_list.setCurrentItem(item)
+        self.current_row = self.result_list.row(item)
+        self.hit_activated.emit(item.data(Qt.ItemDataRole.UserRole))
+        self.landed_position = self.current_position
+
+    def activate_adjacent(self, direction: int) -> None:
+        """跳转到当前阅读位置之后（direction=1）或之前（direction=-1）的命中，到头后回绕"""
+        if not self.positions:
+            return
+        if 0 <= self.current_row < len(self.positions) and self.current_position == self.landed_position:
+            row = (self.current_row + direction) % len(self.positions)
+        elif direction > 0:
+            row = bisect.bisect_right(self.positions, self.current_position)
+            row = row if row < len(self.positions) else 0
+        else:
+            row = bisect.bisect_left(self.positions, self.current_position) - 1
+            row = row if row >= 0 else len(self.positions) - 1
+        self.on_item_activated(self.result_list.item(row))
@@ -2,10 +2,26 @@
 # Author: BBBQL2021
 # License: GNU General Public License v3.0
 
+import hashlib
 import json
+import logging
 import os
-from dataclasses import dataclass, asdict
+import shutil
+import time
+from dataclasses import dataclass, asdict, field
 from typing import Optional, Dict, Any
+from chapter_cache import ChapterCache
+from text_cache import TextCache
+from fingerprint import content_digest
+from settings_store import SettingsStore
+
+# 存储格式版本：1为旧版按hash(file_path)命名的JSON文件（每次启动都会变化），
+# 2为按稳定内容摘要命名的JSON文件，3为SQLite数据库
+STORAGE_VERSION = 3
+# 记录的书籍路径已不存在且超过该天数未更新的进度和书签会被清理
+ORPHAN_MAX_AGE_DAYS = 180
+
+logger = logging.getLogger(__name__)
 
 @dataclass
 class ReadingProgress:
@@ -20,6 +36,17 @@ class BookmarkItem:
     note: Optional[str] = None
     created_time: str = None
 
+@dataclass
+class BookInfo:
+    """书库中一个文件的元数据，编码和章节数在第一次打开后才知道"""
+    file_path: str
+    title: str
+    size: int
+    mtime_ns: int
+    encoding: Optional[str] = None
+    chapter_count: int = 0
+    last_opened: float = 0.0
+
 @dataclass
 class UserPreferences:
     font_family: str = 'Microsoft YaHei'
@@ -27,102 +54,224 @@ class UserPreferences:
     line_spacing: float = 1.5
     theme: str = 'light'
     auto_scroll_interval: int = 50
+    text_cache_mb: int = 128  # 内存中已解码文本缓存的预算
+    text_disk_cache_mb: int = 1024  # 非UTF-8文本的UTF-8副本占用的磁盘预算，为0时不写副本
     novels_dir: str = ''  # 默认小说文件夹路径
+    # 自定义章节识别规则：每项为正则字符串或[正则, 层级]，为空时使用默认规则
+    chapter_rules: list = field(default_factory=list)
 
 class SettingsManager:
     def __init__(self, app_name: str = '小说阅读器'):
         self.app_name = app_name
         self.settings_dir = os.path.join(os.path.expanduser('~'), '.reader_settings')
+        self.db_file = os.path.join(self.settings_dir, 'reader.db')
+        self.chapters_dir = os.path.join(self.settings_dir, 'chapters')
+        self.text_dir = os.path.join(self.settings_dir, 'text')
+        # 小说文件夹的全文索引，与设置分开存放，体积较大且可以随时重建
+        self.library_db_file = os.path.join(self.settings_dir, 'library.db')
+        # 旧版JSON存储，仅用于迁移
         self.settings_file = os.path.join(self.settings_dir, 'settings.json')
         self.progress_dir = os.path.join(self.settings_dir, 'progress')
         self.bookmarks_dir = os.path.join(self.settings_dir, 'bookmarks')
+        self.storage_version_file = os.path.join(self.settings_dir, 'storage_version')
         
         # 确保目录存在
         os.makedirs(self.settings_dir, exist_ok=True)
-        os.makedirs(self.progress_dir, exist_ok=True)
-        os.makedirs(self.bookmarks_dir, exist_ok=True)
         
-        # 加载设置
-        self.preferences = self.load_preferences()
+        # 偏好设置、阅读进度和书签统一保存在一个SQLite数据库中
+        self.store = SettingsStore(self.db_file)
+        
+        # 章节索引缓存
+        self.chapter_cache = ChapterCache(self.chapters_dir)
+        
         self.reading_progress: Dict[str, ReadingProgress] = {}
         self.bookmarks: Dict[str, list[BookmarkItem]] = {}
+        # (路径, 大小, 修改时间) -> 存储键，避免重复读取文件计算摘要
+        self._book_keys: Dict[tuple, str] = {}
+        
+        # 迁移旧版存储
+        self.migrate_storage()
+        
+        # 加载设置
+        self.preferences = self.load_preferences()
+        
+        # 最近打开的书共用的已解码文本缓存
+        disk_budget = self.preferences.text_disk_cache_mb * 1024 * 1024
+        self.text_cache = TextCache(self.preferences.text_cache_mb * 1024 * 1024,
+                                    self.text_dir if disk_budget else None, disk_budget)
         
     def load_preferences(self) -> UserPreferences:
         """加载用户偏好设置"""
-        if os.path.exists(self.settings_file):
-            try:
-                with open(self.settings_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                return UserPreferences(**data)
-            except Exception:
-                return UserPreferences()
-        return UserPreferences()
+        try:
+            return UserPreferences(**self.store.load_preferences())
+        except Exception:
+            return UserPreferences()
     
     def save_preferences(self) -> None:
         """保存用户偏好设置"""
-        with open(self.settings_file, 'w', encoding='utf-8') as f:
-            json.dump(asdict(self.preferences), f, ensure_ascii=False, indent=2)
+        self.store.save_preferences(asdict(self.preferences))
             
-    def get_progress_file(self, file_path: str) -> str:
-        """获取进度文件路径"""
-        file_hash = str(hash(file_path))
-        return os.path.join(self.progress_dir, f'{file_hash}.json')
+    def get_book_key(self, file_path: str) -> str:
+        """获取书籍的稳定存储键
+
+        使用文件大小与头尾内容的摘要，跨进程保持不变，文件移动或改名后仍能找到原来的进度和书签。
+        文件不存在时退化为路径摘要。内容变化（如TXT追加了新章节）后摘要随之改变，
+        读取时由_adopt_records按路径找回旧记录。
+        """
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return hashlib.blake2b(os.path.abspath(file_path).encode('utf-8'), digest_size=16).hexdigest()
+        cache_key = (file_path, stat.st_size, stat.st_mtime_ns)
+        key = self._book_keys.get(cache_key)
+        if key is None:
+            key = content_digest(file_path)
+            self._book_keys[cache_key] = key
+        return key
+    
+    def _adopt_records(self, file_path: str, book_key: str) -> bool:
+        """book_key下没有记录时，把同一路径在旧存储键下的进度和书签移到book_key下，返回是否找到"""
+        old_key = self.store.find_book_key(file_path, book_key)
+        if old_key is None:
+            return False
+        self.store.rekey_book(old_key, book_key)
+        return True
     
     def save_reading_progress(self, progress: ReadingProgress) -> None:
         """保存阅读进度"""
-        progress_file = self.get_progress_file(progress.file_path)
-        with open(progress_file, 'w', encoding='utf-8') as f:
-            json.dump(asdict(progress), f, ensure_ascii=False, indent=2)
+        self.store.save_progress(self.get_book_key(progress.file_path), progress.file_path,
+                                 progress.position, progress.chapter_index)
         self.reading_progress[progress.file_path] = progress
         
     def load_reading_progress(self, file_path: str) -> Optional[ReadingProgress]:
         """加载阅读进度"""
-        progress_file = self.get_progress_file(file_path)
-        if os.path.exists(progress_file):
-            try:
-                with open(progress_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                progress = ReadingProgress(**data)
-                self.reading_progress[file_path] = progress
-                return progress
-            except Exception:
-                return None
-        return None
-    
-    def get_bookmark_file(self, file_path: str) -> str:
-        """获取书签文件路径"""
-        file_hash = str(hash(file_path))
-        return os.path.join(self.bookmarks_dir, f'{file_hash}.json')
+        book_key = self.get_book_key(file_path)
+        row = self.store.load_progress(book_key)
+        if row is None and self._adopt_records(file_path, book_key):
+            row = self.store.load_progress(book_key)
+        if row is None:
+            return None
+        # 文件移动后记录新的路径
+        progress = ReadingProgress(file_path=file_path, position=row['position'],
+                                   chapter_index=row['chapter_index'])
+        self.reading_progress[file_path] = progress
+        return progress
+        
+    def get_recent_books(self, limit: int = 20) -> list[ReadingProgress]:
+        """按最近阅读时间倒序返回阅读进度"""
+        return [ReadingProgress(file_path=row['file_path'], position=row['position'],
+                                chapter_index=row['chapter_index'])
+                for row in self.store.recent_progress(limit)]
     
     def save_bookmarks(self, file_path: str, bookmarks: list[BookmarkItem]) -> None:
-        """保存书签"""
-        bookmark_file = self.get_bookmark_file(file_path)
-        with open(bookmark_file, 'w', encoding='utf-8') as f:
-            json.dump([asdict(b) for b in bookmarks], f, ensure_ascii=False, indent=2)
+        """保存书签（整体替换）"""
+        self.store.replace_bookmarks(self.get_book_key(file_path), file_path, [asdict(b) for b in bookmarks])
         self.bookmarks[file_path] = bookmarks
         
     def load_bookmarks(self, file_path: str) -> list[BookmarkItem]:
         """加载书签"""
-        bookmark_file = self.get_bookmark_file(file_path)
-        if os.path.exists(bookmark_file):
-            try:
-                with open(bookmark_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                bookmarks = [BookmarkItem(**item) for item in data]
-                self.bookmarks[file_path] = bookmarks
-                return bookmarks
-            except Exception:
-                return []
-        return []
+        book_key = self.get_book_key(file_path)
+        rows = self.store.load_bookmarks(book_key)
+        if not rows and self._adopt_records(file_path, book_key):
+            rows = self.store.load_bookmarks(book_key)
+        bookmarks = [BookmarkItem(position=row['position'], text=row['text'], note=row['note'],
+                                  created_time=row['created_time']) for row in rows]
+        self.bookmarks[file_path] = bookmarks
+        return bookmarks
     
     def add_bookmark(self, file_path: str, bookmark: BookmarkItem) -> None:
         """添加书签"""
-        bookmarks = self.load_bookmarks(file_path)
-        bookmarks.append(bookmark)
-        self.save_bookmarks(file_path, bookmarks)
+        self.store.add_bookmark(self.get_book_key(file_path), file_path, asdict(bookmark))
+        if file_path in self.bookmarks:
+            self.bookmarks[file_path].append(bookmark)
         
     def remove_bookmark(self, file_path: str, position: int) -> None:
         """删除书签"""
-        bookmarks = self.load_bookmarks(file_path)
-        bookmarks = [b for b in bookmarks if b.position != position]
-        self.save_bookmarks(file_path, bookmarks)
\ No newline at end of file
+        self.store.remove_bookmark(self.get_book_key(file_path), position)
+        if file_path in self.bookmarks:
+            self.bookmarks[file_path] = [b for b in self.bookmarks[file_path] if b.position != position]
+            
+    def load_library(self) -> list[BookInfo]:
+        """读取缓存的书库元数据，启动时直接显示，不必等待扫描"""
+        return [BookInfo(**dict(row)) for row in self.store.load_library()]
+        
+    def save_library(self, books: list[BookInfo]) -> None:
+        self.store.save_library([asdict(book) for book in books])
+        
+    def remove_library(self, file_paths: list[str]) -> None:
+        self.store.remove_library(file_paths)
+        
+    def close(self) -> None:
+        """关闭数据库连接"""
+        self.store.close()
+        
+    def migrate_storage(self) -> None:
+        """一次性把旧版JSON文件中的偏好设置、进度和书签导入数据库，并删除旧文件（无法导入的偏好设置文件改名为.bak）
+
+        兼容两种旧格式：按hash(file_path)命名（版本1）和按内容摘要命名（版本2）。
+        """
+        if int(self.store.get_meta('storage_version', '0')) >= STORAGE_VERSION:
+            return
+        
+        if os.path.exists(self.settings_file):
+            try:
+                with open(self.settings_file, 'r', encoding='utf-8') as f:
+                    self.store.save_preferences(json.load(f))
+            except Exception as e:
+                # 导入失败时改名保留旧文件，以便手动恢复
+                backup = self.settings_file + '.bak'
+                os.replace(self.settings_file, backup)
+                logger.warning('无法导入旧版偏好设置，已另存为%s：%s', backup, e)
+            else:
+                os.remove(self.settings_file)
+        
+        # 版本1中同一进程里进度和书签使用相同的文件名，借助进度文件里记录的路径把书签对应回书籍
+        legacy_paths = {}
+        for name, path in self._list_json_files(self.progress_dir):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    progress = ReadingProgress(**json.load(f))
+            except Exception:
+                continue
+            if os.path.exists(progress.file_path):
+                legacy_paths[name] = progress.file_path
+                # 按修改时间从旧到新导入，同一本书保留最新的进度
+                self.store.save_progress(self.get_book_key(progress.file_path), progress.file_path,
+                                         progress.position, progress.chapter_index, os.path.getmtime(path))
+                
+        for name, path in self._list_json_files(self.bookmarks_dir):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    file_path, items = data['file_path'], data['bookmarks']
+                else:
+                    file_path, items = legacy_paths.get(name), data
+                if file_path and os.path.exists(file_path):
+                    self.save_bookmarks(file_path, [BookmarkItem(**item) for item in items])
+            except Exception:
+                continue
+                
+        for directory in (self.progress_dir, self.bookmarks_dir):
+            shutil.rmtree(directory, ignore_errors=True)
+        if os.path.exists(self.storage_version_file):
+            os.remove(self.storage_version_file)
+        self.collect_garbage()
+        self.store.set_meta('storage_version', str(STORAGE_VERSION))
+            
+    def _list_json_files(self, directory: str) -> list:
+        """列出旧版目录中的JSON文件，按修改时间从旧到新排序"""
+        if not os.path.isdir(directory):
+            return []
+        files = [(name, os.path.join(directory, name)) for name in os.listdir(directory)
+                 if name.endswith('.json')]
+        files.sort(key=lambda item: os.path.getmtime(item[1]))
+        return files
+        
+    def collect_garbage(self) -> int:
+        """清理对应书籍已不存在且长期未更新的进度和书签，以及失效的章节缓存，返回删除的记录数"""
+        deadline = time.time() - ORPHAN_MAX_AGE_DAYS * 24 * 3600
+        # 文件移动后首次打开会更新记录的路径，因此只清理长期未更新的记录
+        orphans = [row['book_key'] for row in self.store.book_paths()
+                   if row['updated_at'] < deadline and not os.path.exists(row['file_path'])]
+        return self.store.delete_books(orphans) + self.chapter_cache.collect_garbage()
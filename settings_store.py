@@ -0,0 +1,187 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS preferences (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS progress (
+    book_key TEXT PRIMARY KEY,
+    file_path TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    chapter_index INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_progress_updated ON progress(updated_at);
+CREATE INDEX IF NOT EXISTS idx_progress_path ON progress(file_path);
+CREATE TABLE IF NOT EXISTS bookmarks (
+    id INTEGER PRIMARY KEY,
+    book_key TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    text TEXT,
+    note TEXT,
+    created_time TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_bookmarks_book ON bookmarks(book_key, position);
+CREATE INDEX IF NOT EXISTS idx_bookmarks_path ON bookmarks(file_path);
+CREATE TABLE IF NOT EXISTS library (
+    file_path TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    encoding TEXT,
+    chapter_count INTEGER NOT NULL DEFAULT 0,
+    last_opened REAL NOT NULL DEFAULT 0
+);
+"""
+
+BOOKMARK_FIELDS = ('position', 'text', 'note', 'created_time')
+LIBRARY_FIELDS = ('file_path', 'title', 'size', 'mtime_ns', 'encoding', 'chapter_count', 'last_opened')
+
+class SettingsStore:
+    """基于SQLite（WAL模式）的单文件设置存储
+
+    偏好设置按字段保存为JSON值，阅读进度和书签各占一张带索引的表，
+    书签增删都是单行写入。连接可在多个线程间共享，所有访问由同一把锁串行化。
+    """
+
+    def __init__(self, db_file: str):
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def _query(self, sql: str, params: Iterable = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, tuple(params)).fetchall()
+
+    def _execute(self, sql: str, params: Iterable = ()) -> int:
+        """在一个事务中执行单条写语句，返回受影响的行数"""
+        with self._lock, self._conn:
+            return self._conn.execute(sql, tuple(params)).rowcount
+
+    def get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        rows = self._query('SELECT value FROM meta WHERE key = ?', (key,))
+        return rows[0]['value'] if rows else default
+
+    def set_meta(self, key: str, value: str) -> None:
+        self._execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    def load_preferences(self) -> Dict[str, Any]:
+        """读取所有偏好设置字段"""
+        return {row['key']: json.loads(row['value']) for row in self._query('SELECT key, value FROM preferences')}
+
+    def save_preferences(self, preferences: Dict[str, Any]) -> None:
+        """保存所有偏好设置字段"""
+        rows = [(key, json.dumps(value, ensure_ascii=False)) for key, value in preferences.items()]
+        with self._lock, self._conn:
+            self._conn.executemany('INSERT OR REPLACE INTO preferences (key, value) VALUES (?, ?)', rows)
+
+    def save_progress(self, book_key: str, file_path: str, position: int, chapter_index: int,
+                      updated_at: Optional[float] = None) -> None:
+        self._execute(
+            'INSERT OR REPLACE INTO progress (book_key, file_path, position, chapter_index, updated_at) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (book_key, file_path, position, chapter_index, updated_at or time.time()))
+
+    def load_progress(self, book_key: str) -> Optional[sqlite3.Row]:
+        rows = self._query('SELECT * FROM progress WHERE book_key = ?', (book_key,))
+        return rows[0] if rows else None
+
+    def recent_progress(self, limit: int) -> List[sqlite3.Row]:
+        """按最近阅读时间倒序返回阅读进度"""
+        return self._query('SELECT * FROM progress ORDER BY updated_at DESC LIMIT ?', (limit,))
+
+    def load_bookmarks(self, book_key: str) -> List[sqlite3.Row]:
+        return self._query('SELECT * FROM bookmarks WHERE book_key = ? ORDER BY id', (book_key,))
+
+    def add_bookmark(self, book_key: str, file_path: str, bookmark: Dict[str, Any]) -> None:
+        self._execute(
+            'INSERT INTO bookmarks (book_key, file_path, position, text, note, created_time, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (book_key, file_path, *(bookmark.get(name) for name in BOOKMARK_FIELDS), time.time()))
+
+    def remove_bookmark(self, book_key: str, position: int) -> None:
+        self._execute('DELETE FROM bookmarks WHERE book_key = ? AND position = ?', (book_key, position))
+
+    def replace_bookmarks(self, book_key: str, file_path: str, bookmarks: List[Dict[str, Any]]) -> None:
+        """在一个事务中替换某本书的全部书签"""
+        now = time.time()
+        rows = [(book_key, file_path, *(bookmark.get(name) for name in BOOKMARK_FIELDS), now)
+                for bookmark in bookmarks]
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM bookmarks WHERE book_key = ?', (book_key,))
+            self._conn.executemany(
+                'INSERT INTO bookmarks (book_key, file_path, position, text, note, created_time, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def load_library(self) -> List[sqlite3.Row]:
+        """读取书库中所有文件的元数据"""
+        return self._query('SELECT * FROM library')
+
+    def save_library(self, books: List[Dict[str, Any]]) -> None:
+        """在一个事务中写入（覆盖）若干文件的元数据"""
+        rows = [tuple(book.get(name) for name in LIBRARY_FIELDS) for book in books]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f'INSERT OR REPLACE INTO library ({", ".join(LIBRARY_FIELDS)}) VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def remove_library(self, file_paths: List[str]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany('DELETE FROM library WHERE file_path = ?', [(path,) for path in file_paths])
+
+    def book_paths(self) -> List[sqlite3.Row]:
+        """列出进度和书签中记录的每本书最后的路径和更新时间"""
+        return self._query(
+            'SELECT book_key, file_path, MAX(updated_at) AS updated_at FROM ('
+            'SELECT book_key, file_path, updated_at FROM progress UNION ALL '
+            'SELECT book_key, file_path, updated_at FROM bookmarks) GROUP BY book_key')
+
+    def find_book_key(self, file_path: str, exclude_key: str) -> Optional[str]:
+        """按路径查找最近一次记录进度或书签时使用的其他存储键，没有时返回None"""
+        rows = self._query(
+            'SELECT book_key FROM ('
+            'SELECT book_key, updated_at FROM progress WHERE file_path = ? AND book_key != ? UNION ALL '
+            'SELECT book_key, updated_at FROM bookmarks WHERE file_path = ? AND book_key != ?) '
+            'ORDER BY updated_at DESC LIMIT 1', (file_path, exclude_key, file_path, exclude_key))
+        return rows[0]['book_key'] if rows else None
+
+    def rekey_book(self, old_key: str, new_key: str) -> None:
+        """把一本书的进度和书签从old_key移到new_key下，new_key已有的记录优先保留"""
+        with self._lock, self._conn:
+            self._conn.execute('UPDATE OR IGNORE progress SET book_key = ? WHERE book_key = ?', (new_key, old_key))
+            self._conn.execute('DELETE FROM progress WHERE book_key = ?', (old_key,))
+            self._conn.execute(
+                'UPDATE bookmarks SET book_key = ? WHERE book_key = ? '
+                'AND NOT EXISTS (SELECT 1 FROM bookmarks WHERE book_key = ?)', (new_key, old_key, new_key))
+
+    def delete_books(self, book_keys: List[str]) -> int:
+        """删除若干本书的进度和书签，返回删除的行数"""
+        removed = 0
+        with self._lock, self._conn:
+            for book_key in book_keys:
+                removed += self._conn.execute('DELETE FROM progress WHERE book_key = ?', (book_key,)).rowcount
+                removed += self._conn.execute('DELETE FROM bookmarks WHERE book_key = ?', (book_key,)).rowcount
+        return removed
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
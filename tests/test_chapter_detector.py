@@ -0,0 +1,56 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+import pytest
+
+import chapter_detector
+from chapter_detector import ChapterDetector
+from document import TextDocument
+
+
+@pytest.mark.parametrize('text', ['1.\n\n正文开始了', 'Chapter\n\n7 days later', '第\n三章 标题'])
+def test_default_rules_do_not_match_across_lines(text):
+    assert ChapterDetector().detect(text) == []
+
+
+def test_detect_positions_lines_and_levels():
+    text = '序言\n第一卷 风起\n　　正文\n第二章 云涌\nChapter 3\n12. Title\n'
+    chapters = ChapterDetector().detect(text, base_offset=100, base_line=10)
+    assert [chapter['title'] for chapter in chapters] == ['第一卷 风起', '第二章 云涌', 'Chapter 3', '12. Title']
+    assert [chapter['level'] for chapter in chapters] == [1, 2, 2, 2]
+    assert [chapter['line'] for chapter in chapters] == [11, 13, 14, 15]
+    assert chapters[0]['start'] == 100 + text.index('第一卷')
+    assert chapters[1]['start'] == 100 + text.index('第二章')
+
+
+def test_user_rule_matching_newline_is_rejected_without_hiding_next_line():
+    detector = ChapterDetector([(r'\d+\.\s+\w+', 1)])
+    chapters = detector.detect('1.\n\n2. 标题\n')
+    assert [(chapter['title'], chapter['line']) for chapter in chapters] == [('2. 标题', 2)]
+
+
+def test_invalid_user_rules_fall_back_to_defaults():
+    detector = ChapterDetector(['第(章'])
+    assert detector.rules == list(chapter_detector.DEFAULT_RULES)
+
+
+def test_signature_depends_on_rules():
+    assert ChapterDetector().signature == ChapterDetector().signature
+    assert ChapterDetector().signature != ChapterDetector([(r'卷\d+', 1)]).signature
+
+
+def test_scan_matches_detect_across_chunks(monkeypatch):
+    text = ''.join(f'第{i}章 标题{i}\n' + '正文内容。' * (i % 7) + '\n' for i in range(1, 200))
+    monkeypatch.setattr(chapter_detector, 'SCAN_CHUNK_SIZE', 64)
+    detector = ChapterDetector()
+    assert detector.scan(TextDocument(text)) == detector.detect(text)
+
+
+def test_scan_does_not_split_long_lines(monkeypatch):
+    # 超过一块的长行，行中间恰好在块边界处出现"第九章"，不能当作标题
+    text = '第一章 开始\n' + '甲' * 64 + '第九章 不是标题' + '乙' * 100 + '\n第二章 结束\n'
+    monkeypatch.setattr(chapter_detector, 'SCAN_CHUNK_SIZE', 64)
+    chapters = ChapterDetector().scan(TextDocument(text))
+    assert [(chapter['title'], chapter['line']) for chapter in chapters] == [('第一章 开始', 0), ('第二章 结束', 2)]
+    assert chapters[1]['start'] == text.index('第二章')
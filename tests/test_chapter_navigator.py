@@ -0,0 +1,43 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+import pytest
+
+pytest.importorskip('PyQt6.QtWidgets')
+from PyQt6.QtWidgets import QApplication
+
+from chapter_navigator import ChapterModel
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+def make_model(starts):
+    model = ChapterModel()
+    model.set_chapters([{'title': f'章{row}', 'start': start, 'level': 1} for row, start in enumerate(starts)])
+    return model
+
+
+def test_chapter_of_sorted_starts(app):
+    model = make_model([0, 0, 100, 250])
+    assert [model.chapter_of(position) for position in (0, 99, 100, 249, 250, 10 ** 6)] == [1, 1, 2, 2, 3, 3]
+    assert model.sorted_rows is None
+
+
+def test_chapter_of_unsorted_starts_returns_toc_rows(app):
+    # 目录顺序与正文顺序不一致的EPUB：第1行指向正文最后，第3行与第0行起点相同
+    model = make_model([100, 900, 0, 100, 500])
+    assert model.chapter_of(0) == 2
+    assert model.chapter_of(150) == 3
+    assert model.chapter_of(500) == 4
+    assert model.chapter_of(899) == 4
+    assert model.chapter_of(1000) == 1
+    assert model.rowCount() == 5
+    assert model.data(model.index(1), ChapterModel.PositionRole) == 900
+
+
+def test_chapter_of_empty(app):
+    assert make_model([]).chapter_of(10) == -1
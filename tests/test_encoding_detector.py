@@ -0,0 +1,68 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+import codecs
+
+import pytest
+
+from encoding_detector import (candidate_encodings, decode_bytes, detect_encoding, normalize_encoding,
+                               read_samples, read_text, SAMPLE_SIZE)
+
+SIMPLIFIED = '第一章 风起\n　　夜色渐深，山风穿过竹林，少年握紧了手中的长剑，望向远处灯火通明的城池。\n'
+TRADITIONAL = '第一章 風起\n　　夜色漸深，山風穿過竹林，少年握緊了手中的長劍，望向遠處燈火通明的城池。\n'
+# GB18030独有的四字节字符，GBK无法编码
+GB18030_TEXT = SIMPLIFIED + '生僻字𠀀𪚥\n'
+
+
+@pytest.mark.parametrize('encoding, text, detected', [
+    ('gb18030', GB18030_TEXT * 200, 'gb18030'),
+    ('gbk', SIMPLIFIED * 200, 'gb18030'),
+    ('utf-8', SIMPLIFIED * 200, 'utf-8'),
+    ('utf-16', SIMPLIFIED * 200, 'utf-16'),
+    ('utf-8-sig', SIMPLIFIED * 200, 'utf-8-sig'),
+    ('big5', TRADITIONAL * 200, 'big5'),
+])
+def test_round_trip(tmp_path, encoding, text, detected):
+    path = tmp_path / f'{encoding}.txt'
+    # Python的utf-16编码器会写出BOM
+    path.write_bytes(text.encode(encoding))
+    assert detect_encoding(str(path))[0] == detected
+    assert read_text(str(path)) == (text, detected)
+
+
+@pytest.mark.parametrize('bom, encoding', [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+])
+def test_bom_has_full_confidence(tmp_path, bom, encoding):
+    path = tmp_path / 'bom.txt'
+    # 正文不能以两个零字节开头，否则UTF-16 LE的BOM会被当作UTF-32 LE
+    path.write_bytes(bom + b'ab' * 4)
+    assert detect_encoding(str(path)) == (encoding, 1.0)
+
+
+def test_large_utf8_file_sampled_across_character_boundaries(tmp_path):
+    # 大于三个采样窗口，中部和尾部窗口的起点会落在多字节字符中间
+    text = (SIMPLIFIED * (SAMPLE_SIZE // 20))[:SAMPLE_SIZE * 2] + 'x' + SIMPLIFIED * (SAMPLE_SIZE // 20)
+    path = tmp_path / 'large.txt'
+    path.write_bytes(text.encode('utf-8'))
+    samples = read_samples(str(path))
+    assert len(samples) == 3
+    assert all(len(sample) <= SAMPLE_SIZE for sample in samples)
+    assert detect_encoding(str(path)) == ('utf-8', 0.99)
+
+
+def test_normalize_and_candidates():
+    assert normalize_encoding('GB2312') == 'gb18030'
+    assert normalize_encoding('ascii') == 'utf-8'
+    assert normalize_encoding('no-such-codec') is None
+    assert candidate_encodings('gbk') == ['gb18030', 'utf-8', 'big5', 'utf-16']
+    assert candidate_encodings(None) == ['utf-8', 'gb18030', 'big5', 'utf-16']
+
+
+def test_decode_bytes_falls_back_when_detection_is_wrong():
+    data = GB18030_TEXT.encode('gb18030')
+    assert decode_bytes(data, 'utf-8') == (GB18030_TEXT, 'gb18030')
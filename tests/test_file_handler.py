@@ -0,0 +1,41 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+import pytest
+
+from chapter_cache import ChapterCache
+from file_handler import FileHandler
+
+BODY = '　　正文第{0}段，剑光如水。\n' * 30
+TEXT = '序言\n' + ''.join(f'第{number}章 标题{number}\n' + BODY.format(number) for number in range(1, 6))
+
+
+@pytest.fixture
+def book(tmp_path):
+    path = tmp_path / 'book.txt'
+    path.write_bytes(TEXT.encode('gbk'))
+    return str(path)
+
+
+def expected_starts():
+    return [0] + [TEXT.index(f'第{number}章') for number in range(1, 6)]
+
+
+@pytest.mark.parametrize('use_cache', [False, True])
+def test_chapters_from_lazy_document(book, tmp_path, use_cache):
+    chapter_cache = ChapterCache(str(tmp_path / 'chapters')) if use_cache else None
+    for _ in range(2 if use_cache else 1):
+        # 第二次打开命中章节缓存
+        handler = FileHandler(chapter_cache=chapter_cache)
+        document = handler.open_document(book)
+        try:
+            chapters = handler.get_chapters()
+            assert [chapter['title'] for chapter in chapters] == ['开始'] + [f'第{n}章 标题{n}' for n in range(1, 6)]
+            starts = expected_starts()
+            assert [chapter['start'] for chapter in chapters] == starts
+            assert document.get_range(starts[5], len(document)) == TEXT[starts[5]:]
+            # 章节只记录起点，不另存正文
+            assert 'content' not in chapters[1]
+        finally:
+            document.close()
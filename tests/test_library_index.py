@@ -0,0 +1,37 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+import pytest
+
+from library_index import LibraryIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = LibraryIndex(str(tmp_path / 'library.db'))
+    yield index
+    index.close()
+
+
+def add_book(index, path, text):
+    index.index_book(path, len(text), 0, path, iter([(0, text)]))
+
+
+def test_search_positions_point_at_original_text(index):
+    # 'İ'转小写后变为两个字符，先转小写再查找会让位置错开
+    text = 'İİİ序言\n天下第一的剑客Hero出场了'
+    add_book(index, 'a.txt', text)
+    hits = index.search('天下第一')
+    assert [(hit.file_path, hit.position) for hit in hits] == [('a.txt', text.index('天下第一'))]
+    hits = index.search('hero')
+    assert [hit.position for hit in hits] == [text.index('Hero')]
+    assert 'Hero' in hits[0].context
+
+
+def test_remove_paths(index):
+    add_book(index, 'a.txt', '天下第一')
+    add_book(index, 'b.txt', '天下第二')
+    assert index.remove_paths(['a.txt', 'missing.txt']) == 1
+    assert set(index.indexed_books()) == {'b.txt'}
+    assert [hit.file_path for hit in index.search('天下')] == ['b.txt']
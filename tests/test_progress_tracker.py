@@ -0,0 +1,64 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+import pytest
+
+pytest.importorskip('PyQt6.QtCore')
+from PyQt6.QtCore import QCoreApplication
+
+from progress_tracker import ProgressTracker
+from settings import ReadingProgress
+
+
+class FlakyStore:
+    """前failures次写入失败的设置管理器"""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.saved = []
+
+    def save_reading_progress(self, progress: ReadingProgress) -> None:
+        if self.failures:
+            self.failures -= 1
+            raise OSError('database is locked')
+        self.saved.append(progress)
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+def write(tracker, app):
+    tracker.save_async()
+    tracker.pool.waitForDone()
+    # 处理后台线程发出的saved/failed信号
+    app.processEvents()
+
+
+def test_failed_write_is_retried(app):
+    store = FlakyStore(failures=1)
+    tracker = ProgressTracker(store)
+    tracker.track('book.txt', 100, 1)
+    write(tracker, app)
+    assert store.saved == [] and tracker.last_saved is None
+    # 位置没有变化，下一次定时保存仍要重试
+    write(tracker, app)
+    assert store.saved == [ReadingProgress('book.txt', 100, 1)]
+    assert tracker.last_saved == ReadingProgress('book.txt', 100, 1)
+    tracker.periodic_timer.stop()
+
+
+def test_unchanged_position_is_written_once(app):
+    store = FlakyStore(failures=0)
+    tracker = ProgressTracker(store)
+    for _ in range(3):
+        tracker.track('book.txt', 100, 1)
+        write(tracker, app)
+    assert len(store.saved) == 1
+    tracker.reset(ReadingProgress('other.txt', 5, 0))
+    tracker.track('other.txt', 5, 0)
+    write(tracker, app)
+    assert len(store.saved) == 1
+    tracker.periodic_timer.stop()
@@ -0,0 +1,29 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+from document import TextDocument
+from search_index import BookSearchIndex
+
+
+def search_all(index, query):
+    return [hit for hits in index.search(query) for hit in hits]
+
+
+def test_hits_report_chapter_of_unsorted_toc():
+    text = '序章\n' + '甲' * 50 + '\n第一章\n' + '乙' * 50 + '剑光\n第二章\n' + '丙' * 50 + '剑光\n'
+    first, second = text.index('第一章'), text.index('第二章')
+    # 目录顺序与正文顺序不一致
+    chapters = [{'title': '第二章', 'start': second}, {'title': '序章', 'start': 0},
+                {'title': '第一章', 'start': first}]
+    index = BookSearchIndex(TextDocument(text), chapters)
+    index.build()
+    hits = search_all(index, '剑光')
+    assert [(hit.position, hit.chapter_index, hit.chapter_title) for hit in hits] == [
+        (text.index('剑光'), 2, '第一章'), (text.rindex('剑光'), 0, '第二章')]
+
+
+def test_hits_without_chapters():
+    index = BookSearchIndex(TextDocument('一二三剑光'), [])
+    hits = search_all(index, '剑光')
+    assert [(hit.position, hit.chapter_index, hit.chapter_title) for hit in hits] == [(3, 0, '')]
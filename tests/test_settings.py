@@ -0,0 +1,135 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+import json
+import os
+
+import pytest
+
+from settings import STORAGE_VERSION, BookmarkItem, ReadingProgress, SettingsManager
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    manager = SettingsManager()
+    yield manager
+    manager.close()
+
+
+def append_chapter(path):
+    # 修改时间可能与写入前相同，推后一秒保证get_book_key重新计算摘要
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('第三章 新章节\n' + '后续正文。' * 1000 + '\n')
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_progress_and_bookmarks_survive_appended_chapters(manager, tmp_path):
+    path = str(tmp_path / 'book.txt')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('第一章 开始\n' + '正文。' * 20000 + '\n第二章 继续\n')
+    manager.save_reading_progress(ReadingProgress(path, 1234, 1))
+    manager.save_bookmarks(path, [BookmarkItem(100, '书签'), BookmarkItem(200, '另一个')])
+    old_key = manager.get_book_key(path)
+
+    append_chapter(path)
+    new_key = manager.get_book_key(path)
+    assert new_key != old_key
+
+    progress = manager.load_reading_progress(path)
+    assert (progress.position, progress.chapter_index) == (1234, 1)
+    assert [bookmark.position for bookmark in manager.load_bookmarks(path)] == [100, 200]
+    # 旧记录已移到新的存储键下
+    assert manager.store.load_progress(old_key) is None
+    assert manager.store.load_bookmarks(old_key) == []
+    assert manager.store.load_progress(new_key)['position'] == 1234
+
+
+def test_new_key_records_take_precedence(manager, tmp_path):
+    path = str(tmp_path / 'book.txt')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('正文。' * 20000)
+    manager.save_bookmarks(path, [BookmarkItem(100, '旧书签')])
+    manager.save_reading_progress(ReadingProgress(path, 10, 0))
+    append_chapter(path)
+    manager.save_reading_progress(ReadingProgress(path, 500, 2))
+
+    # 新键下已有进度，不用旧进度覆盖；书签仍从旧键找回
+    assert [bookmark.text for bookmark in manager.load_bookmarks(path)] == ['旧书签']
+    assert manager.load_reading_progress(path).position == 500
+
+
+def test_unknown_book_has_no_records(manager, tmp_path):
+    path = str(tmp_path / 'other.txt')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('正文')
+    assert manager.load_reading_progress(path) is None
+    assert manager.load_bookmarks(path) == []
+
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def test_migrate_legacy_json_storage(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    settings_dir = tmp_path / '.reader_settings'
+    books = []
+    for name in ('a', 'b'):
+        path = str(tmp_path / f'{name}.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f'{name}的正文' * 100)
+        books.append(path)
+    write_json(str(settings_dir / 'settings.json'), {'font_size': 18, 'theme': 'dark'})
+    # 版本1：进度和书签同名，书签是没有路径的列表
+    write_json(str(settings_dir / 'progress' / '123.json'),
+               {'file_path': books[0], 'position': 42, 'chapter_index': 3})
+    write_json(str(settings_dir / 'bookmarks' / '123.json'), [{'position': 7, 'text': '旧书签'}])
+    # 版本2：书签文件自带路径
+    write_json(str(settings_dir / 'bookmarks' / 'digest.json'),
+               {'file_path': books[1], 'bookmarks': [{'position': 9, 'text': '新格式', 'note': '注'}]})
+    # 文件已不存在的旧进度直接丢弃
+    write_json(str(settings_dir / 'progress' / '999.json'),
+               {'file_path': str(tmp_path / 'gone.txt'), 'position': 1, 'chapter_index': 0})
+
+    manager = SettingsManager()
+    try:
+        assert manager.preferences.font_size == 18 and manager.preferences.theme == 'dark'
+        progress = manager.load_reading_progress(books[0])
+        assert (progress.position, progress.chapter_index) == (42, 3)
+        assert [(b.position, b.text) for b in manager.load_bookmarks(books[0])] == [(7, '旧书签')]
+        assert [(b.position, b.note) for b in manager.load_bookmarks(books[1])] == [(9, '注')]
+        assert manager.load_reading_progress(str(tmp_path / 'gone.txt')) is None
+        assert manager.store.get_meta('storage_version') == str(STORAGE_VERSION)
+        for name in ('settings.json', 'progress', 'bookmarks'):
+            assert not (settings_dir / name).exists()
+    finally:
+        manager.close()
+
+    # 迁移只进行一次，重新打开时数据仍在
+    manager = SettingsManager()
+    try:
+        assert manager.load_reading_progress(books[0]).position == 42
+    finally:
+        manager.close()
+
+
+def test_migrate_keeps_unreadable_settings_as_backup(tmp_path, monkeypatch, caplog):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    settings_dir = tmp_path / '.reader_settings'
+    settings_dir.mkdir()
+    (settings_dir / 'settings.json').write_text('{"font_size": 18', encoding='utf-8')
+
+    manager = SettingsManager()
+    try:
+        # 导入失败时使用默认设置，旧文件改名保留
+        assert manager.preferences.font_size != 18
+        assert not (settings_dir / 'settings.json').exists()
+        assert (settings_dir / 'settings.json.bak').read_text(encoding='utf-8') == '{"font_size": 18'
+        assert 'settings.json.bak' in caplog.text
+    finally:
+        manager.close()
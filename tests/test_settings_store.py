@@ -0,0 +1,92 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+import pytest
+
+from settings_store import SettingsStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SettingsStore(str(tmp_path / 'reader.db'))
+    yield store
+    store.close()
+
+
+def test_preferences_and_meta(store):
+    store.save_preferences({'font_size': 14, 'theme': '夜间', 'chapter_rules': [['第.+章', 2]]})
+    store.save_preferences({'font_size': 16})
+    assert store.load_preferences() == {'font_size': 16, 'theme': '夜间', 'chapter_rules': [['第.+章', 2]]}
+    assert store.get_meta('storage_version') is None
+    store.set_meta('storage_version', '3')
+    assert store.get_meta('storage_version') == '3'
+
+
+def test_progress(store):
+    store.save_progress('k1', 'a.txt', 10, 1, updated_at=100)
+    store.save_progress('k2', 'b.txt', 20, 2, updated_at=300)
+    store.save_progress('k1', 'moved/a.txt', 15, 1, updated_at=200)
+    row = store.load_progress('k1')
+    assert (row['file_path'], row['position'], row['chapter_index']) == ('moved/a.txt', 15, 1)
+    assert store.load_progress('missing') is None
+    assert [row['book_key'] for row in store.recent_progress(10)] == ['k2', 'k1']
+    assert [row['book_key'] for row in store.recent_progress(1)] == ['k2']
+
+
+def test_bookmarks(store):
+    store.add_bookmark('k1', 'a.txt', {'position': 5, 'text': '甲', 'note': None, 'created_time': 't1'})
+    store.add_bookmark('k1', 'a.txt', {'position': 9, 'text': '乙', 'note': '备注', 'created_time': 't2'})
+    store.add_bookmark('k2', 'b.txt', {'position': 1, 'text': '丙'})
+    assert [(row['position'], row['text'], row['note']) for row in store.load_bookmarks('k1')] == [
+        (5, '甲', None), (9, '乙', '备注')]
+    store.remove_bookmark('k1', 5)
+    assert [row['position'] for row in store.load_bookmarks('k1')] == [9]
+    store.replace_bookmarks('k1', 'a.txt', [{'position': 1, 'text': '新'}, {'position': 2, 'text': '新2'}])
+    assert [row['text'] for row in store.load_bookmarks('k1')] == ['新', '新2']
+    assert [row['text'] for row in store.load_bookmarks('k2')] == ['丙']
+
+
+def test_book_paths_and_delete(store):
+    store.save_progress('k1', 'a.txt', 10, 1, updated_at=100)
+    store.add_bookmark('k1', 'a.txt', {'position': 5, 'text': '甲'})
+    store.save_progress('k2', 'b.txt', 20, 2, updated_at=50)
+    paths = {row['book_key']: (row['file_path'], row['updated_at']) for row in store.book_paths()}
+    assert paths['k2'] == ('b.txt', 50)
+    assert paths['k1'][1] > 100  # 书签的写入时间更晚
+    assert store.delete_books(['k1']) == 2
+    assert store.load_progress('k1') is None and store.load_bookmarks('k1') == []
+    assert store.load_progress('k2') is not None
+
+
+def test_find_and_rekey_book(store):
+    store.save_progress('old', 'a.txt', 10, 1, updated_at=100)
+    store.add_bookmark('old', 'a.txt', {'position': 5, 'text': '甲'})
+    assert store.find_book_key('a.txt', 'new') == 'old'
+    assert store.find_book_key('a.txt', 'old') is None
+    store.rekey_book('old', 'new')
+    assert store.load_progress('new')['position'] == 10
+    assert [row['position'] for row in store.load_bookmarks('new')] == [5]
+    assert store.find_book_key('a.txt', 'new') is None
+
+
+def test_library(store):
+    book = {'file_path': 'a.txt', 'title': 'a', 'size': 1, 'mtime_ns': 2, 'encoding': None,
+            'chapter_count': 0, 'last_opened': 0.0}
+    store.save_library([book, dict(book, file_path='b.txt', title='b')])
+    store.save_library([dict(book, encoding='gb18030', chapter_count=12)])
+    rows = {row['file_path']: dict(row) for row in store.load_library()}
+    assert rows['a.txt']['encoding'] == 'gb18030' and rows['a.txt']['chapter_count'] == 12
+    store.remove_library(['b.txt'])
+    assert [row['file_path'] for row in store.load_library()] == ['a.txt']
+
+
+def test_data_persists_across_connections(tmp_path):
+    store = SettingsStore(str(tmp_path / 'reader.db'))
+    store.save_progress('k1', 'a.txt', 10, 1)
+    store.close()
+    store = SettingsStore(str(tmp_path / 'reader.db'))
+    try:
+        assert store.load_progress('k1')['position'] == 10
+    finally:
+        store.close()
@@ -0,0 +1,133 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+import random
+
+import pytest
+
+from text_cache import TextCache
+from txt_document import TxtDocument
+
+SIMPLIFIED = ['夜色渐深，山风穿过竹林。', '掌柜的拨了拨算盘，叹气。', 'Chapter 1 ok', '生僻字𠀀𪚥', '']
+TRADITIONAL = ['夜色漸深，山風穿過竹林。', '掌櫃的撥了撥算盤，嘆氣。', 'Chapter 1 ok', '']
+
+
+def make_text(lines, count=400, seed=0):
+    rng = random.Random(seed)
+    return '\n'.join(rng.choice(lines) for _ in range(count)) + '\n'
+
+
+@pytest.fixture(autouse=True)
+def small_pages(monkeypatch):
+    # 页大小取奇数，页边界必然落在多字节字符中间，检验切页是否对齐到字符边界
+    monkeypatch.setattr(TxtDocument, 'PAGE_SIZE', 257)
+
+
+def write_book(tmp_path, text, encoding):
+    path = tmp_path / f'{encoding}.txt'
+    path.write_bytes(text.encode(encoding))
+    return str(path)
+
+
+def check_index(document, text):
+    assert len(document) == len(text)
+    assert document.page_offsets()[-1] == len(text)
+    assert document.page_count > 1
+    for index in range(document.page_count):
+        start, end = document.char_offsets[index], document.char_offsets[index + 1]
+        assert document.page_text(index) == text[start:end]
+        assert document.page_of_position(start) == index
+    rng = random.Random(1)
+    for _ in range(50):
+        start = rng.randrange(len(text))
+        end = start + rng.randrange(2000)
+        assert document.get_range(start, end) == text[start:end]
+
+
+@pytest.mark.parametrize('encoding, lines, codec', [
+    ('gb18030', SIMPLIFIED, 'gb18030'),
+    ('utf-8', SIMPLIFIED, 'utf-8'),
+    ('utf-16', SIMPLIFIED, 'utf-16-le'),
+    ('utf-8-sig', SIMPLIFIED, 'utf-8'),
+    ('big5', TRADITIONAL, 'big5'),
+])
+def test_page_byte_and_char_offsets(tmp_path, encoding, lines, codec):
+    text = make_text(lines)
+    document = TxtDocument(write_book(tmp_path, text, encoding))
+    try:
+        assert document.encoding == encoding
+        assert document.codec == codec
+        check_index(document, text)
+    finally:
+        document.close()
+
+
+@pytest.mark.parametrize('encoding, lines', [('gb18030', SIMPLIFIED), ('utf-16', SIMPLIFIED), ('big5', TRADITIONAL)])
+def test_normalized_copy_and_layout_restore(tmp_path, encoding, lines):
+    text = make_text(lines)
+    path = write_book(tmp_path, text, encoding)
+    normalized_path = str(tmp_path / 'copy.txt')
+    document = TxtDocument(path, normalized_path=normalized_path)
+    try:
+        assert document.data_path == normalized_path
+        assert document.codec == 'utf-8'
+        check_index(document, text)
+        layout = document.layout()
+    finally:
+        document.close()
+    with open(normalized_path, 'rb') as f:
+        assert f.read() == text.encode('utf-8')
+
+    restored = TxtDocument(path, layout=layout, normalized_path=normalized_path)
+    try:
+        assert restored.layout_restored
+        assert restored.encoding == encoding
+        check_index(restored, text)
+    finally:
+        restored.close()
+
+
+def test_stale_layout_is_rebuilt(tmp_path):
+    text = make_text(SIMPLIFIED)
+    path = write_book(tmp_path, text, 'gb18030')
+    normalized_path = str(tmp_path / 'copy.txt')
+    document = TxtDocument(path, normalized_path=normalized_path)
+    layout = document.layout()
+    document.close()
+    # 副本被磁盘缓存回收后，页索引不能再用
+    (tmp_path / 'copy.txt').unlink()
+    document = TxtDocument(path, layout=layout, normalized_path=normalized_path)
+    try:
+        assert not document.layout_restored
+        check_index(document, text)
+    finally:
+        document.close()
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / 'empty.txt'
+    path.write_bytes(b'')
+    document = TxtDocument(str(path))
+    try:
+        assert len(document) == 0
+        assert document.page_count == 0
+        assert document.get_range(0, 10) == ''
+        assert document.page_offsets() == [0]
+    finally:
+        document.close()
+
+
+def test_closed_document_does_not_poison_shared_cache(tmp_path):
+    text = make_text(SIMPLIFIED)
+    path = write_book(tmp_path, text, 'gb18030')
+    cache = TextCache(1 << 24)
+    document = TxtDocument(path, text_cache=cache)
+    document.close()
+    with pytest.raises(ValueError):
+        document.get_range(0, 100)
+    reopened = TxtDocument(path, text_cache=cache)
+    try:
+        assert reopened.get_range(0, 100) == text[:100]
+    finally:
+        reopened.close()
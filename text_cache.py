@@ -0,0 +1,109 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from fingerprint import file_fingerprint
+
+class TextCache:
+    """两级已解码文本缓存
+
+    第一级在内存中，保存已解码的页，按字节预算LRU淘汰。所有打开过的文档共用同一个实例，
+    文档关闭后其页仍保留在缓存中，在最近读过的几本书之间切换时不必重新解码。
+    第二级（可选）在磁盘上，为GBK、Big5等非UTF-8编码的TXT保存规范化的UTF-8副本，
+    第一次打开时在建立页索引的同一遍扫描中写出，之后直接映射副本，解码更快也不必再检测编码。
+    副本按文件指纹命名，原文件被修改后自然失效；总大小超过预算时删除最久未用的副本。
+    """
+
+    def __init__(self, budget_bytes: int, disk_dir: Optional[str] = None, disk_budget_bytes: int = 0):
+        self.budget_bytes = budget_bytes
+        self.disk_dir = disk_dir
+        self.disk_budget_bytes = disk_budget_bytes
+        self._pages = OrderedDict()  # (文档键, 页号) -> 文本
+        self._size = 0  # 已缓存文本占用的字节数
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def get(self, key: Hashable) -> Optional[str]:
+        with self._lock:
+            text = self._pages.get(key)
+            if text is not None:
+                self._pages.move_to_end(key)
+            return text
+
+    def put(self, key: Hashable, text: str) -> None:
+        size = sys.getsizeof(text)
+        with self._lock:
+            old = self._pages.pop(key, None)
+            if old is not None:
+                self._size -= sys.getsizeof(old)
+            self._pages[key] = text
+            self._size += size
+            self._evict()
+
+    def _evict(self) -> None:
+        # 至少保留最新的一项，单页超过预算时也能使用
+        while self._size > self.budget_bytes and len(self._pages) > 1:
+            _, text = self._pages.popitem(last=False)
+            self._size -= sys.getsizeof(text)
+
+    def discard(self, document_key: Hashable) -> None:
+        """删除一个文档的全部页"""
+        with self._lock:
+            for key in [key for key in self._pages if key[0] == document_key]:
+                self._size -= sys.getsizeof(self._pages.pop(key))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pages.clear()
+            self._size = 0
+
+    def normalized_path(self, file_path: str) -> Optional[str]:
+        """file_path的UTF-8副本应保存的路径，未启用磁盘缓存时返回None"""
+        if not self.disk_dir:
+            return None
+        try:
+            return os.path.join(self.disk_dir, f'{file_fingerprint(file_path)}.txt')
+        except OSError:
+            return None
+
+    def touch(self, normalized_path: str) -> None:
+        """记录副本的使用时间，超出预算时按此淘汰"""
+        try:
+            os.utime(normalized_path)
+        except OSError:
+            pass
+
+    def collect_garbage(self) -> int:
+        """磁盘副本总大小超过预算时从最久未用的开始删除，返回删除的文件数"""
+        if not self.disk_dir:
+            return 0
+        entries = []
+        for entry in os.scandir(self.disk_dir):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.disk_budget_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
@@ -0,0 +1,142 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+# 最多保留的事件数，超出后丢弃最早的事件
+MAX_EVENTS = 100000
+
+_enabled = os.environ.get('NOVELQ_TRACE', '') not in ('', '0')
+_events = deque(maxlen=MAX_EVENTS)  # (名称, 开始时间ns, 时长ns, 线程ID, 附加参数)
+_latest: Dict[str, float] = {}  # 名称 -> 最近一次的耗时（毫秒）
+_lock = threading.Lock()
+_origin = time.perf_counter_ns()
+
+
+class _NullSpan:
+    """跟踪关闭时使用的空跨度，进入和退出都不做任何事"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """一段计时区间，退出时记录为一个事件；可在区间内用set()补充参数"""
+    __slots__ = ('name', 'args', 'start')
+
+    def __init__(self, name: str, args: Dict):
+        self.name = name
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter_ns() - self.start
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        with _lock:
+            _events.append((self.name, self.start, duration, threading.get_ident(), self.args))
+            _latest.pop(self.name, None)
+            _latest[self.name] = duration / 1e6
+        return False
+
+    def set(self, **args) -> None:
+        self.args.update(args)
+
+
+def span(name: str, **args):
+    """计时跨度：with span('decode', file=path): ...
+
+    跟踪关闭时返回共用的空跨度，开销只有一次函数调用，可以放在加载、解码等每次操作只执行一次的路径上，
+    但不要放在逐行、逐字符的循环里。
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(name, args)
+
+
+def traced(name: str):
+    """把整个函数记录为一个跨度的装饰器，跟踪关闭时只多一次判断"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def set_enabled(enabled: bool) -> None:
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def clear() -> None:
+    with _lock:
+        _events.clear()
+        _latest.clear()
+
+
+def latest() -> Dict[str, float]:
+    """各跨度最近一次的耗时（毫秒），按最后发生的顺序排列"""
+    with _lock:
+        return dict(_latest)
+
+
+def events() -> List[tuple]:
+    with _lock:
+        return list(_events)
+
+
+def summary(names: Optional[List[str]] = None) -> str:
+    """状态栏显示用的简短摘要，如"open 12.3ms | chapterize 4.5ms\""""
+    durations = latest()
+    if names is not None:
+        durations = {name: durations[name] for name in names if name in durations}
+    return ' | '.join(f'{name} {ms:.1f}ms' for name, ms in durations.items())
+
+
+def export_chrome_trace(path: str) -> int:
+    """把已记录的事件导出为Chrome跟踪格式（chrome://tracing、Perfetto可直接打开），返回事件数"""
+    pid = os.getpid()
+    trace_events = [{
+        'name': name,
+        'cat': 'novelq',
+        'ph': 'X',
+        'ts': (start - _origin) / 1000,
+        'dur': duration / 1000,
+        'pid': pid,
+        'tid': tid,
+        'args': args,
+    } for name, start, duration, tid, args in events()]
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False, default=str)
+    os.replace(temp_path, path)
+    return len(trace_events)
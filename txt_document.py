@@ -0,0 +1,250 @@
+# NovelQ - 摸鱼阅读器
+# Author: BBBQL2021
+# License: GNU General Public License v3.0
+
+import bisect
+import codecs
+import mmap
+import os
+from array import array
+from typing import Callable, Dict, Optional, Tuple
+
+from document import Document
+from encoding_detector import (detect_encoding, candidate_encodings, MIN_CONFIDENCE,
+                               MULTIBYTE_ENCODINGS)
+from text_cache import TextCache
+from tracing import traced
+
+class TxtDocument(Document):
+    """基于mmap的TXT文档
+
+    打开时只顺序扫描一遍文件，在字符边界处把文件切分为约PAGE_SIZE字节的页，
+    记录每页的字节偏移和字符偏移，不保存解码后的全文。
+    阅读视图通过get_range按需解码所需的页，最近用到的页保存在LRU缓存中。
+
+    页索引可以通过layout()导出、随章节缓存保存，再次打开时传入layout即可跳过编码检测和全文扫描。
+    给出normalized_path时，非UTF-8编码的文件在建立索引的同时写出UTF-8副本，之后改为映射副本。
+    传入共用的text_cache时，已解码的页在文档关闭后仍保留，重新打开同一本书时直接命中。
+    """
+    PAGE_SIZE = 64 * 1024  # 每页的目标字节数
+    CACHE_PAGES = 16  # 没有共用缓存时，私有缓存大约保存的页数
+
+    def __init__(self, file_path: str, encoding: Optional[str] = None,
+                 progress_callback: Optional[Callable[[int, str], None]] = None,
+                 layout: Optional[Dict] = None, normalized_path: Optional[str] = None,
+                 text_cache: Optional[TextCache] = None):
+        super().__init__()
+        self.file_path = file_path
+        stat = os.stat(file_path)
+        # 共用缓存中区分不同文件（及同一文件的不同版本）的键
+        self.cache_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        self._shared_cache = text_cache is not None
+        # 私有缓存的预算按UCS-2估算，约CACHE_PAGES页
+        self._cache = text_cache if text_cache is not None else TextCache(self.CACHE_PAGES * self.PAGE_SIZE * 2)
+        self._file = None
+        self._data = b''
+        self.data_path = file_path  # 实际映射的文件：原文件或UTF-8副本
+        self.layout_restored = False  # 页索引是否来自传入的layout
+        self.closed = False
+
+        # 页索引：第i页对应字节[byte_offsets[i], byte_offsets[i+1])，
+        # 字符[char_offsets[i], char_offsets[i+1])
+        self.byte_offsets = array('q')
+        self.char_offsets = array('q')
+        self.encoding = None  # 检测到的编码名称
+        self.codec = None  # 实际用于解码的编码（去掉BOM后确定字节序）
+
+        try:
+            if not self._restore_layout(layout, normalized_path):
+                self._map(file_path)
+                self._build_index(encoding, progress_callback, normalized_path)
+        except BaseException:
+            self.close()
+            raise
+
+    def _map(self, path: str) -> None:
+        """映射path的全部内容，之前的映射先释放"""
+        self._unmap()
+        self.data_path = path
+        self.file_size = os.path.getsize(path)
+        self._file = open(path, 'rb')
+        # 空文件无法mmap
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.file_size else b''
+
+    def _unmap(self) -> None:
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._data = b''
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    @traced('restore_layout')
+    def _restore_layout(self, layout: Optional[Dict], normalized_path: Optional[str]) -> bool:
+        """使用之前保存的页索引，映射的文件大小与索引不符（如副本已被删除）时返回False"""
+        if not layout:
+            return False
+        path = normalized_path if layout.get('normalized') else self.file_path
+        try:
+            if not path or os.path.getsize(path) != layout['data_size']:
+                return False
+            self._map(path)
+            self.byte_offsets = array('q', layout['byte_offsets'])
+            self.char_offsets = array('q', layout['char_offsets'])
+            self.encoding = layout['encoding']
+            self.codec = layout['codec']
+        except (OSError, KeyError, TypeError):
+            return False
+        if path != self.file_path:
+            self._cache.touch(path)
+        self.layout_restored = True
+        return True
+
+    def layout(self) -> Dict:
+        """导出页索引，随章节缓存保存"""
+        return {
+            'encoding': self.encoding,
+            'codec': self.codec,
+            'normalized': self.data_path != self.file_path,
+            'data_size': self.file_size,
+            'byte_offsets': self.byte_offsets.tolist(),
+            'char_offsets': self.char_offsets.tolist(),
+        }
+
+    def _build_index(self, encoding: Optional[str], progress_callback,
+                     normalized_path: Optional[str] = None) -> None:
+        """检测编码并建立页索引，检测结果解码失败时依次尝试候选编码"""
+        if encoding is None:
+            encoding, confidence = detect_encoding(self.file_path)
+            if confidence < MIN_CONFIDENCE and encoding not in MULTIBYTE_ENCODINGS:
+                encoding = None
+
+        for candidate in candidate_encodings(encoding):
+            codec, start = self._resolve_bom(candidate)
+            # UTF-8文件直接映射即可，其他编码顺便写出UTF-8副本
+            target = normalized_path if normalized_path and codec != 'utf-8' else None
+            try:
+                self._index_pages(codec, start, progress_callback, target)
+            except UnicodeDecodeError:
+                continue
+            self.encoding = candidate
+            self.codec = codec
+            if target:
+                self._map(target)
+                self.codec = 'utf-8'
+            return
+        raise ValueError(f"无法正确解码文件：{self.file_path}")
+
+    def _resolve_bom(self, encoding: str) -> Tuple[str, int]:
+        """把带BOM的编码转换为确定字节序的编码，返回(编码, 正文起始字节)"""
+        head = self._data[:4]
+        if encoding == 'utf-8-sig':
+            return 'utf-8', 3 if head.startswith(codecs.BOM_UTF8) else 0
+        if encoding == 'utf-16':
+            if head.startswith(codecs.BOM_UTF16_BE):
+                return 'utf-16-be', 2
+            return 'utf-16-le', 2 if head.startswith(codecs.BOM_UTF16_LE) else 0
+        if encoding == 'utf-32':
+            if head.startswith(codecs.BOM_UTF32_BE):
+                return 'utf-32-be', 4
+            return 'utf-32-le', 4 if head.startswith(codecs.BOM_UTF32_LE) else 0
+        return encoding, 0
+
+    @traced('decode')
+    def _index_pages(self, codec: str, start: int, progress_callback,
+                     normalized_path: Optional[str] = None) -> None:
+        """用增量解码器顺序扫描文件，在解码器没有残留字节的位置切页
+
+        增量解码器内部缓存的字节就是被切断的半个多字节字符，
+        因此"已读取字节数 - 缓存字节数"一定落在字符边界上。
+        给出normalized_path时把解码结果逐页以UTF-8写入该文件，字节偏移改为副本中的偏移，
+        页的字符范围不变。先写临时文件，完整写完才替换，中途取消或解码失败不会留下残缺的副本。
+        """
+        byte_offsets = array('q', [0 if normalized_path else start])
+        char_offsets = array('q', [0])
+        decoder = codecs.getincrementaldecoder(codec)()
+        read_pos = start
+        chars = 0
+        temp_path = normalized_path + '.tmp' if normalized_path else None
+        output = open(temp_path, 'wb') if temp_path else None
+
+        try:
+            while read_pos < self.file_size:
+                chunk = self._data[read_pos:read_pos + self.PAGE_SIZE]
+                read_pos += len(chunk)
+                text = decoder.decode(chunk, final=read_pos >= self.file_size)
+                chars += len(text)
+                if output:
+                    data = text.encode('utf-8')
+                    output.write(data)
+                    byte_offsets.append(byte_offsets[-1] + len(data))
+                else:
+                    pending = len(decoder.getstate()[0])
+                    byte_offsets.append(read_pos - pending)
+                char_offsets.append(chars)
+                if progress_callback:
+                    progress_callback(read_pos * 90 // self.file_size, '正在建立页索引')
+            if output:
+                output.close()
+                os.replace(temp_path, normalized_path)
+        except BaseException:
+            if output:
+                output.close()
+                os.remove(temp_path)
+            raise
+
+        self.byte_offsets = byte_offsets
+        self.char_offsets = char_offsets
+
+    def __len__(self) -> int:
+        """全文字符数"""
+        return self.char_offsets[-1] if self.char_offsets else 0
+
+    @property
+    def page_count(self) -> int:
+        return max(0, len(self.byte_offsets) - 1)
+
+    def page_offsets(self) -> list:
+        """各页起始字符位置，末尾附加全文长度"""
+        return list(self.char_offsets)
+
+    def _decode_page(self, index: int) -> str:
+        return self._data[self.byte_offsets[index]:self.byte_offsets[index + 1]].decode(self.codec)
+
+    def page_text(self, index: int) -> str:
+        """获取第index页的文本，带LRU缓存；文档关闭后抛出ValueError"""
+        if self.closed:
+            raise ValueError(f"文档已关闭：{self.file_path}")
+        key = (self.cache_key, index)
+        text = self._cache.get(key)
+        if text is None:
+            text = self._decode_page(index)
+            # 解码期间文档可能被另一线程关闭，此时读到的是空数据，不能放入共用缓存
+            if self.closed:
+                raise ValueError(f"文档已关闭：{self.file_path}")
+            self._cache.put(key, text)
+        return text
+
+    def page_of_position(self, position: int) -> int:
+        """字符位置所在的页"""
+        return min(max(0, bisect.bisect_right(self.char_offsets, position) - 1), max(0, self.page_count - 1))
+
+    def get_range(self, start: int, end: int) -> str:
+        """获取字符区间[start, end)的文本，只解码覆盖该区间的页"""
+        start = max(0, start)
+        end = min(end, len(self))
+        if start >= end:
+            return ''
+        first = self.page_of_position(start)
+        last = bisect.bisect_left(self.char_offsets, end)
+        text = ''.join(self.page_text(i) for i in range(first, last))
+        base = self.char_offsets[first]
+        return text[start - base:end - base]
+
+    def close(self) -> None:
+        """释放文件映射，共用缓存中的页保留给之后重新打开时使用"""
+        # 先标记为已关闭，之后才释放映射，page_text据此判断解码结果是否有效
+        self.closed = True
+        self._unmap()
+        if not self._shared_cache:
+            self._cache.clear()